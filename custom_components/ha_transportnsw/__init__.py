@@ -10,15 +10,18 @@ from homeassistant import config_entries
 from homeassistant.components import websocket_api
 from homeassistant.config_entries import (
     ConfigEntry,
+    ConfigEntryState,
     ConfigSubentryData
 )
 from homeassistant.core import (
     HomeAssistant,
     CoreState,
-    EVENT_HOMEASSISTANT_STARTED
+    EVENT_HOMEASSISTANT_STARTED,
+    callback
 )
 from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import entity_registry
 from homeassistant.helpers.device_registry import DeviceEntry
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from homeassistant.const import (
@@ -36,6 +39,7 @@ import voluptuous as vol
 from TransportNSWv2 import InvalidAPIKey, StopError
 
 from .helpers import check_stops, set_optional_sensors, get_optional_sensors
+from .ratelimit import async_call_limited
 from .coordinator import TransportNSWCoordinator
 from .const import (
     CONF_ALERTS_SENSOR,
@@ -68,8 +72,11 @@ from .const import (
     DEFAULT_MAX_CHANGES,
     DOMAIN,
     INTEGRATION_VERSION,
+    INTEREST_LEASE_TTL,
     SUBENTRY_TYPE_JOURNEY
 )
+from .metrics import TransportNSWMetricsView
+from .services import async_setup_services
 from .www import JSModuleRegistration
 
 _LOGGER = logging.getLogger(__name__)
@@ -128,12 +135,17 @@ async def get_migration_data(hass: HomeAssistant, yaml_entry):
 
         # We need the stop names for the title, so get them now
         #stop_data = check_stops(api_key, [origin_id, destination_id])
-        stop_data = await hass.async_add_executor_job (
+        stop_data, _, api_error = await async_call_limited (
+            hass,
+            api_key,
             check_stops,
             api_key,
             [origin_id, destination_id]
         )
 
+        if api_error is not None:
+            raise api_error
+
         if stop_data['all_stops_valid']:
             # Get the origin and destination stop names
             origin_name = stop_data['stop_list'][0]['stop_detail']['disassembledName']
@@ -296,6 +308,50 @@ async def websocket_get_version(
         {"version": INTEGRATION_VERSION},
     )
 
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/interest",
+        vol.Required("lease_id"): str,
+        vol.Optional("entity_ids", default = []): [str],
+        vol.Optional("release", default = False): bool,
+    }
+)
+@callback
+def websocket_register_interest(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: dict,
+) -> None:
+    """Handle a frontend card registering, renewing or releasing its interest in the journeys behind some entities."""
+    loaded_entries = {
+        config_entry.entry_id: config_entry
+        for config_entry in hass.config_entries.async_entries(DOMAIN)
+        if config_entry.state is ConfigEntryState.LOADED
+    }
+
+    if msg["release"]:
+        for config_entry in loaded_entries.values():
+            config_entry.runtime_data.coordinator.async_release_interest(msg["lease_id"])
+
+        connection.send_result(msg["id"], {"journeys": 0, "lease_seconds": 0})
+        return
+
+    # Work out which journeys the entities belong to, grouped by config entry
+    entity_reg = entity_registry.async_get(hass)
+    journeys = defaultdict(set)
+
+    for entity_id in msg["entity_ids"]:
+        registry_entry = entity_reg.async_get(entity_id)
+        if registry_entry is not None and registry_entry.platform == DOMAIN and registry_entry.config_subentry_id is not None:
+            journeys[registry_entry.config_entry_id].add(registry_entry.config_subentry_id)
+
+    leased = 0
+    for config_entry_id, subentry_ids in journeys.items():
+        if config_entry_id in loaded_entries:
+            leased += loaded_entries[config_entry_id].runtime_data.coordinator.async_register_interest(msg["lease_id"], subentry_ids)
+
+    connection.send_result(msg["id"], {"journeys": leased, "lease_seconds": INTEREST_LEASE_TTL})
+
 async def async_setup(hass: HomeAssistant, config_entry: TransportNSWConfigEntry):
 
     # Check if there's an old YAML config to import...
@@ -332,6 +388,16 @@ async def async_setup(hass: HomeAssistant, config_entry: TransportNSWConfigEntry
     # Register websocket command for version checking of the Lovelace card
     websocket_api.async_register_command(hass, websocket_get_version)
 
+    # ...and for dashboard cards to say which journeys they're showing
+    websocket_api.async_register_command(hass, websocket_register_interest)
+
+    # Register the (optional) Prometheus metrics endpoint - it returns a 404 unless enabled in at least one entry's options
+    # Views can't be unregistered, so this has to happen once here rather than per config entry
+    hass.http.register_view(TransportNSWMetricsView())
+
+    # Register the integration services
+    async_setup_services(hass)
+
     return True
 
 
@@ -344,10 +410,9 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: TransportNSWConfi
 
     # Initialize our cross-entry tracking container if missing
     try:
+        # Don't replace the container outright - the flows may already have put the shared rate limiters in there
         if DOMAIN not in hass.data or "frontend_loaded" not in hass.data[DOMAIN]:
-            hass.data[DOMAIN] = {
-                "frontend_loaded": False  # Stores active entry_id strings
-            }
+            hass.data.setdefault(DOMAIN, {})["frontend_loaded"] = False
 
         # If this is the first entry load we need to register the Javascript module(s)
         if not hass.data[DOMAIN]["frontend_loaded"]:
@@ -401,6 +466,13 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: TransportNSWConfi
         # it accessible throughout the integration
         config_entry.runtime_data = RuntimeData(coordinator)
 
+        # Refresh device tracker journeys as their trackers move, if that's enabled, and keep track of any presence conditions
+        coordinator.async_setup_tracker_listeners()
+        coordinator.async_setup_presence_listeners()
+
+        # Count the due times down between polls
+        coordinator.async_setup_countdown()
+
         # # Initiate the coordinator
         # await coordinator.async_config_entry_first_refresh()
 
@@ -0,0 +1,161 @@
+"""Trip plan cache for the Transport NSW Mk II integration."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import copy
+import json
+import logging
+import time
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    PLAN_CACHE_BUCKET,
+    PLAN_CACHE_SAVE_DELAY,
+    PLAN_CACHE_SIZE,
+    PLAN_CACHE_STORAGE_VERSION
+)
+from .helpers import update_due
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TripPlanCache:
+    """Recent trip plans, keyed by the request and a departure time bucket.
+
+    An in-memory LRU shared by every config entry, backed by HA storage so that it survives a restart while any loaded entry wants it to.
+    """
+
+    def __init__(self, hass: HomeAssistant, max_size: int = PLAN_CACHE_SIZE) -> None:
+        self._store = Store(hass, PLAN_CACHE_STORAGE_VERSION, f"{DOMAIN}.plan_cache")
+        self._plans = OrderedDict()        # Key to (expiry timestamp, journey data), least recently used first
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.loaded = False
+        self._persistent_entries = set()
+
+    @property
+    def persistent(self) -> bool:
+        return len(self._persistent_entries) > 0
+
+    def set_persistent(self, entry_id: str, persistent: bool) -> None:
+        """Record whether a config entry wants the cache saved to disk."""
+        if persistent:
+            self._persistent_entries.add(entry_id)
+        else:
+            self._persistent_entries.discard(entry_id)
+
+    @staticmethod
+    def get_key(origin: str, query_args: dict, now: float | None = None) -> tuple[str, float]:
+        """Return the cache key for a request, and when its time bucket ends."""
+        # Requests made in the same bucket plan from almost the same time, so they get the same answer bar the realtime data
+        bucket = int((now or time.time()) // PLAN_CACHE_BUCKET)
+
+        key = json.dumps(
+            {
+                **query_args,
+                'origin': origin,
+                'route_filter': query_args['route_filter'].lower(),
+                'run_filter': query_args['run_filter'].lower(),
+                'bucket': bucket
+            },
+            sort_keys = True
+        )
+
+        return key, (bucket + 1) * PLAN_CACHE_BUCKET
+
+    def get(self, key: str, now: float | None = None) -> dict | None:
+        """Return a copy of a cached plan with its due times brought up to date, or None if there isn't a current one."""
+        entry = self._plans.get(key)
+
+        if entry is None or entry[0] <= (now or time.time()):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._plans.move_to_end(key)
+
+        journey_data = copy.deepcopy(entry[1])
+        update_due(journey_data.get('journeys', []))
+
+        return journey_data
+
+    def set(self, key: str, journey_data: dict, bucket_end: float, trip_wait_time: int) -> None:
+        """Cache a plan until its bucket ends, or until its first trip would no longer be returned, whichever is sooner."""
+        expires = bucket_end
+
+        for journey in journey_data.get('journeys', []):
+            departure_time = dt_util.parse_datetime(journey['origin_detail']['departure_time'])
+            if departure_time is not None:
+                expires = min(expires, departure_time.timestamp() - trip_wait_time * 60)
+
+        self._plans[key] = (expires, copy.deepcopy(journey_data))
+        self._plans.move_to_end(key)
+
+        while len(self._plans) > self.max_size:
+            self._plans.popitem(last = False)
+
+    def get_stats(self) -> dict:
+        total = self.hits + self.misses
+
+        return {
+            'plans': len(self._plans),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 3) if total > 0 else None,
+            'persistent': self.persistent
+        }
+
+    async def async_load(self) -> None:
+        """Load the on-disk tier into memory, skipping anything that's already expired."""
+        self.loaded = True
+
+        try:
+            stored = await self._store.async_load()
+
+        except Exception as ex:
+            _LOGGER.warning("Error %s loading the trip plan cache, starting afresh", ex)
+            return
+
+        if not stored:
+            return
+
+        now = time.time()
+
+        for key, plan in stored.get('plans', {}).items():
+            if plan['expires'] > now and key not in self._plans:
+                self._plans[key] = (plan['expires'], plan['data'])
+
+    @callback
+    def async_schedule_save(self) -> None:
+        """Save the cache a little later, if the on-disk tier is enabled."""
+        if self.persistent:
+            self._store.async_delay_save(self._data_to_save, PLAN_CACHE_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict:
+        # Expired plans are never going to be used again, so don't bother saving them
+        now = time.time()
+
+        return {
+            'plans': {
+                key: {'expires': expires, 'data': journey_data}
+                for key, (expires, journey_data) in self._plans.items()
+                if expires > now
+            }
+        }
+
+
+def get_plan_cache(hass: HomeAssistant) -> TripPlanCache:
+    # One cache for all the config entries, kept in hass.data so it also survives a config entry reload
+    domain_data = hass.data.setdefault(DOMAIN, {})
+
+    if "plan_cache" not in domain_data:
+        domain_data["plan_cache"] = TripPlanCache(hass)
+
+    return domain_data["plan_cache"]
@@ -22,20 +22,58 @@ from homeassistant.const import (
 )
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.selector import (
+    TextSelector,
+    TextSelectorConfig,
+    TextSelectorType
+)
 #from homeassistant.components import persistent_notification
 from homeassistant.components.persistent_notification import async_create as async_create_notification
 
 from .const import (
+    CONF_ADDITIONAL_API_KEYS,
+    CONF_METRICS_ENDPOINT,
     CONF_REQUEST_LOCATION_UPDATE,
+    CONF_LOCAL_FILTERING,
+    CONF_MOVEMENT_RADIUS,
+    CONF_TRACKER_BACKGROUND_INTERVAL,
+    CONF_LOCATION_UPDATE_WAIT,
+    CONF_SNAP_TO_STOP,
+    CONF_GTFS_STOPS_FILE,
+    CONF_INTERPOLATE_VEHICLES,
+    CONF_INTEREST_BACKGROUND_INTERVAL,
+    CONF_JOURNEY_BUFFER,
+    CONF_PERSIST_PLAN_CACHE,
+    CONF_REPLAN_INTERVAL,
+    CONF_TRACING,
+    CONF_TRIP_PINNING,
+    DEFAULT_METRICS_ENDPOINT,
     DEFAULT_REQUEST_LOCATION_UPDATE,
     DEFAULT_SCAN_INTERVAL,
+    DEFAULT_LOCAL_FILTERING,
+    DEFAULT_MOVEMENT_RADIUS,
+    DEFAULT_TRACKER_BACKGROUND_INTERVAL,
+    DEFAULT_LOCATION_UPDATE_WAIT,
+    DEFAULT_SNAP_TO_STOP,
+    DEFAULT_GTFS_STOPS_FILE,
+    DEFAULT_INTERPOLATE_VEHICLES,
+    DEFAULT_INTEREST_BACKGROUND_INTERVAL,
+    DEFAULT_JOURNEY_BUFFER,
+    DEFAULT_PERSIST_PLAN_CACHE,
+    DEFAULT_REPLAN_INTERVAL,
+    DEFAULT_TRACING,
+    DEFAULT_TRIP_PINNING,
     DOMAIN,
+    LOCATION_UPDATE_MAX_WAIT,
+    MAX_JOURNEY_BUFFER,
     STOP_TEST_ID,
+    SUBENTRY_TYPE_BOARD,
     SUBENTRY_TYPE_JOURNEY,
     TFNSW_REGISTRATION,
 )
 from .helpers import check_stops
-from .subentry_flow import JourneySubEntryFlowHandler
+from .ratelimit import async_call_limited
+from .subentry_flow import BoardSubEntryFlowHandler, JourneySubEntryFlowHandler
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -45,12 +83,17 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> None:
 
     try:
         # We don't actually care about the returned value, just need to force a check and see if any errors are raised
-        stop_data = await hass.async_add_executor_job (
+        stop_data, _, api_error = await async_call_limited (
+            hass,
+            data[CONF_API_KEY],
             check_stops,
             data[CONF_API_KEY],
             [STOP_TEST_ID]
         )
 
+        if api_error is not None:
+            raise api_error
+
     # Testing simpler exception code
     except (InvalidAPIKey, APIRateLimitExceeded, StopError):
         raise
@@ -84,7 +127,8 @@ class TransportNSWConfigFlowHandler(ConfigFlow, domain=DOMAIN):
             # Return subentries supported by this integration
 
             return {
-                SUBENTRY_TYPE_JOURNEY: JourneySubEntryFlowHandler
+                SUBENTRY_TYPE_JOURNEY: JourneySubEntryFlowHandler,
+                SUBENTRY_TYPE_BOARD: BoardSubEntryFlowHandler
             }
 
     async def async_step_user(self, user_input: dict[str, Any] | None = None ) -> ConfigFlowResult:
@@ -258,13 +302,53 @@ class TransportNSWOptionsFlowHandler(OptionsFlow):
         OPTIONS_SCHEMA = vol.Schema(
             {
                 vol.Optional(CONF_SCAN_INTERVAL, default = self.config_entry.data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)): int,
+                vol.Optional(CONF_INTEREST_BACKGROUND_INTERVAL, default = self.config_entry.options.get(CONF_INTEREST_BACKGROUND_INTERVAL, DEFAULT_INTEREST_BACKGROUND_INTERVAL)): vol.All(int, vol.Range(min = 0)),
                 vol.Optional(CONF_REQUEST_LOCATION_UPDATE, default = self.config_entry.options.get(CONF_REQUEST_LOCATION_UPDATE, DEFAULT_REQUEST_LOCATION_UPDATE)): bool,
+                vol.Optional(CONF_LOCATION_UPDATE_WAIT, default = self.config_entry.options.get(CONF_LOCATION_UPDATE_WAIT, DEFAULT_LOCATION_UPDATE_WAIT)): vol.All(int, vol.Range(min = 0, max = LOCATION_UPDATE_MAX_WAIT)),
+                vol.Optional(CONF_MOVEMENT_RADIUS, default = self.config_entry.options.get(CONF_MOVEMENT_RADIUS, DEFAULT_MOVEMENT_RADIUS)): vol.All(int, vol.Range(min = 0)),
+                vol.Optional(CONF_SNAP_TO_STOP, default = self.config_entry.options.get(CONF_SNAP_TO_STOP, DEFAULT_SNAP_TO_STOP)): bool,
+                vol.Optional(CONF_GTFS_STOPS_FILE, default = self.config_entry.options.get(CONF_GTFS_STOPS_FILE, DEFAULT_GTFS_STOPS_FILE)): str,
+                vol.Optional(CONF_INTERPOLATE_VEHICLES, default = self.config_entry.options.get(CONF_INTERPOLATE_VEHICLES, DEFAULT_INTERPOLATE_VEHICLES)): bool,
+                vol.Optional(CONF_TRACKER_BACKGROUND_INTERVAL, default = self.config_entry.options.get(CONF_TRACKER_BACKGROUND_INTERVAL, DEFAULT_TRACKER_BACKGROUND_INTERVAL)): vol.All(int, vol.Range(min = 0)),
+                vol.Optional(CONF_METRICS_ENDPOINT, default = self.config_entry.options.get(CONF_METRICS_ENDPOINT, DEFAULT_METRICS_ENDPOINT)): bool,
+                vol.Optional(CONF_TRACING, default = self.config_entry.options.get(CONF_TRACING, DEFAULT_TRACING)): bool,
+                vol.Optional(CONF_TRIP_PINNING, default = self.config_entry.options.get(CONF_TRIP_PINNING, DEFAULT_TRIP_PINNING)): bool,
+                vol.Optional(CONF_REPLAN_INTERVAL, default = self.config_entry.options.get(CONF_REPLAN_INTERVAL, DEFAULT_REPLAN_INTERVAL)): vol.All(int, vol.Range(min = 1)),
+                vol.Optional(CONF_JOURNEY_BUFFER, default = self.config_entry.options.get(CONF_JOURNEY_BUFFER, DEFAULT_JOURNEY_BUFFER)): vol.All(int, vol.Range(min = 0, max = MAX_JOURNEY_BUFFER)),
+                vol.Optional(CONF_LOCAL_FILTERING, default = self.config_entry.options.get(CONF_LOCAL_FILTERING, DEFAULT_LOCAL_FILTERING)): bool,
+                vol.Optional(CONF_PERSIST_PLAN_CACHE, default = self.config_entry.options.get(CONF_PERSIST_PLAN_CACHE, DEFAULT_PERSIST_PLAN_CACHE)): bool,
+                vol.Optional(CONF_ADDITIONAL_API_KEYS, default = self.config_entry.options.get(CONF_ADDITIONAL_API_KEYS, [])): TextSelector(
+                    TextSelectorConfig(type = TextSelectorType.PASSWORD, multiple = True)
+                ),
             }
         )
 
-        # TODO - as part of the schema migraton to v3, move scan_interval into 'options' and get rid of all of this!   as well as converting transport_type into strings
+        errors: dict[str, str] = {}
 
         if user_input is not None:
+            # Drop any blank entries, and check any keys that weren't already in the pool before accepting them
+            user_input[CONF_ADDITIONAL_API_KEYS] = [api_key.strip() for api_key in user_input.get(CONF_ADDITIONAL_API_KEYS, []) if api_key.strip()]
+            previous_keys = self.config_entry.options.get(CONF_ADDITIONAL_API_KEYS, [])
+
+            for api_key in user_input[CONF_ADDITIONAL_API_KEYS]:
+                if api_key in previous_keys or api_key == self.config_entry.data[CONF_API_KEY]:
+                    continue
+
+                try:
+                    await validate_input(self.hass, {CONF_API_KEY: api_key})
+
+                except InvalidAPIKey as ex:
+                    errors[CONF_ADDITIONAL_API_KEYS] = "invalidapikey"
+
+                except APIRateLimitExceeded as ex:
+                    errors[CONF_ADDITIONAL_API_KEYS] = "apiratelimitexceeded"
+
+                except Exception as ex:
+                    errors[CONF_ADDITIONAL_API_KEYS] = "unknown"
+
+        # TODO - as part of the schema migraton to v3, move scan_interval into 'options' and get rid of all of this!   as well as converting transport_type into strings
+
+        if user_input is not None and not errors:
             # This caters for there possibly being more options in the future without me having to remember to incorporate them!
             new_data = {key: value for key, value in user_input.items() if key == CONF_SCAN_INTERVAL}
             new_options = {key: value for key, value in user_input.items() if key != CONF_SCAN_INTERVAL}
@@ -311,10 +395,11 @@ class TransportNSWOptionsFlowHandler(OptionsFlow):
 
 
 
-        # Show the options form
+        # Show the options form, keeping whatever was entered if there were errors
         return self.async_show_form(
             step_id="init",
-            data_schema=OPTIONS_SCHEMA
+            data_schema=self.add_suggested_values_to_schema(OPTIONS_SCHEMA, user_input) if errors else OPTIONS_SCHEMA,
+            errors=errors
             )
 
 class CannotConnect(HomeAssistantError):
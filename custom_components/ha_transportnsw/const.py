@@ -8,6 +8,21 @@ DOMAIN = "ha_transportnsw"
 
 # Optional config entry settings
 CONF_REQUEST_LOCATION_UPDATE = 'request_location_update'
+CONF_METRICS_ENDPOINT = 'metrics_endpoint'
+CONF_TRACING = 'tracing'
+CONF_ADDITIONAL_API_KEYS = 'additional_api_keys'
+CONF_TRIP_PINNING = 'trip_pinning'
+CONF_REPLAN_INTERVAL = 'replan_interval'
+CONF_LOCAL_FILTERING = 'local_filtering'
+CONF_PERSIST_PLAN_CACHE = 'persist_plan_cache'
+CONF_MOVEMENT_RADIUS = 'movement_radius'
+CONF_TRACKER_BACKGROUND_INTERVAL = 'tracker_background_interval'
+CONF_LOCATION_UPDATE_WAIT = 'location_update_wait'
+CONF_SNAP_TO_STOP = 'snap_to_stop'
+CONF_GTFS_STOPS_FILE = 'gtfs_stops_file'
+CONF_INTERPOLATE_VEHICLES = 'interpolate_vehicles'
+CONF_INTEREST_BACKGROUND_INTERVAL = 'interest_background_interval'
+CONF_JOURNEY_BUFFER = 'journey_buffer'
 
 # Mandatory subentry data
 CONF_ORIGIN_TYPE = 'origin_type'  # New
@@ -28,6 +43,11 @@ CONF_MAX_CHANGES = 'max_changes'
 CONF_ALERT_SEVERITY = 'alert_severity'
 CONF_ALERT_TYPES = 'alert_types'
 CONF_TRIPS_TO_CREATE = 'trips_to_create'
+CONF_PRESENCE_PERSON = 'presence_person'
+CONF_PRESENCE_ZONE = 'presence_zone'
+CONF_PRESENCE_CONDITION = 'presence_condition'
+CONF_DEPARTURES_TO_SHOW = 'departures_to_show'
+CONF_BOARD_LINES = 'board_lines'
 
 # Sensor key names
 CONF_DUE_SENSOR = 'due'
@@ -101,6 +121,7 @@ CONF_ORIGIN_DEVICE_TRACKER_FRIENDLY = 'Origin location'
 CONF_DESTINATION_DEVICE_TRACKER = 'destination_device_tracker'
 CONF_DESTINATION_DEVICE_TRACKER_FRIENDLY = 'Destination location'
 
+PRESENCE_CONDITION_LIST = ['in_zone', 'not_in_zone']
 ORIGIN_TRANSPORT_TYPE_LIST = ['Train', 'Metro', 'Light rail', 'Bus', 'Coach', 'Ferry', 'School bus', 'Walk']
 DESTINATION_TRANSPORT_TYPE_LIST = ['Train', 'Metro', 'Light rail', 'Bus', 'Coach', 'Ferry', 'School bus', 'Walk']
 ALL_TRANSPORT_TYPE_NUMERIC = [1, 2, 4, 5, 7, 9, 11, 99]
@@ -114,6 +135,20 @@ ATTR_LOCATIONS_LIST = 'locations_list'
 DEFAULT_SCAN_INTERVAL = 120
 DEFAULT_CREATE_REVERSE_TRIP = False
 DEFAULT_REQUEST_LOCATION_UPDATE = False
+DEFAULT_METRICS_ENDPOINT = False
+DEFAULT_TRACING = False
+DEFAULT_TRIP_PINNING = False
+DEFAULT_REPLAN_INTERVAL = 10          # Minutes
+DEFAULT_LOCAL_FILTERING = False
+DEFAULT_PERSIST_PLAN_CACHE = False
+DEFAULT_MOVEMENT_RADIUS = 0           # Metres, 0 to re-plan device tracker journeys on every poll
+DEFAULT_TRACKER_BACKGROUND_INTERVAL = 0   # Seconds, 0 to poll device tracker journeys as normal rather than when the tracker moves
+DEFAULT_LOCATION_UPDATE_WAIT = 0      # Seconds, 0 to plan from the last known location without waiting for a new one
+DEFAULT_SNAP_TO_STOP = False
+DEFAULT_GTFS_STOPS_FILE = ''
+DEFAULT_INTERPOLATE_VEHICLES = False
+DEFAULT_JOURNEY_BUFFER = 0            # Extra journeys to plan, so the trips can move up as they depart
+DEFAULT_INTEREST_BACKGROUND_INTERVAL = 0   # Seconds, 0 to poll journeys at the normal rate whether anyone's looking at them or not
 DEFAULT_FIRST_LEG_DEVICE_TRACKER = 'never'
 DEFAULT_LAST_LEG_DEVICE_TRACKER = 'never'
 DEFAULT_ORIGIN_DEVICE_TRACKER = 'if_device_tracker_journey'
@@ -126,7 +161,11 @@ DEFAULT_ROUTE_FILTER = ''
 DEFAULT_MAX_CHANGES = 2
 DEFAULT_ALERT_TYPES = ['lineinfo', 'stopinfo', 'routeinfo', 'stopblocking', 'bannerinfo']
 DEFAULT_ALERT_SEVERITY = 'high'
+DEFAULT_PRESENCE_ZONE = 'zone.home'
+DEFAULT_PRESENCE_CONDITION = 'in_zone'
 DEFAULT_TRIPS_TO_CREATE = 1
+DEFAULT_DEPARTURES_TO_SHOW = 10
+DEFAULT_BOARD_WAIT_TIME = 0
 DEFAULT_SENSOR_CREATION = 'none'
 DEFAULT_CHANGES_SENSOR = False
 DEFAULT_DELAY_SENSOR = False
@@ -155,9 +194,18 @@ DEFAULT_LAST_LEG_TRAIN_SET_SENSOR = False
 MIN_SCAN_INTERVAL = 30
 MAX_TRIP_WAIT_TIME = 60
 MAX_MAX_CHANGES = 5
+MAX_DEPARTURES_TO_SHOW = 30
 
 
 
+# Services
+SERVICE_PROFILE_POLL = 'profile_poll'
+ATTR_CONFIG_ENTRY_ID = 'config_entry_id'
+PROFILE_TOP_LINES = 50              # Lines of profiler/allocation output written to the report file
+PROFILE_SUMMARY_LINES = 10          # Lines of each returned in the service response
+PROFILE_TRACEMALLOC_FRAMES = 5
+SERVICE_EXPORT_TRACES = 'export_traces'
+
 # Misc
 ORIGIN_LATITUDE = 'origin_latitude'
 ORIGIN_LONGITUDE = 'origin_longitude'
@@ -189,13 +237,61 @@ TFNSW_STOPFINDER = "https://transportnsw.info/routes/"
 
 # Subentry stuff
 SUBENTRY_TYPE_JOURNEY = 'subentry_journey'
+SUBENTRY_TYPE_BOARD = 'subentry_board'
 API_CALLS = 'api_calls'
 AVERAGE_API_CALLS = 'average_api_calls'
 API_CALLS_NAME = 'API calls'
 AVERAGE_API_CALLS_NAME = 'Average API calls per poll'
 AVERAGE_API_CALLS_WINDOW = 10
+POLL_HISTORY_LENGTH = 20      # How many poll timelines to keep for the diagnostics download
+METRICS_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)   # Seconds
+TRACE_HISTORY_LENGTH = 10     # How many poll traces to keep while tracing is enabled
+DAILY_API_QUOTA = 60000
+JOURNEY_API_CALLS = 'journey_api_calls'
+JOURNEY_API_CALLS_NAME = 'API calls today'
+QUOTA_EXHAUSTION = 'quota_exhaustion'
+QUOTA_EXHAUSTION_NAME = 'API quota exhaustion forecast'
+LEDGER_MINUTES = 1500         # Per-minute buckets in the API call ledger - a day, plus an hour for daylight saving changes
+LEDGER_FORECAST_WINDOW = 60   # Minutes of recent usage used to forecast quota exhaustion
+LEDGER_SAVE_DELAY = 60        # Seconds
+LEDGER_STORAGE_VERSION = 1
+API_RATE_LIMIT = 5             # Requests per second allowed per API key
+API_RATE_LIMIT_BURST = 5
+RATE_LIMIT_COOLDOWN = 5         # Seconds to pause after a rate limit response, doubling each consecutive time
+RATE_LIMIT_MAX_COOLDOWN = 120
+VEHICLE_CACHE_TTL = 20          # Seconds - long enough to cover a poll, short enough not to carry over to the next one
+LOCAL_FILTER_TRANSPORT_TYPES = [1, 2, 4, 5, 7, 9, 11]    # Every vehicle mode, for the wider requests made when filtering locally
+LOCAL_FILTER_CANDIDATE_FACTOR = 3     # How many more journeys to ask for when filtering locally, to allow for the ones that get filtered out
+PLAN_CACHE_BUCKET = 300         # Seconds - trip plans requested within the same bucket are shared
+PLAN_CACHE_SIZE = 128
+PLAN_CACHE_SAVE_DELAY = 30      # Seconds
+PLAN_CACHE_STORAGE_VERSION = 1
+TRACKER_MOVEMENT_THRESHOLD = 100    # Metres a device tracker has to move to trigger a refresh, unless the movement radius is bigger
+TRACKER_REFRESH_DEBOUNCE = 30       # Seconds to wait for a moving device tracker to settle before refreshing its journeys
+LOCATION_UPDATE_MIN_INTERVAL = 120  # Seconds between location update requests to the same device
+LOCATION_UPDATE_MAX_WAIT = 30       # Seconds - the longest the wait for a new location can be set to
+STOP_SNAP_DISTANCE = 400           # Metres - the furthest a device tracker can be from a stop to plan from that stop instead
+STOP_INDEX_CELL_SIZE = 0.005        # Degrees, roughly 500 metres north-south
+STOP_INDEX_SAVE_DELAY = 60          # Seconds
+STOP_INDEX_STORAGE_VERSION = 1
+INTERPOLATION_INTERVAL = 10         # Seconds between dead-reckoned vehicle positions
+INTERPOLATION_MIN_MOVE = 25         # Metres a dead-reckoned vehicle has to move before its tracker is updated
+MAX_JOURNEY_BUFFER = 6
+INTEREST_LEASE_TTL = 300            # Seconds a dashboard card's interest in a journey lasts unless it's renewed
+JOURNEY_SCHEDULE_SLACK = 10         # Seconds early a journey can be polled, rather than leaving it until the next poll
+DEPARTURE_MON_URL = 'https://api.transport.nsw.gov.au/v1/tp/departure_mon'
+DEPARTURE_MON_TIMEOUT = 20        # Seconds
+BOARD_LINE_DEPARTURES = 3         # Upcoming departures listed on each line sensor
+PINNED_TRIP_MAX_AGE = 10800     # Seconds to remember the agency and mode of each realtime trip, for refreshing pinned trips
+PINNED_TRIP_DEPARTURES = 40     # Departures to look through at a pinned trip's origin stop for its latest departure time
 STOP_TEST_ID = '200060' # Central station
 
+# Sensors that use the realtime vehicle feed, by option group - the vehicle device trackers do as well
+REALTIME_DATA_SENSORS = {
+    'origin_sensors': [CONF_FIRST_LEG_OCCUPANCY_SENSOR, CONF_FIRST_LEG_OCCUPANCY_DETAIL_SENSOR, CONF_FIRST_LEG_TRAIN_SET_SENSOR],
+    'destination_sensors': [CONF_LAST_LEG_OCCUPANCY_SENSOR, CONF_LAST_LEG_OCCUPANCY_DETAIL_SENSOR, CONF_LAST_LEG_TRAIN_SET_SENSOR]
+}
+
 # Lookups and mapping dictionaries
 JOURNEY_ICONS = {
     "Train": "mdi:train",
@@ -1,42 +1,115 @@
 """Transport NSW Mk II DataUpdateCoordinator."""
 
 #from dataclasses import dataclass
-from TransportNSWv2 import APIRateLimitExceeded
-from datetime import timedelta
+from TransportNSWv2 import APIRateLimitExceeded, InvalidAPIKey
+import asyncio
+from collections import deque
+import copy
+from datetime import datetime, timedelta
+from functools import partial
 import logging
+import time
 
-from homeassistant.config_entries import ConfigEntry
+from homeassistant.config_entries import ConfigEntry, ConfigSubentry
 from homeassistant.const import (
+    ATTR_LATITUDE,
+    ATTR_LONGITUDE,
     CONF_API_KEY,
 #    CONF_NAME,
-    CONF_SCAN_INTERVAL
+    CONF_SCAN_INTERVAL,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN
 #    UnitOfTime, 
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import Event, EventStateChangedData, HomeAssistant, callback
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.event import async_track_state_change_event, async_track_utc_time_change
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from homeassistant.helpers.location import find_coordinates
+from homeassistant.util import dt as dt_util, location as location_util
 from .const import (
     API_CALLS,
     AVERAGE_API_CALLS_WINDOW,
+    CONF_ADDITIONAL_API_KEYS,
     CONF_ALERT_SEVERITY,
     CONF_ALERT_TYPES,
     CONF_ALERTS_SENSOR,
+    CONF_DEPARTURES_TO_SHOW,
     CONF_DESTINATION_ID,
     CONF_DESTINATION_TRANSPORT_TYPE,
+    CONF_LOCAL_FILTERING,
+    CONF_LOCATION_UPDATE_WAIT,
+    CONF_GTFS_STOPS_FILE,
+    CONF_INTERPOLATE_VEHICLES,
+    CONF_INTEREST_BACKGROUND_INTERVAL,
+    CONF_JOURNEY_BUFFER,
+    CONF_SNAP_TO_STOP,
     CONF_MAX_CHANGES,
+    CONF_MOVEMENT_RADIUS,
     CONF_ORIGIN_ID,
     CONF_ORIGIN_TRANSPORT_TYPE,
     CONF_ORIGIN_TYPE,
+    CONF_PERSIST_PLAN_CACHE,
+    CONF_PRESENCE_CONDITION,
+    CONF_PRESENCE_PERSON,
+    CONF_PRESENCE_ZONE,
+    CONF_REPLAN_INTERVAL,
     CONF_REQUEST_LOCATION_UPDATE,
     CONF_ROUTE_FILTER,
     CONF_RUN_FILTER,
     CONF_TRIPS_TO_CREATE,
+    CONF_TRACING,
+    CONF_TRACKER_BACKGROUND_INTERVAL,
+    CONF_TRIP_PINNING,
     CONF_TRIP_WAIT_TIME,
+    DEFAULT_LOCAL_FILTERING,
+    DEFAULT_LOCATION_UPDATE_WAIT,
+    DEFAULT_GTFS_STOPS_FILE,
+    DEFAULT_INTERPOLATE_VEHICLES,
+    DEFAULT_INTEREST_BACKGROUND_INTERVAL,
+    DEFAULT_JOURNEY_BUFFER,
+    DEFAULT_SNAP_TO_STOP,
+    DEFAULT_MOVEMENT_RADIUS,
+    DEFAULT_PERSIST_PLAN_CACHE,
+    DEFAULT_PRESENCE_CONDITION,
+    DEFAULT_PRESENCE_ZONE,
+    DEFAULT_REPLAN_INTERVAL,
     DEFAULT_SCAN_INTERVAL,
+    DEFAULT_TRACING,
+    DEFAULT_TRACKER_BACKGROUND_INTERVAL,
+    DEFAULT_TRIP_PINNING,
     DOMAIN,
+    INTEREST_LEASE_TTL,
+    JOURNEY_SCHEDULE_SLACK,
+    POLL_HISTORY_LENGTH,
+    SUBENTRY_TYPE_BOARD,
     SUBENTRY_TYPE_JOURNEY,
+    TRACKER_MOVEMENT_THRESHOLD,
+    TRACKER_REFRESH_DEBOUNCE,
 )
-from .helpers import get_trips, get_api_calls, set_api_calls
+from .cache import get_plan_cache
+from .filters import JourneyFilter, can_filter_locally
+from .helpers import (
+    filter_alerts,
+    get_departures,
+    get_destination_ids,
+    get_journeys_to_request,
+    get_trip_query,
+    get_trips,
+    is_realtime_data_needed,
+    merge_trip_queries,
+    refresh_pinned_trips,
+    update_departures_due,
+    update_due
+)
+from .keypool import APIKeyPool
+from .ledger import APICallLedger
+from .locationupdate import get_location_requester
+from .metrics import TransportNSWMetrics
+from .realtime import VehicleCache
+from .ratelimit import async_call_limited
+from .spatial import get_stop_index
+from .tracing import Tracer
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -52,9 +125,89 @@ class TransportNSWCoordinator(DataUpdateCoordinator):
         self.config_entry = config_entry
         self.poll_interval = config_entry.data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
 
-        self.daily_api_calls = 0                # We'll update it properly later, in async_update_data
-        self.rolling_average_api_calls = []     # Used to calculate auto-intervals
-        
+        self.daily_api_calls = 0                # We'll update it properly later, in async_update_data - it's the total across all the pooled API keys
+        self.rolling_average_api_calls = deque(maxlen = AVERAGE_API_CALLS_WINDOW)     # Used to calculate auto-intervals
+
+        # The entry's own API key plus any additional keys, with each key's daily usage
+        self.key_pool = APIKeyPool(hass, [config_entry.data[CONF_API_KEY], *config_entry.options.get(CONF_ADDITIONAL_API_KEYS, [])])
+
+        # Per-journey, per-minute API call counts - used for the per-journey usage sensors and the quota forecast
+        self.ledger = APICallLedger(hass, config_entry.entry_id)
+
+        # Performance data for the diagnostics download - a bounded ring buffer of poll timelines, plus cache hit/miss counts
+        # Nothing here is processed until somebody actually downloads the diagnostics
+        self.poll_history = deque(maxlen = POLL_HISTORY_LENGTH)
+        self.cache_stats = {}
+        self.journey_schedule = {}
+
+        # Realtime vehicle lookups shared by all the journeys in a poll - the TTL is short enough that nothing carries over to the next poll
+        self.vehicle_cache = VehicleCache(record_access = self.record_cache_access)
+
+        # Trip requests shared between journeys with the same origin, filters and destination - rebuilt every poll
+        self._trip_queries = {}
+        self._trip_query_args = {}
+
+        # Optionally make wider requests and apply each journey's filters locally, so journeys with different filters can share them
+        self.local_filtering = config_entry.options.get(CONF_LOCAL_FILTERING, DEFAULT_LOCAL_FILTERING)
+
+        # Recent trip plans, shared by all the config entries and saved to disk while any of them wants it - used for the first poll after a restart or reload
+        self.plan_cache = get_plan_cache(hass)
+        self.persist_plan_cache = config_entry.options.get(CONF_PERSIST_PLAN_CACHE, DEFAULT_PERSIST_PLAN_CACHE)
+
+        if self.persist_plan_cache:
+            self.plan_cache.set_persistent(config_entry.entry_id, True)
+            config_entry.async_on_unload(partial(self.plan_cache.set_persistent, config_entry.entry_id, False))
+
+        # Trips pinned after a full plan, per journey - later polls only refresh their vehicles until they need re-planning
+        self.trip_pinning = config_entry.options.get(CONF_TRIP_PINNING, DEFAULT_TRIP_PINNING)
+        self.replan_interval = config_entry.options.get(CONF_REPLAN_INTERVAL, DEFAULT_REPLAN_INTERVAL) * 60
+        self.pinned_trips = {}
+
+        # The last plan for each device tracker journey and where the tracker was at the time - reused until it moves far enough to matter
+        self.movement_radius = config_entry.options.get(CONF_MOVEMENT_RADIUS, DEFAULT_MOVEMENT_RADIUS)
+        self.origin_plans = {}
+
+        # Optionally refresh device tracker journeys when their tracker moves, and otherwise only poll them at a slower background rate
+        self.tracker_background_interval = config_entry.options.get(CONF_TRACKER_BACKGROUND_INTERVAL, DEFAULT_TRACKER_BACKGROUND_INTERVAL)
+        self.tracker_positions = {}
+        self._tracker_journeys = {}
+        self._journey_debouncers = {}
+
+        # Location update requests go out in the background, optionally waiting a little for the new location before planning
+        self.location_requester = get_location_requester(hass)
+        self.location_update_wait = config_entry.options.get(CONF_LOCATION_UPDATE_WAIT, DEFAULT_LOCATION_UPDATE_WAIT)
+
+        # Optionally plan device tracker journeys from the nearest known stop, so nearby positions share requests and cached plans
+        self.snap_to_stop = config_entry.options.get(CONF_SNAP_TO_STOP, DEFAULT_SNAP_TO_STOP)
+        self.gtfs_stops_file = config_entry.options.get(CONF_GTFS_STOPS_FILE, DEFAULT_GTFS_STOPS_FILE)
+        self.stop_index = get_stop_index(hass)
+
+        # Optionally move the first and last leg vehicles along between polls
+        self.interpolate_vehicles = config_entry.options.get(CONF_INTERPOLATE_VEHICLES, DEFAULT_INTERPOLATE_VEHICLES)
+
+        # Journeys can be limited to when someone is, or isn't, somewhere - the conditions are kept up to date by state change events
+        self._presence_journeys = {}
+        self.presence_active = {}
+
+        # Optionally only poll journeys at the normal rate while a dashboard card is showing them, and otherwise at a slower background rate
+        self.interest_background_interval = config_entry.options.get(CONF_INTEREST_BACKGROUND_INTERVAL, DEFAULT_INTEREST_BACKGROUND_INTERVAL)
+        self.interest_leases = {}               # Subentry ID to {lease ID: expiry}
+
+        # Optionally plan a few more journeys than there are trips, so the trips can move up locally as each one departs
+        self.journey_buffer = config_entry.options.get(CONF_JOURNEY_BUFFER, DEFAULT_JOURNEY_BUFFER)
+
+        # Regular polls and individual journey refreshes take turns
+        self._poll_lock = asyncio.Lock()
+
+        # Refreshes somebody has asked for poll every journey, whether it's due or not
+        self._full_poll_requested = False
+
+        # Cheap counters for the optional Prometheus endpoint
+        self.metrics = TransportNSWMetrics()
+
+        # Structured traces of each poll - when disabled, every span is a no-op
+        self.tracer = Tracer(config_entry.options.get(CONF_TRACING, DEFAULT_TRACING))
+
         # Initialise DataUpdateCoordinator
         super().__init__(
             hass,
@@ -64,133 +217,1027 @@ class TransportNSWCoordinator(DataUpdateCoordinator):
             update_interval=timedelta(seconds=self.poll_interval),
         )
 
-    async def async_update_data(self):
-        """Fetch data from the TfNSW API endpoint."""
+    def record_cache_access(self, cache_name: str, hit: bool) -> None:
+        """Count a cache hit or miss, reported as a ratio in the diagnostics."""
+        stats = self.cache_stats.setdefault(cache_name, [0, 0])
+        stats[0 if hit else 1] += 1
+
+    @callback
+    def async_setup_tracker_listeners(self) -> None:
+        """Listen for the device trackers used as journey origins moving, if their journeys are refreshed that way."""
+        if self.tracker_background_interval <= 0:
+            return
+
+        for subentry in self.config_entry.subentries.values():
+            if subentry.subentry_type == SUBENTRY_TYPE_JOURNEY and subentry.data.get(CONF_ORIGIN_TYPE) == 'device_tracker':
+                self._tracker_journeys.setdefault(subentry.data[CONF_ORIGIN_ID], set()).add(subentry.subentry_id)
+
+        if self._tracker_journeys:
+            self.config_entry.async_on_unload(
+                async_track_state_change_event(self.hass, list(self._tracker_journeys), self._async_tracker_changed)
+            )
+
+    @callback
+    def _async_tracker_changed(self, event: Event[EventStateChangedData]) -> None:
+        """Schedule a refresh of the journeys using a device tracker, if it's moved far enough since they were last refreshed."""
+        new_state = event.data['new_state']
+
+        if new_state is None or self.data is None:
+            return
+
+        latitude = new_state.attributes.get(ATTR_LATITUDE)
+        longitude = new_state.attributes.get(ATTR_LONGITUDE)
+
+        if latitude is None or longitude is None:
+            return
+
+        threshold = max(self.movement_radius, TRACKER_MOVEMENT_THRESHOLD)
+
+        for subentry_id in self._tracker_journeys.get(event.data['entity_id'], set()):
+            if not self.presence_active.get(subentry_id, True):
+                continue
+
+            last_position = self.tracker_positions.get(subentry_id)
+
+            if last_position is not None:
+                distance_moved = location_util.distance(*last_position, latitude, longitude)
+                if distance_moved is not None and distance_moved <= threshold:
+                    continue
+
+            self._get_journey_debouncer(subentry_id).async_schedule_call()
+
+    @callback
+    def async_setup_countdown(self) -> None:
+        """Count the due times down locally at the start of every minute, so they stay accurate however long it is between polls."""
+        self.config_entry.async_on_unload(
+            async_track_utc_time_change(self.hass, self._async_count_down, second = 0)
+        )
+
+    @callback
+    def _async_count_down(self, now: datetime) -> None:
+        # The departure times already include any delay, so the countdown only needs the API to correct them
+        if not self.data:
+            return
+
+        due_changed = False
+
+        for subentry_id, journeys in list(self.data.items()):
+            # The config entry's own data sits alongside the journeys
+            if not isinstance(journeys, list):
+                continue
+
+            previous_due = [journey.get('due') for journey in journeys]
+            subentry = self.config_entry.subentries.get(subentry_id)
+
+            if subentry is not None and subentry.subentry_type == SUBENTRY_TYPE_BOARD:
+                # A board's departures just drop off the top as they go, until the next poll fills it up again
+                journeys = self.data[subentry_id] = update_departures_due(journeys, now)
+            else:
+                update_due(journeys, now)
+
+            if [journey.get('due') for journey in journeys] != previous_due:
+                due_changed = True
+
+        # Move the trips up past any that have departed, and re-plan any journey that's running out of them
+        if self.journey_buffer > 0:
+            low_journeys = set()
+
+            for subentry_id, journeys in list(self.data.items()):
+                subentry = self.config_entry.subentries.get(subentry_id)
+                if subentry is None or subentry.subentry_type != SUBENTRY_TYPE_JOURNEY or not isinstance(journeys, list):
+                    continue
+
+                remaining_journeys = self._get_remaining_journeys(subentry, journeys, now)
+
+                if len(remaining_journeys) < len(journeys):
+                    self.data[subentry_id] = remaining_journeys
+                    due_changed = True
+
+                    if len(remaining_journeys) < subentry.data[CONF_TRIPS_TO_CREATE] and self.presence_active.get(subentry_id, True):
+                        low_journeys.add(subentry_id)
+
+            if low_journeys:
+                _LOGGER.debug("Re-planning %s as they're running out of trips", low_journeys)
+                self.hass.async_create_task(self.async_refresh_journeys(low_journeys))
+
+        # This updates every entity, not just the ones whose trips changed - HA's state machine drops the writes that don't change anything,
+        # which the metrics count as skipped, but each entity still works out its state again
+        if due_changed:
+            self.async_update_listeners()
+
+    @callback
+    def async_setup_presence_listeners(self) -> None:
+        """Listen for the people and zones that journeys are limited to, so those journeys are only polled while their condition holds."""
+        presence_entities = set()
+
+        for subentry in self.config_entry.subentries.values():
+            if subentry.subentry_type == SUBENTRY_TYPE_JOURNEY and subentry.data.get(CONF_PRESENCE_PERSON):
+                self._presence_journeys[subentry.subentry_id] = subentry
+                self.presence_active[subentry.subentry_id] = self._is_presence_condition_met(subentry.data)
+                presence_entities.update([subentry.data[CONF_PRESENCE_PERSON], subentry.data.get(CONF_PRESENCE_ZONE, DEFAULT_PRESENCE_ZONE)])
+
+        if presence_entities:
+            self.config_entry.async_on_unload(
+                async_track_state_change_event(self.hass, list(presence_entities), self._async_presence_changed)
+            )
+
+    def _is_presence_condition_met(self, subentry_data) -> bool:
+        """Check if a journey's person is in, or not in, its zone - if we can't tell yet, the journey isn't held back."""
+        person_state = self.hass.states.get(subentry_data[CONF_PRESENCE_PERSON])
+        zone_state = self.hass.states.get(subentry_data.get(CONF_PRESENCE_ZONE, DEFAULT_PRESENCE_ZONE))
+
+        if person_state is None or zone_state is None or person_state.state in [STATE_UNKNOWN, STATE_UNAVAILABLE]:
+            return True
+
+        # Zones list the people in them, which saves having to match the person's state to the zone's name
+        in_zone = person_state.entity_id in zone_state.attributes.get('persons', [])
+
+        if subentry_data.get(CONF_PRESENCE_CONDITION, DEFAULT_PRESENCE_CONDITION) == 'in_zone':
+            return in_zone
+        else:
+            return not in_zone
+
+    @callback
+    def _async_presence_changed(self, event: Event[EventStateChangedData]) -> None:
+        """Re-check the presence conditions using the person or zone that's changed, refreshing any journey whose condition has just been met."""
+        entity_id = event.data['entity_id']
+
+        for subentry_id, subentry in self._presence_journeys.items():
+            if entity_id not in [subentry.data[CONF_PRESENCE_PERSON], subentry.data.get(CONF_PRESENCE_ZONE, DEFAULT_PRESENCE_ZONE)]:
+                continue
+
+            was_active = self.presence_active.get(subentry_id, True)
+            self.presence_active[subentry_id] = self._is_presence_condition_met(subentry.data)
+
+            if self.presence_active[subentry_id] and not was_active:
+                _LOGGER.debug("%s: presence condition met, resuming updates", subentry.title)
+                self.hass.async_create_task(self.async_refresh_journeys({subentry_id}))
+
+            elif was_active and not self.presence_active[subentry_id]:
+                _LOGGER.debug("%s: presence condition no longer met, suspending updates", subentry.title)
+
+    @callback
+    def async_register_interest(self, lease_id: str, subentry_ids: set[str]) -> int:
+        """Register or renew a dashboard card's interest in some journeys, returning how many of them are ours.
+
+        Any journey that's been left at the background rate is refreshed straight away, so the card doesn't start off showing old data.
+        """
+        expires = time.monotonic() + INTEREST_LEASE_TTL
+        stale_journeys = set()
+        leased = 0
+
+        for subentry_id in subentry_ids:
+            if subentry_id not in self.config_entry.subentries:
+                continue
+
+            if not self._has_interest(subentry_id) and self._is_journey_stale(subentry_id) and self.presence_active.get(subentry_id, True):
+                stale_journeys.add(subentry_id)
+
+            self.interest_leases.setdefault(subentry_id, {})[lease_id] = expires
+            leased += 1
+
+        if stale_journeys and self.interest_background_interval > 0 and self.data is not None:
+            _LOGGER.debug("Refreshing %s now that they're being watched", stale_journeys)
+            self.hass.async_create_task(self.async_refresh_journeys(stale_journeys))
+
+        return leased
+
+    @callback
+    def async_release_interest(self, lease_id: str) -> None:
+        """A dashboard card has gone away, so drop its interest in any of our journeys."""
+        for leases in self.interest_leases.values():
+            leases.pop(lease_id, None)
+
+    def _has_interest(self, subentry_id: str) -> bool:
+        # Cards that have closed without saying so stop renewing their leases, so expire them as we go
+        leases = self.interest_leases.get(subentry_id, {})
+        now = time.monotonic()
+
+        for lease_id in [lease_id for lease_id, expires in leases.items() if expires <= now]:
+            del leases[lease_id]
+
+        return len(leases) > 0
+
+    def _is_journey_stale(self, subentry_id: str) -> bool:
+        schedule = self.journey_schedule.get(subentry_id)
+
+        if schedule is None:
+            return True
+
+        return (dt_util.utcnow() - schedule['last_polled']).total_seconds() >= self.update_interval.total_seconds()
+
+    def _get_journey_debouncer(self, subentry_id: str) -> Debouncer:
+        # Trackers tend to report several positions in quick succession, so wait for them to settle before refreshing
+        if subentry_id not in self._journey_debouncers:
+            debouncer = Debouncer(
+                self.hass,
+                _LOGGER,
+                cooldown = TRACKER_REFRESH_DEBOUNCE,
+                immediate = False,
+                function = partial(self.async_refresh_journeys, {subentry_id})
+            )
+            self.config_entry.async_on_unload(debouncer.async_shutdown)
+            self._journey_debouncers[subentry_id] = debouncer
+
+        return self._journey_debouncers[subentry_id]
+
+    async def async_refresh_journeys(self, subentry_ids: set[str]) -> None:
+        """Refresh some of the journeys straight away, outside the regular polls."""
+        if self.data is None:
+            return
+
+        try:
+            returned_data = await self.async_update_data(subentry_ids)
+
+        except Exception as ex:
+            _LOGGER.debug("Error refreshing journeys %s: %s", subentry_ids, ex)
+            return
+
+        # Don't use async_set_updated_data, as that would also push back the next regular poll
+        self.data = returned_data
+        self.async_update_listeners()
+
+    def _get_journey_interval(self, subentry: ConfigSubentry) -> float:
+        """Return how often a journey needs polling, in seconds."""
+        interval = self.update_interval.total_seconds()
+
+        if self.tracker_background_interval > 0 and subentry.data.get(CONF_ORIGIN_TYPE) == 'device_tracker':
+            # Moving refreshes the journey anyway, so this only needs to catch trips leaving while the tracker stays put
+            interval = max(interval, self.tracker_background_interval)
+
+        if self.interest_background_interval > 0 and not self._has_interest(subentry.subentry_id):
+            # Nobody's looking at it, so there's no hurry
+            interval = max(interval, self.interest_background_interval)
+
+        return interval
+
+    def _is_journey_due(self, subentry: ConfigSubentry) -> bool:
+        """Check if a journey needs polling this time round."""
+        if not self.presence_active.get(subentry.subentry_id, True):
+            return False
+
+        # Without a background interval every journey is polled at the normal interval, so there's nothing to schedule
+        if self.tracker_background_interval <= 0 and self.interest_background_interval <= 0:
+            return True
+
+        schedule = self.journey_schedule.get(subentry.subentry_id)
+
+        if schedule is None or self.data is None or subentry.subentry_id not in self.data:
+            return True
+
+        since_last_poll = (dt_util.utcnow() - schedule['last_polled']).total_seconds()
+        return since_last_poll >= self._get_journey_interval(subentry) - JOURNEY_SCHEDULE_SLACK
+
+    async def async_request_refresh(self) -> None:
+        """Request a refresh of every journey, whether it's due or not - e.g. for homeassistant.update_entity."""
+        self._full_poll_requested = True
+        await super().async_request_refresh()
+
+    async def async_update_data(self, subentry_ids: set[str] | None = None, full: bool = False):
+        """Fetch data from the TfNSW API endpoint, recording a timeline of the poll for the diagnostics.
+
+        Only the journeys that are due are polled, or just the given journeys if there are any - the rest keep their current data.
+        A full poll, or one that's been requested, polls every journey.
+        """
+        if subentry_ids is None and self._full_poll_requested:
+            full = True
+            self._full_poll_requested = False
+
+        async with self._poll_lock:
+            return await self._async_poll(subentry_ids, full)
+
+    async def _async_poll(self, subentry_ids: set[str] | None, full: bool = False):
+        poll_timeline = {
+            'start': dt_util.utcnow(),
+            'duration': None,
+            'api_calls': 0,
+            'error': None,
+            'journeys': {}
+        }
+        poll_start = time.monotonic()
+
+        try:
+            with self.tracer.span('poll') as poll_span:
+                if poll_span.recording:
+                    poll_span.set_attribute('config_entry', self.config_entry.title)
+
+                returned_data = await self._async_update_journeys(poll_timeline, poll_start, subentry_ids, full)
+
+                if poll_span.recording:
+                    poll_span.set_attribute('api_calls', poll_timeline['api_calls'])
+
+                return returned_data
+
+        except Exception as ex:
+            poll_timeline['error'] = str(ex)
+            raise
+
+        finally:
+            poll_duration = time.monotonic() - poll_start
+            poll_timeline['duration'] = round(poll_duration, 3)
+            self.poll_history.append(poll_timeline)
+            self.metrics.poll_duration.observe(poll_duration)
+
+    async def _async_update_journeys(self, poll_timeline: dict, poll_start: float, subentry_ids: set[str] | None = None, full: bool = False):
+        """Fetch data for the journeys from the TfNSW API endpoint."""
         # TODO - option to only run between certain times (user-specified, defaulting to 0000 and 0430), and automate the poll rate?
         # TODO - slow down the poll rate if it looks like we might exceed the daily API call count?
         # API usage should be at least halved thanks to some caching that's now in PyTransportNSWv2 3.2.0 onwards
         
-        # First, populate self.daily_api_calls
-        if self.daily_api_calls == 0:
-            # Try and load it
-            try:
-                self.daily_api_calls = await self.hass.async_add_executor_job(
-                    get_api_calls,
-                    f'{self.hass.config.config_dir}/custom_components/{DOMAIN}/.{DOMAIN}_{self.config_entry.data[CONF_API_KEY]}.json',
-                    )
-                
-            except:
-                self.daily_api_calls = 0
-
-
-        # Iterate through all the subentries of the correct type, saving the responses into a list which we'll return at the end
+        # First, populate the daily API calls for each key
+        if not self.key_pool.loaded:
+            await self.key_pool.async_load()
+            self.daily_api_calls = self.key_pool.total_calls_today
+
+        if not self.ledger.loaded:
+            await self.ledger.async_load()
+
+        # The trip plan cache is shared, so its on-disk tier is used while any loaded config entry wants it
+        if self.persist_plan_cache and not self.plan_cache.loaded:
+            await self.plan_cache.async_load()
+
+        if self.snap_to_stop:
+            if not self.stop_index.loaded:
+                await self.stop_index.async_load()
+
+            if self.gtfs_stops_file:
+                await self.stop_index.async_load_gtfs(self.gtfs_stops_file)
+
+        # Iterate through all the subentries of the correct types, saving the responses into a list which we'll return at the end
         returned_data = {}
+        all_subentries = [subentry for subentry in self.config_entry.subentries.values() if subentry.subentry_type in [SUBENTRY_TYPE_JOURNEY, SUBENTRY_TYPE_BOARD]]
+
+        if subentry_ids is not None:
+            due_subentries = [subentry for subentry in all_subentries if subentry.subentry_id in subentry_ids]
+        elif full:
+            due_subentries = all_subentries
+        else:
+            due_subentries = [subentry for subentry in all_subentries if self._is_journey_due(subentry)]
+
+        journey_subentries = [subentry for subentry in due_subentries if subentry.subentry_type == SUBENTRY_TYPE_JOURNEY]
+        board_subentries = [subentry for subentry in due_subentries if subentry.subentry_type == SUBENTRY_TYPE_BOARD]
+
+        # Journeys and boards that aren't being polled this time keep what they've got
+        if self.data is not None:
+            for subentry in all_subentries:
+                if subentry not in due_subentries and subentry.subentry_id in self.data:
+                    returned_data[subentry.subentry_id] = self.data[subentry.subentry_id]
+
+        # Journeys that only differ by destination list, trip count, alerts or sensors - or by their filters, if they're applied locally - can share
+        # their per-destination requests, so work out what each shared request needs to ask for to cover every journey using it
+        self._trip_queries = {}
+        self._trip_query_args = {}
+
+        # Device tracker origins aren't resolved until each journey is polled, so their arguments are worked out for every tracker origin at once,
+        # while stop origins are only merged with journeys from the same stop
+        for subentry in journey_subentries:
+            local_filtering = self._is_filtered_locally(subentry)
+
+            for destination_id in get_destination_ids(subentry.data):
+                query_key, query_args = get_trip_query(subentry.data, subentry.data[CONF_ORIGIN_ID], destination_id, local_filtering, self.journey_buffer)
+                args_key = self._get_trip_query_args_key(subentry, query_key)
+                self._trip_query_args[args_key] = merge_trip_queries(self._trip_query_args.get(args_key), query_args)
+
+        # Fetch all the journeys and boards at once - the shared rate limiter paces the individual requests, so they interleave rather than queue
+        journey_results = await asyncio.gather(
+            *[
+                self._async_update_traced_journey(subentry, returned_data, poll_timeline, poll_start)
+                for subentry in journey_subentries
+            ],
+            *[
+                self._async_update_board(subentry, returned_data, poll_timeline, poll_start)
+                for subentry in board_subentries
+            ],
+            return_exceptions = True
+        )
 
         # Capture the total API counts raised by the integration per poll - used for auto-interval
-        integration_api_count = 0
+        integration_api_count = sum(result for result in journey_results if not isinstance(result, BaseException))
 
-        for subentry in self.config_entry.subentries.values():
-            if subentry.subentry_type == SUBENTRY_TYPE_JOURNEY:
-                # Call the trip API - if the origin is a device tracker, we need to get the location data 
-                if CONF_ORIGIN_TYPE in subentry.data and subentry.data[CONF_ORIGIN_TYPE] == 'device_tracker':
-                    try:
-                        # Should we request a location update?  Obviously that's an asynchronous activity but as the polls are regular we should get the benefit the next time and so on
-                        if self.config_entry.options.get(CONF_REQUEST_LOCATION_UPDATE, False):
-                            _LOGGER.debug(f"Requesting location update from {subentry.data[CONF_ORIGIN_ID]}")
-                            
-                            notify_device = f'notify.{subentry.data[CONF_ORIGIN_ID].split(".")[1]}'
-
-                            await self.hass.services.async_call(
-                                domain = "notify",
-                                service = "send_message",
-                                service_data = {"message": "request_location_update"},
-                                target = {"entity_id": notify_device},
-                                blocking = True
-                            )
+        poll_timeline['api_calls'] = integration_api_count
 
-                        origin_coordinates = find_coordinates(self.hass, subentry.data[CONF_ORIGIN_ID])
+        # Any journey failing still fails the poll as a whole, as it always has, but only once the others have finished - and the calls they made still count
+        for result in journey_results:
+            if isinstance(result, BaseException):
+                self.ledger.async_schedule_save()
+                await self.key_pool.async_save()
+                self.daily_api_calls = self.key_pool.total_calls_today
+                raise result
 
-                        # Create the coordinate string in the format required by the API
-                        origin = f"{origin_coordinates.split(',')[1]}:{origin_coordinates.split(',')[0]}:EPSG:4326"
+        # Update the rolling average - the deque drops the oldest value once the window is full - but only for regular polls
+        if subentry_ids is None:
+            self.rolling_average_api_calls.append(integration_api_count)
 
-                    except Exception as ex:
-                        raise UpdateFailed(f"Error {ex} retrieving coordinates from {subentry.data[CONF_ORIGIN_ID]}") from ex
+        # Tidy up after any deleted journeys, and save the ledger
+        self.ledger.forget({subentry.subentry_id for subentry in self.config_entry.subentries.values()})
 
-                else:
-                    origin = subentry.data[CONF_ORIGIN_ID]
+        for plans in [self.pinned_trips, self.origin_plans, self.tracker_positions]:
+            for subentry_id in set(plans) - set(self.config_entry.subentries):
+                del plans[subentry_id]
+
+        self.ledger.async_schedule_save()
+
+        # Update the persistent API counters
+        await self.key_pool.async_save()
+        self.daily_api_calls = self.key_pool.total_calls_today
+        returned_data[self.config_entry.entry_id] = {API_CALLS: self.daily_api_calls}
+
+        return returned_data
+
+    async def _async_update_traced_journey(self, subentry: ConfigSubentry, returned_data: dict, poll_timeline: dict, poll_start: float) -> int:
+        """Fetch the trips for a single journey, inside its own trace span."""
+        with self.tracer.span('journey') as journey_span:
+            if journey_span.recording:
+                journey_span.set_attribute('journey', subentry.title)
+                journey_span.set_attribute('subentry_id', subentry.subentry_id)
+
+            journey_api_calls = await self._async_update_journey(subentry, returned_data, poll_timeline, poll_start)
+
+            if journey_span.recording:
+                journey_span.set_attribute('api_calls', journey_api_calls)
+
+            return journey_api_calls
+
+    async def _async_update_journey(self, subentry: ConfigSubentry, returned_data: dict, poll_timeline: dict, poll_start: float) -> int:
+        """Fetch the trips for a single journey into returned_data, returning the number of API calls it took."""
+        # Keep track of where the time goes for this journey
+        journey_timeline = {
+            'title': subentry.title,
+            'start': round(time.monotonic() - poll_start, 3),
+            'phases': {},
+            'duration': None,
+            'api_calls': 0,
+            'error': None
+        }
+        poll_timeline['journeys'][subentry.subentry_id] = journey_timeline
+        journey_start = time.monotonic()
+
+        self.journey_schedule[subentry.subentry_id] = {
+            'title': subentry.title,
+            'interval': self._get_journey_interval(subentry),
+            'last_polled': poll_timeline['start']
+        }
+
+        # Call the trip API - if the origin is a device tracker, we need to get the location data 
+        origin_position = None
+
+        if CONF_ORIGIN_TYPE in subentry.data and subentry.data[CONF_ORIGIN_TYPE] == 'device_tracker':
+            with self.tracer.span('location') as location_span:
+                if location_span.recording:
+                    location_span.set_attribute('entity_id', subentry.data[CONF_ORIGIN_ID])
 
                 try:
-                    # We need to convert *_TRANSPORT_TYPE into ints before we do the call
-                    origin_transport_list = [int(transport_type) for transport_type in subentry.data[CONF_ORIGIN_TRANSPORT_TYPE]]
-                    destination_transport_list = [int(transport_type) for transport_type in subentry.data[CONF_DESTINATION_TRANSPORT_TYPE]]
-
-                    _LOGGER.debug(f"Calling get_trips: origin = {origin}, destination_id = {subentry.data[CONF_DESTINATION_ID]}, trip_wait_time = {subentry.data[CONF_TRIP_WAIT_TIME]}, journeys_to_return = {subentry.data[CONF_TRIPS_TO_CREATE]}, origin_transport_type = {subentry.data[CONF_ORIGIN_TRANSPORT_TYPE]}, destination_transport_type = {subentry.data[CONF_DESTINATION_TRANSPORT_TYPE]}, route_filter = {subentry.data[CONF_ROUTE_FILTER]}, run_filter = {subentry.data[CONF_RUN_FILTER]}, include_realtime_location = True, max_changes = {subentry.data[CONF_MAX_CHANGES]}")
-
-                    journey_data = await self.hass.async_add_executor_job(
-                        get_trips,
-                        self.config_entry.data[CONF_API_KEY],
-                        origin,
-                        subentry.data[CONF_DESTINATION_ID],
-                        subentry.data[CONF_TRIP_WAIT_TIME],
-                        origin_transport_list,
-                        destination_transport_list, 
-                        True,
-                        subentry.data[CONF_ROUTE_FILTER],
-                        subentry.data[CONF_RUN_FILTER],
-                        subentry.data[CONF_TRIPS_TO_CREATE],
-                        True,                                       # I need some of the info that's provided by this attribute, regardless of the users' requirements
-                        subentry.data[CONF_ALERTS_SENSOR],
-                        subentry.data[CONF_ALERT_SEVERITY],
-                        subentry.data[CONF_ALERT_TYPES],
-                        subentry.data[CONF_MAX_CHANGES],
-                        )
-
-                    if journey_data is not None and 'journeys_with_data' in journey_data and journey_data['journeys_with_data'] > 0:
-                        if journey_data['journeys_to_return'] > journey_data['journeys_with_data']:
-                            # Try for a more context-sensitive error than just 'failed'
-                            if subentry.data[CONF_ORIGIN_TRANSPORT_TYPE] == ['11']:
-                                # School-bus only trip
-                                _LOGGER.warning (f"{subentry.title}: {journey_data['journeys_to_return']} journeys were requested but only got {journey_data['journeys_with_data']}, most likely because school bus journeys only run on weekdays.")
-                            else:
-                                _LOGGER.warning (f"{subentry.title}: {journey_data['journeys_to_return']} journeys were requested but only got {journey_data['journeys_with_data']} - consider relaxing the journey restrictions.")
-
-                        if 'journeys' in journey_data:
-                            returned_data[subentry.subentry_id] = journey_data['journeys']
+                    # Should we request a location update?  It's sent in the background, and journeys sharing the tracker share the request, so unless
+                    # we're prepared to wait a moment for the new location the plan uses the last known one and the next poll gets the benefit
+                    if self.config_entry.options.get(CONF_REQUEST_LOCATION_UPDATE, False):
+                        self.location_requester.async_request(subentry.data[CONF_ORIGIN_ID])
+
+                        if self.location_update_wait > 0:
+                            got_fix = await self.location_requester.async_wait_for_fix(subentry.data[CONF_ORIGIN_ID], self.location_update_wait)
+
+                            if location_span.recording:
+                                location_span.set_attribute('new_location', got_fix)
+
+                    origin_coordinates = find_coordinates(self.hass, subentry.data[CONF_ORIGIN_ID])
+                    origin_position = (float(origin_coordinates.split(',')[0]), float(origin_coordinates.split(',')[1]))
+                    self.tracker_positions[subentry.subentry_id] = origin_position
+
+                    # Create the coordinate string in the format required by the API
+                    origin = f"{origin_coordinates.split(',')[1]}:{origin_coordinates.split(',')[0]}:EPSG:4326"
+
+                    # Traces end up in the diagnostics and exported files, so they name the tracker rather than saying where it is
+                    traced_origin = subentry.data[CONF_ORIGIN_ID]
+
+                    # Or plan from the nearest stop within walking range, if there is one
+                    if self.snap_to_stop:
+                        nearest_stop_id = self.stop_index.nearest_stop(*origin_position)
+                        self.record_cache_access('stop_snapping', nearest_stop_id is not None)
+
+                        if nearest_stop_id is not None:
+                            _LOGGER.debug("%s: planning from stop %s, the nearest to %s", subentry.title, nearest_stop_id, subentry.data[CONF_ORIGIN_ID])
+                            origin = nearest_stop_id
+                            traced_origin = nearest_stop_id
+
+                        if location_span.recording:
+                            location_span.set_attribute('snapped_stop', nearest_stop_id)
+
+                except Exception as ex:
+                    journey_timeline['error'] = f"Error {ex} retrieving coordinates"
+                    self.metrics.errors[type(ex).__name__] += 1
+                    raise UpdateFailed(f"Error {ex} retrieving coordinates from {subentry.data[CONF_ORIGIN_ID]}") from ex
+
+                finally:
+                    journey_timeline['phases']['location'] = round(time.monotonic() - journey_start, 3)
+
+        else:
+            origin = subentry.data[CONF_ORIGIN_ID]
+            traced_origin = origin
+
+        try:
+            # Only ask for the realtime vehicle data if one of this journey's entities is going to use it
+            include_realtime_location = is_realtime_data_needed(subentry.data)
+
+            journey_data = None
+            journey_api_calls = 0
+            api_error = None
+
+            # If the device tracker hasn't moved far, the last plan still holds - just bring its due times up to date
+            if origin_position is not None:
+                origin_journeys = self._get_origin_journeys(subentry, origin_position)
+                self.record_cache_access('movement_gate', origin_journeys is not None)
+
+                if origin_journeys is not None:
+                    _LOGGER.debug("%s: %s hasn't moved far enough to re-plan", subentry.title, subentry.data[CONF_ORIGIN_ID])
+                    journey_data = {
+                        'journeys_to_return': len(origin_journeys),
+                        'journeys_with_data': len(origin_journeys),
+                        'api_calls': 0,
+                        'journeys': origin_journeys
+                    }
+
+            # If the journey's trips are pinned we only need to refresh their vehicles, unless it's time to re-plan
+            pinned_journeys = self._get_pinned_journeys(subentry) if journey_data is None else None
+
+            if pinned_journeys is not None:
+                with self.tracer.span('pinned_refresh') as pinned_span:
+                    phase_start = time.monotonic()
+                    journey_data, api_calls, api_error = await self._async_refresh_pinned_journeys(subentry, pinned_journeys, include_realtime_location)
+                    journey_timeline['phases']['pinned_refresh'] = round(time.monotonic() - phase_start, 3)
+
+                    journey_api_calls += api_calls
+                    self._record_journey_api_calls(subentry, journey_timeline, api_calls)
+
+                    if pinned_span.recording:
+                        pinned_span.set_attribute('api_calls', api_calls)
+                        pinned_span.set_attribute('replan', journey_data is None and api_error is None)
+
+                    if api_error is not None:
+                        raise api_error
+
+            if journey_data is None:
+                _LOGGER.debug(
+                    "Calling get_trips: origin = %s, destination_id = %s, trip_wait_time = %s, journeys_to_return = %s, origin_transport_type = %s, destination_transport_type = %s, route_filter = %s, run_filter = %s, include_realtime_location = %s, max_changes = %s",
+                    origin,
+                    subentry.data[CONF_DESTINATION_ID],
+                    subentry.data[CONF_TRIP_WAIT_TIME],
+                    subentry.data[CONF_TRIPS_TO_CREATE],
+                    subentry.data[CONF_ORIGIN_TRANSPORT_TYPE],
+                    subentry.data[CONF_DESTINATION_TRANSPORT_TYPE],
+                    subentry.data[CONF_ROUTE_FILTER],
+                    subentry.data[CONF_RUN_FILTER],
+                    include_realtime_location,
+                    subentry.data[CONF_MAX_CHANGES]
+                )
+
+                with self.tracer.span('get_trips') as api_span:
+                    if api_span.recording:
+                        api_span.set_attribute('origin', traced_origin)
+                        api_span.set_attribute('destination', subentry.data[CONF_DESTINATION_ID])
+                        api_span.set_attribute('journeys_to_return', subentry.data[CONF_TRIPS_TO_CREATE])
+                        api_span.set_attribute('include_realtime_location', include_realtime_location)
+
+                    phase_start = time.monotonic()
+                    journey_data, api_calls, api_error = await self._async_get_trips_shared(subentry, origin)
+                    request_latency = time.monotonic() - phase_start
+                    journey_timeline['phases']['get_trips'] = round(request_latency, 3)
+                    self.metrics.request_latency.observe(request_latency)
+
+                    # Count the HTTP requests that were actually made, even if the call ultimately failed
+                    journey_api_calls += api_calls
+                    self._record_journey_api_calls(subentry, journey_timeline, api_calls)
+
+                    if api_span.recording:
+                        api_span.set_attribute('api_calls', api_calls)
+                        if journey_data is not None:
+                            api_span.set_attribute('journeys_with_data', journey_data.get('journeys_with_data'))
+
+                    if api_error is not None:
+                        raise api_error
+
+                self._pin_journeys(subentry, journey_data)
+                self._remember_origin_plan(subentry, origin_position, journey_data)
 
+                # Remember where the planned journeys go from, for planning device tracker journeys from the nearest stop
+                if self.snap_to_stop and journey_data is not None:
+                    self.stop_index.async_add_journey_stops(journey_data.get('journeys', []))
+
+            if journey_data is not None and 'journeys_with_data' in journey_data and journey_data['journeys_with_data'] > 0:
+                if journey_data['journeys_to_return'] > journey_data['journeys_with_data']:
+                    # Try for a more context-sensitive error than just 'failed'
+                    if subentry.data[CONF_ORIGIN_TRANSPORT_TYPE] == ['11']:
+                        # School-bus only trip
+                        _LOGGER.warning("%s: %s journeys were requested but only got %s, most likely because school bus journeys only run on weekdays.", subentry.title, journey_data['journeys_to_return'], journey_data['journeys_with_data'])
                     else:
-                        # No journeys were returned, but the API call itself didn't fail
-                        # Offer a slightly different warning message if it's a forced train journey
-                        if subentry.data[CONF_ORIGIN_TRANSPORT_TYPE]  == ['1']:
-                            _LOGGER.warning (f"{subentry.title}: no journeys returned for this train-only journey - there may be a bus replacement service active at the moment.")
+                        _LOGGER.warning("%s: %s journeys were requested but only got %s - consider relaxing the journey restrictions.", subentry.title, journey_data['journeys_to_return'], journey_data['journeys_with_data'])
+
+                if 'journeys' in journey_data:
+                    # Apply this journey's alert settings - the query itself doesn't depend on them - and drop alerts about parts of the line it doesn't use
+                    for journey in journey_data['journeys']:
+                        if subentry.data[CONF_ALERTS_SENSOR]:
+                            journey['alerts'] = filter_alerts(
+                                journey.get('alerts', []),
+                                subentry.data[CONF_ALERT_SEVERITY],
+                                subentry.data[CONF_ALERT_TYPES],
+                                journey,
+                                [subentry.data[CONF_ORIGIN_ID], *get_destination_ids(subentry.data)]
+                            )
                         else:
-                            _LOGGER.warning(f"{subentry.title}: no journeys returned - consider relaxing the journey restrictions.")
+                            journey['alerts'] = []
 
-                    # Increment the API counter if that info has been returned, and include that in the response also
-                    if API_CALLS in journey_data:
-                        self.daily_api_calls += journey_data[API_CALLS]
-                        integration_api_count += journey_data[API_CALLS]
-                    else:
-                        # The average is 3 calls per journey
-                        self.daily_api_calls += 3
-                        integration_api_count += 3
+                    returned_data[subentry.subentry_id] = journey_data['journeys']
 
-                except Exception as ex:
-                    # This will show entities as unavailable by raising UpdateFailed exception
-                    raise UpdateFailed(f"Error communicating with API for entry {subentry.title}: {ex}") from ex
+            else:
+                # No journeys were returned, but the API call itself didn't fail
+                # Offer a slightly different warning message if it's a forced train journey
+                if subentry.data[CONF_ORIGIN_TRANSPORT_TYPE]  == ['1']:
+                    _LOGGER.warning("%s: no journeys returned for this train-only journey - there may be a bus replacement service active at the moment.", subentry.title)
+                else:
+                    _LOGGER.warning("%s: no journeys returned - consider relaxing the journey restrictions.", subentry.title)
+
+            return journey_api_calls
+
+        except APIRateLimitExceeded as ex:
+            # The shared rate limiter is already cooling down, so keep the last data we had for this journey and carry on with the rest of the poll
+            journey_timeline['error'] = f"{type(ex).__name__}: {ex}"
+            self.metrics.errors[type(ex).__name__] += 1
+            _LOGGER.debug("%s: rate limited, keeping the previous journey data", subentry.title)
+
+            if self.data is not None and subentry.subentry_id in self.data:
+                returned_data[subentry.subentry_id] = self.data[subentry.subentry_id]
+
+            return journey_api_calls
+
+        except Exception as ex:
+            # This will show entities as unavailable by raising UpdateFailed exception
+            journey_timeline['error'] = f"{type(ex).__name__}: {ex}"
+            self.metrics.errors[type(ex).__name__] += 1
+            raise UpdateFailed(f"Error communicating with API for entry {subentry.title}: {ex}") from ex
+
+        finally:
+            journey_timeline['duration'] = round(time.monotonic() - journey_start, 3)
+
+    async def _async_update_board(self, subentry: ConfigSubentry, returned_data: dict, poll_timeline: dict, poll_start: float) -> int:
+        """Fetch a departure board's departures into returned_data with a single request, returning the number of API calls it took."""
+        board_timeline = {
+            'title': subentry.title,
+            'start': round(time.monotonic() - poll_start, 3),
+            'phases': {},
+            'duration': None,
+            'api_calls': 0,
+            'error': None
+        }
+        poll_timeline['journeys'][subentry.subentry_id] = board_timeline
+        board_start = time.monotonic()
+
+        self.journey_schedule[subentry.subentry_id] = {
+            'title': subentry.title,
+            'interval': self._get_journey_interval(subentry),
+            'last_polled': poll_timeline['start']
+        }
+
+        board_api_calls = 0
+
+        try:
+            with self.tracer.span('board') as board_span:
+                if board_span.recording:
+                    board_span.set_attribute('board', subentry.title)
+                    board_span.set_attribute('stop', subentry.data[CONF_ORIGIN_ID])
+
+                departures, board_api_calls, api_error = await self._async_get_departures_pooled(subentry)
+                request_latency = time.monotonic() - board_start
+                board_timeline['phases']['get_departures'] = round(request_latency, 3)
+                self.metrics.request_latency.observe(request_latency)
+                self._record_journey_api_calls(subentry, board_timeline, board_api_calls)
+
+                if board_span.recording:
+                    board_span.set_attribute('api_calls', board_api_calls)
+                    if departures is not None:
+                        board_span.set_attribute('departures', len(departures))
+
+                if api_error is not None:
+                    raise api_error
+
+            if not departures:
+                _LOGGER.warning("%s: no departures returned - consider relaxing the board's filters.", subentry.title)
+
+            returned_data[subentry.subentry_id] = departures or []
+
+            return board_api_calls
+
+        except APIRateLimitExceeded as ex:
+            # As with the journeys, keep the last departures we had and carry on with the rest of the poll
+            board_timeline['error'] = f"{type(ex).__name__}: {ex}"
+            self.metrics.errors[type(ex).__name__] += 1
+            _LOGGER.debug("%s: rate limited, keeping the previous departures", subentry.title)
+
+            if self.data is not None and subentry.subentry_id in self.data:
+                returned_data[subentry.subentry_id] = update_departures_due(self.data[subentry.subentry_id])
+
+            return board_api_calls
+
+        except Exception as ex:
+            board_timeline['error'] = f"{type(ex).__name__}: {ex}"
+            self.metrics.errors[type(ex).__name__] += 1
+            raise UpdateFailed(f"Error communicating with API for entry {subentry.title}: {ex}") from ex
+
+        finally:
+            board_timeline['duration'] = round(time.monotonic() - board_start, 3)
+
+    async def _async_get_departures_pooled(self, subentry: ConfigSubentry) -> tuple:
+        """Call get_departures for a board with the best available API key, failing over to the next one if a key is invalid or rate limited."""
+        api_keys = self.key_pool.get_ordered_keys()
+
+        if not api_keys:
+            return None, 0, UpdateFailed("None of the API keys can be used - they're either invalid or have used up today's quota")
+
+        total_api_calls = 0
+
+        for api_key in api_keys:
+            departures, api_calls, api_error = await async_call_limited(
+                self.hass,
+                api_key,
+                get_departures,
+                api_key,
+                subentry.data[CONF_ORIGIN_ID],
+                [int(transport_type) for transport_type in subentry.data[CONF_ORIGIN_TRANSPORT_TYPE]],
+                subentry.data[CONF_ROUTE_FILTER],
+                subentry.data[CONF_TRIP_WAIT_TIME],
+                subentry.data[CONF_DEPARTURES_TO_SHOW]
+            )
+
+            self.key_pool.record(api_key, api_calls)
+            total_api_calls += api_calls
+
+            if isinstance(api_error, InvalidAPIKey):
+                self.key_pool.mark_invalid(api_key)
+
+            elif not isinstance(api_error, APIRateLimitExceeded):
+                break
+
+        return departures, total_api_calls, api_error
+
+    def _record_journey_api_calls(self, subentry: ConfigSubentry, journey_timeline: dict, api_calls: int) -> None:
+        """Count a journey's API calls everywhere they're reported."""
+        self.daily_api_calls = self.key_pool.total_calls_today
+        self.ledger.record(subentry.subentry_id, api_calls)
+        journey_timeline['api_calls'] += api_calls
+        self.metrics.api_calls[subentry.title] += api_calls
+
+    def _pin_journeys(self, subentry: ConfigSubentry, journey_data: dict | None) -> None:
+        """Pin a journey's freshly planned trips, if trip pinning is on - device tracker origins move, so they're never pinned."""
+        if not self.trip_pinning or subentry.data.get(CONF_ORIGIN_TYPE) == 'device_tracker':
+            return
+
+        if journey_data is not None and journey_data.get('journeys'):
+            self.pinned_trips[subentry.subentry_id] = {
+                'planned': time.monotonic(),
+                'journeys': copy.deepcopy(journey_data['journeys'])
+            }
 
-        # Update the rolling average
-        if len(self.rolling_average_api_calls) < AVERAGE_API_CALLS_WINDOW:
-            # Just add the new value to the end
-            self.rolling_average_api_calls.append(integration_api_count)
         else:
-            self.rolling_average_api_calls = [integration_api_count] + self.rolling_average_api_calls[1:]
+            self.pinned_trips.pop(subentry.subentry_id, None)
+
+    def _get_remaining_journeys(self, subentry: ConfigSubentry, journeys: list, now: datetime | None = None) -> list:
+        """Return the journeys that don't leave before the journey's wait time is up - a fresh plan would no longer include the others."""
+        earliest_departure = (now or dt_util.utcnow()) + timedelta(minutes = subentry.data[CONF_TRIP_WAIT_TIME])
+
+        return [journey for journey in journeys if dt_util.parse_datetime(journey['origin_detail']['departure_time']) > earliest_departure]
+
+    def _has_trip_left(self, subentry: ConfigSubentry, journeys: list) -> bool:
+        """Check if too many of the trips have left to fill the journey's trip slots - without a buffer of extra journeys, that's any of them."""
+        return len(self._get_remaining_journeys(subentry, journeys)) < min(subentry.data[CONF_TRIPS_TO_CREATE], len(journeys))
+
+    def _remember_origin_plan(self, subentry: ConfigSubentry, origin_position: tuple[float, float] | None, journey_data: dict | None) -> None:
+        """Keep a device tracker journey's plan, and where the tracker was, for the movement gate."""
+        if self.movement_radius <= 0 or origin_position is None:
+            return
+
+        if journey_data is not None and journey_data.get('journeys'):
+            self.origin_plans[subentry.subentry_id] = {
+                'planned': time.monotonic(),
+                'position': origin_position,
+                'journeys': copy.deepcopy(journey_data['journeys'])
+            }
+
+        else:
+            self.origin_plans.pop(subentry.subentry_id, None)
+
+    def _get_origin_journeys(self, subentry: ConfigSubentry, origin_position: tuple[float, float]) -> list | None:
+        """Return a copy of a device tracker journey's last plan if the tracker is still within the movement radius, none of its trips have left and a re-plan isn't due."""
+        origin_plan = self.origin_plans.get(subentry.subentry_id)
+
+        if self.movement_radius <= 0 or origin_plan is None:
+            return None
+
+        # The plan's realtime data only gets older, so it's planned again as often as pinned trips are
+        if time.monotonic() - origin_plan['planned'] >= self.replan_interval:
+            return None
+
+        distance_moved = location_util.distance(*origin_plan['position'], *origin_position)
 
-        # Update the persistent API counter
-        self.daily_api_calls = await self.hass.async_add_executor_job(
-            set_api_calls,
-            f'{self.hass.config.config_dir}/custom_components/{DOMAIN}/.{DOMAIN}_{self.config_entry.data[CONF_API_KEY]}.json',
-            self.daily_api_calls
+        if distance_moved is None or distance_moved > self.movement_radius:
+            return None
+
+        if self._has_trip_left(subentry, origin_plan['journeys']):
+            return None
+
+        return update_due(copy.deepcopy(self._get_remaining_journeys(subentry, origin_plan['journeys'])))
+
+    def _get_pinned_journeys(self, subentry: ConfigSubentry) -> list | None:
+        """Return a copy of a journey's pinned trips, or None if it needs a full plan - nothing pinned, a re-plan is due, or a trip has left."""
+        pin = self.pinned_trips.get(subentry.subentry_id)
+
+        if not self.trip_pinning or pin is None:
+            return None
+
+        if time.monotonic() - pin['planned'] >= self.replan_interval:
+            return None
+
+        if self._has_trip_left(subentry, pin['journeys']):
+            return None
+
+        return copy.deepcopy(self._get_remaining_journeys(subentry, pin['journeys']))
+
+    async def _async_refresh_pinned_journeys(self, subentry: ConfigSubentry, journeys: list, include_realtime_location: bool) -> tuple:
+        """Refresh the departure times and vehicles of a journey's pinned trips, returning the journey data, API calls made and any error.
+
+        Returns no data and no error if the trips need re-planning after all, e.g. because a trip has been cancelled or a vehicle has
+        disappeared from the realtime feed.  Fails over to the next API key if a key is invalid or rate limited, as for a full plan.
+        """
+        api_keys = self.key_pool.get_ordered_keys()
+
+        if not api_keys:
+            return None, 0, UpdateFailed("None of the API keys can be used - they're either invalid or have used up today's quota")
+
+        total_api_calls = 0
+
+        for api_key in api_keys:
+            refreshed_journeys, api_calls, api_error = await async_call_limited(
+                self.hass,
+                api_key,
+                refresh_pinned_trips,
+                api_key,
+                copy.deepcopy(journeys),
+                self.vehicle_cache,
+                include_realtime_location
             )
-        returned_data[self.config_entry.entry_id] = {API_CALLS: self.daily_api_calls}
 
-        return returned_data
+            self.key_pool.record(api_key, api_calls)
+            total_api_calls += api_calls
+
+            if isinstance(api_error, InvalidAPIKey):
+                self.key_pool.mark_invalid(api_key)
+
+            elif not isinstance(api_error, APIRateLimitExceeded):
+                break
+
+        journeys, api_calls = refreshed_journeys, total_api_calls
+
+        if isinstance(api_error, APIRateLimitExceeded):
+            return None, api_calls, api_error
+
+        if api_error is not None or journeys is None:
+            # Whatever went wrong, a full plan will sort it out
+            _LOGGER.debug("%s: re-planning pinned trips - %s", subentry.title, api_error or "a vehicle is no longer in the realtime feed")
+            self.pinned_trips.pop(subentry.subentry_id, None)
+            return None, api_calls, None
+
+        self.pinned_trips[subentry.subentry_id]['journeys'] = copy.deepcopy(journeys)
+
+        # The plan has already warned about any shortfall in the number of trips
+        return {
+            'journeys_to_return': len(journeys),
+            'journeys_with_data': len(journeys),
+            'api_calls': api_calls,
+            'journeys': journeys
+        }, api_calls, None
+
+    def _is_filtered_locally(self, subentry: ConfigSubentry) -> bool:
+        return self.local_filtering and can_filter_locally(subentry.data)
+
+    async def _async_get_trips_shared(self, subentry: ConfigSubentry, origin: str) -> tuple:
+        """Get a journey's trips one destination at a time, sharing each request with any other journey in the poll that needs the same one.
+
+        The library makes one request per destination even when given several, so this costs nothing extra for a single journey,
+        but a request shared by several journeys is only made once.  Returns the trips merged back into one result as the library
+        would have, the API calls made by the requests this journey started, and the first error.
+        """
+        queries = []
+        journey_api_calls = 0
+        local_filtering = self._is_filtered_locally(subentry)
+
+        for destination_id in get_destination_ids(subentry.data):
+            query_key, query_args = get_trip_query(subentry.data, origin, destination_id, local_filtering, self.journey_buffer)
+            query = self._trip_queries.get(query_key)
+            self.record_cache_access('trip_requests', query is not None)
+
+            if query is None:
+                query = self.hass.async_create_task(
+                    self._async_get_trips_pooled(origin, self._trip_query_args.get(self._get_trip_query_args_key(subentry, query_key), query_args))
+                )
+                self._trip_queries[query_key] = query
+                queries.append((query, True))
+
+            else:
+                queries.append((query, False))
+
+        # Shielded, so that one journey being cancelled doesn't cancel a request other journeys are waiting on
+        results = await asyncio.gather(*[asyncio.shield(query) for query, _ in queries])
+
+        journeys = []
+        api_error = None
+
+        for (_, started), (query_data, api_calls, query_error) in zip(queries, results):
+            # The calls are counted against the journey that made the request, so they're only counted once
+            if started:
+                journey_api_calls += api_calls
+
+            if query_error is not None and api_error is None:
+                api_error = query_error
+
+            if query_data is not None:
+                # Each journey gets its own copy, as the alerts are filtered per journey
+                journeys.extend(copy.deepcopy(query_data.get('journeys', [])))
+
+        if api_error is not None:
+            return None, journey_api_calls, api_error
+
+        if local_filtering:
+            journeys = JourneyFilter.from_subentry(subentry.data).apply(journeys)
+
+        # Order by arrival time and truncate, just as the library does with multiple destinations, keeping any buffer of extra journeys
+        journeys_to_return = subentry.data[CONF_TRIPS_TO_CREATE]
+        journeys = sorted(journeys, key = lambda journey: dt_util.parse_datetime(journey['destination_detail']['arrival_time']))[:journeys_to_return + self.journey_buffer]
+
+        # The buffer's a bonus, so only warn if there aren't enough journeys for the trips themselves
+        return {
+            'journeys_to_return': journeys_to_return,
+            'journeys_with_data': min(len(journeys), journeys_to_return),
+            'api_calls': journey_api_calls,
+            'journeys': journeys
+        }, journey_api_calls, None
+
+    def _get_trip_query_args_key(self, subentry: ConfigSubentry, query_key: tuple) -> tuple:
+        """Return the key a journey's merged trip request arguments are kept under - its configured origin, or any device tracker for tracker journeys."""
+        if subentry.data.get(CONF_ORIGIN_TYPE) == 'device_tracker':
+            return ('device_tracker', *query_key[1:])
+
+        return query_key
+
+    async def _async_get_trips_pooled(self, origin: str, query_args: dict) -> tuple:
+        """Call get_trips for one destination with the best available API key, failing over to the next one if a key is invalid or rate limited."""
+        cache_key, bucket_end = self.plan_cache.get_key(origin, query_args)
+
+        # Only the first poll after a restart or reload is served from the plan cache - every poll after that should get fresh realtime data
+        if self.data is None:
+            journey_data = self.plan_cache.get(cache_key)
+            self.record_cache_access('trip_plans', journey_data is not None)
+
+            if journey_data is not None:
+                return journey_data, 0, None
+
+        api_keys = self.key_pool.get_ordered_keys()
+
+        if not api_keys:
+            return None, 0, UpdateFailed("None of the API keys can be used - they're either invalid or have used up today's quota")
+
+        total_api_calls = 0
+
+        for api_key in api_keys:
+            journey_data, api_calls, api_error = await async_call_limited(
+                self.hass,
+                api_key,
+                get_trips,
+                api_key,
+                origin,
+                query_args['destination_id'],
+                query_args['trip_wait_time'],
+                query_args['origin_transport_types'],
+                query_args['destination_transport_types'],
+                True,
+                query_args['route_filter'],
+                query_args['run_filter'],
+                get_journeys_to_request(query_args),
+                query_args['include_realtime_location'],
+                True,                                       # Alerts come back in the trip response at no extra cost, so get them all and filter them locally
+                'all',
+                ['all'],
+                query_args['max_changes'],
+                self.vehicle_cache,
+            )
+
+            self.key_pool.record(api_key, api_calls)
+            total_api_calls += api_calls
+
+            if isinstance(api_error, InvalidAPIKey):
+                self.key_pool.mark_invalid(api_key)
+
+            elif not isinstance(api_error, APIRateLimitExceeded):
+                # Either it worked or it failed for reasons that another key won't fix
+                break
+
+        if api_error is None and journey_data is not None:
+            self.plan_cache.set(cache_key, journey_data, bucket_end, query_args['trip_wait_time'])
+            self.plan_cache.async_schedule_save()
+
+        return journey_data, total_api_calls, api_error
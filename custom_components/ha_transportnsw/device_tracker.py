@@ -3,6 +3,7 @@
 from __future__ import annotations
 from typing import Tuple
 from dataclasses import dataclass
+from datetime import datetime, timedelta
 
 import logging
 
@@ -16,8 +17,11 @@ from homeassistant.const import CONF_NAME
 from homeassistant.config_entries import ConfigEntry, ConfigSubentry
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers import entity_registry
+from homeassistant.util import dt as dt_util
+from homeassistant.util import location as location_util
 
 from . import TransportNSWConfigEntry
 from .const import (
@@ -37,6 +41,8 @@ from .const import (
     CONF_TRIPS_TO_CREATE,
     DEVICE_TRACKER_LOOKUPS,
     DOMAIN,
+    INTERPOLATION_INTERVAL,
+    INTERPOLATION_MIN_MOVE,
     JOURNEY_ICONS,
     SUBENTRY_TYPE_JOURNEY,
     TFNSW_ATTRIBUTION
@@ -46,7 +52,9 @@ from .helpers import (
     remove_entity,
     extract_from_hierarchy,
     get_journey_data,
+    is_tracker_enabled,
 )
+from .interpolation import VehicleTrack
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -61,6 +69,7 @@ class TransportNSWTrackerEntityDescription(TrackerEntityDescription):
     state_fn: Callable[[Any], Any] | None = None
     attrs_path: str | None = None
     attrs_friendly: str | None = None
+    interpolated_leg: str | None = None
 
 # Subentry-level sensor definitions
 DEVICE_TRACKER_SENSORS: tuple[TransportNSWTrackerEntityDescription, ...] = (
@@ -69,14 +78,16 @@ DEVICE_TRACKER_SENSORS: tuple[TransportNSWTrackerEntityDescription, ...] = (
         name=CONF_FIRST_LEG_DEVICE_TRACKER_FRIENDLY,
         state_path = "origin_transport_detail.coords",
         attrs_path = ['origin_real_time_trip_id', 'origin_gtfs_trip_id'],
-        attrs_friendly = ['realtime trip id', 'gtfs trip id']
+        attrs_friendly = ['realtime trip id', 'gtfs trip id'],
+        interpolated_leg = 'origin'
     ),
     TransportNSWTrackerEntityDescription(
         key=CONF_LAST_LEG_DEVICE_TRACKER,
         name=CONF_LAST_LEG_DEVICE_TRACKER_FRIENDLY,
         state_path = "destination_transport_detail.coords",
         attrs_path = ['destination_real_time_trip_id', 'destination_gtfs_trip_id'],
-        attrs_friendly = ['realtime trip id', 'gtfs trip id']
+        attrs_friendly = ['realtime trip id', 'gtfs trip id'],
+        interpolated_leg = 'destination'
     ),
     TransportNSWTrackerEntityDescription(
         key=CONF_ORIGIN_DEVICE_TRACKER,
@@ -94,24 +105,6 @@ DEVICE_TRACKER_SENSORS: tuple[TransportNSWTrackerEntityDescription, ...] = (
     ),
 )
 
-def is_tracker_enabled(tracker: str, data, origin_type: str) -> bool:
-    # Determine if the device tracker sensor has been enabled in the options
-    # There are a few combinations so doing it here is neater for overall code flow
-    try:
-        if origin_type == 'stop':
-            possible_values = ['always', 'if_not_duplicated']
-        else:
-            possible_values = ['always', 'if_not_duplicated', 'if_device_tracker_journey']
-
-        if data[tracker] in possible_values:
-            return True
-        else:
-            return False
-
-    except:
-        return False
-
-
 def get_device_tracker_name(key, subentry_data, journey_data, device_suffix, leg_suffix) -> str:
     # This function reserved for future naming convention changes...
 
@@ -198,9 +191,71 @@ class TransportNSWDeviceTracker(CoordinatorEntity, TrackerEntity):
         else:
             self._hide_if_duplicated = False
 
+        # Dead reckoning between polls, for the first and last leg vehicles if it's enabled
+        self._interpolate = coordinator.interpolate_vehicles and description.interpolated_leg is not None
+        self._track = None
+        self._track_journey = None
+        self._interpolated_position = None
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+
+        if self._interpolate:
+            self._update_track()
+            self.async_on_remove(
+                async_track_time_interval(self.hass, self._async_interpolate, timedelta(seconds = INTERPOLATION_INTERVAL))
+            )
+
+    def _update_track(self) -> None:
+        # Each poll brings new journey data, whereas the countdown only updates the due times in place - so only start again from
+        # where the vehicle really is when the journey's data is new, or the trips have moved up
+        journey_data = get_journey_data(self.coordinator.data, self.subentry.subentry_id, self.journey_index)
+        if journey_data is not None and journey_data is self._track_journey:
+            return
+
+        self._interpolated_position = None
+        self._track = None
+        self._track_journey = journey_data
+
+        if journey_data is not None and self.latitude is not None and self.longitude is not None:
+            self._track = VehicleTrack.from_journey(
+                journey_data,
+                self.entity_description.interpolated_leg,
+                dt_util.utcnow().timestamp(),
+                float(self.latitude),
+                float(self.longitude)
+            )
+
+    @callback
+    def _async_interpolate(self, now: datetime) -> None:
+        """Move the vehicle along towards the next stop on its leg, if it's moved far enough to be worth a state write."""
+        if self._track is None:
+            return
+
+        latitude, longitude = self._track.position_at(now.timestamp())
+
+        distance_moved = location_util.distance(self.latitude, self.longitude, latitude, longitude)
+        if distance_moved is None or distance_moved < INTERPOLATION_MIN_MOVE:
+            return
+
+        self._interpolated_position = (latitude, longitude)
+
+        self.coordinator.metrics.async_write_entity_state(self)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Update the device tracker with the latest data from the coordinator."""
+        if self._interpolate:
+            self._update_track()
+
+        self.coordinator.metrics.async_write_entity_state(self)
+
     @property
     def latitude(self) -> float | None:
         """Return latitude value of the vehicle/location"""
+        if self._interpolated_position is not None:
+            return self._interpolated_position[0]
+
         try:
             # Use the extended entity_description attributes to work out where and how to return the sensor state
             journey_data = get_journey_data(self.coordinator.data, self.subentry.subentry_id, self.journey_index)
@@ -215,6 +270,9 @@ class TransportNSWDeviceTracker(CoordinatorEntity, TrackerEntity):
     @property
     def longitude(self) -> float | None:
         """Return latitude value of the vehicle/location"""
+        if self._interpolated_position is not None:
+            return self._interpolated_position[1]
+
         try:
             # Use the extended entity_description attributes to work out where and how to return the sensor state
             journey_data = get_journey_data(self.coordinator.data, self.subentry.subentry_id, self.journey_index)
@@ -338,6 +396,9 @@ class TransportNSWDeviceTracker(CoordinatorEntity, TrackerEntity):
 
                         attrs[attr_friendly] = attr_value
 
+                if self._interpolate:
+                    attrs['estimated position'] = self._interpolated_position is not None
+
         finally:
             # Always make sure there's the appropriate attribution
             attrs['attribution'] = TFNSW_ATTRIBUTION
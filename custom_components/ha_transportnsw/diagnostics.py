@@ -0,0 +1,99 @@
+"""Diagnostics support for the Transport NSW Mk II integration."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.const import CONF_API_KEY
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from . import TransportNSWConfigEntry
+from .const import CONF_ADDITIONAL_API_KEYS
+from .coordinator import TransportNSWCoordinator
+
+TO_REDACT = {CONF_API_KEY, CONF_ADDITIONAL_API_KEYS}
+
+
+def get_cache_ratios(cache_stats: dict) -> dict[str, Any]:
+    # Convert the raw hit/miss counts into something a bit more readable
+    cache_ratios = {}
+
+    for cache_name, (hits, misses) in cache_stats.items():
+        total = hits + misses
+        cache_ratios[cache_name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 3) if total > 0 else None
+        }
+
+    return cache_ratios
+
+
+def get_poll_history(coordinator: TransportNSWCoordinator) -> list[dict[str, Any]]:
+    # Return the poll timelines, oldest first, with the timestamps converted into strings
+    poll_history = []
+
+    for poll_timeline in coordinator.poll_history:
+        poll_history.append({
+            **poll_timeline,
+            'start': poll_timeline['start'].isoformat(),
+            'journeys': {subentry_id: dict(journey_timeline) for subentry_id, journey_timeline in poll_timeline['journeys'].items()}
+        })
+
+    return poll_history
+
+
+def get_polling_schedule(coordinator: TransportNSWCoordinator) -> dict[str, Any]:
+    # Return when each journey was last polled, and how often
+    polling_schedule = {}
+
+    for subentry_id, schedule in coordinator.journey_schedule.items():
+        polling_schedule[subentry_id] = {
+            **schedule,
+            'last_polled': schedule['last_polled'].isoformat() if schedule.get('last_polled') is not None else None
+        }
+
+    return polling_schedule
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, config_entry: TransportNSWConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: TransportNSWCoordinator = config_entry.runtime_data.coordinator
+
+    diagnostics_data = {
+        'entry': {
+            'title': config_entry.title,
+            'version': config_entry.version,
+            'data': dict(config_entry.data),
+            'options': dict(config_entry.options)
+        },
+        'subentries': {
+            subentry.subentry_id: {
+                'title': subentry.title,
+                'subentry_type': subentry.subentry_type,
+                'data': dict(subentry.data)
+            }
+            for subentry in config_entry.subentries.values()
+        },
+        'coordinator': {
+            'last_update_success': coordinator.last_update_success,
+            'update_interval': coordinator.update_interval.total_seconds() if coordinator.update_interval else None,
+            'daily_api_calls': coordinator.daily_api_calls,
+            'rolling_average_api_calls': list(coordinator.rolling_average_api_calls),
+            'api_key_usage': coordinator.key_pool.get_usage(),
+            'journey_api_calls_today': coordinator.ledger.calls_since(dt_util.start_of_local_day())
+        },
+        'polling_schedule': get_polling_schedule(coordinator),
+        'presence_active': dict(coordinator.presence_active),
+        'cache_stats': get_cache_ratios(coordinator.cache_stats),
+        'plan_cache': coordinator.plan_cache.get_stats(),
+        'location_updates': coordinator.location_requester.get_stats(),
+        'poll_history': get_poll_history(coordinator),
+        'traces': coordinator.tracer.export()
+    }
+
+    return async_redact_data(diagnostics_data, TO_REDACT)
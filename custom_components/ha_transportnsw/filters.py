@@ -0,0 +1,107 @@
+"""Local journey filtering for the Transport NSW Mk II integration."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ALL_TRANSPORT_TYPE_NUMERIC,
+    CONF_DESTINATION_TRANSPORT_TYPE,
+    CONF_MAX_CHANGES,
+    CONF_ORIGIN_TRANSPORT_TYPE,
+    CONF_ROUTE_FILTER,
+    CONF_RUN_FILTER,
+    CONF_TRIP_WAIT_TIME,
+    ORIGIN_TRANSPORT_TYPE_LIST
+)
+
+# The library reports each leg's mode by name, so map the names back to the transport types the filters use
+MODE_TRANSPORT_TYPES = dict(zip(ORIGIN_TRANSPORT_TYPE_LIST, ALL_TRANSPORT_TYPE_NUMERIC))
+WALK_TRANSPORT_TYPE = 99
+
+
+def can_filter_locally(subentry_data) -> bool:
+    # Journeys that accept a walking first or last leg can't be filtered locally, as the wider request only reports on
+    # the first and last vehicle legs - whether there's a walk either side of them isn't in the returned data
+    for transport_types in [subentry_data[CONF_ORIGIN_TRANSPORT_TYPE], subentry_data[CONF_DESTINATION_TRANSPORT_TYPE]]:
+        if WALK_TRANSPORT_TYPE in [int(transport_type) for transport_type in transport_types]:
+            return False
+
+    return True
+
+
+class JourneyFilter:
+    """A journey's transport type, route, run, change and wait time filters, applied locally to a wider set of returned journeys.
+
+    This mirrors the library's strict filtering - the first vehicle leg has to be one of the origin transport types and match the
+    route and run filters, and the last vehicle leg has to be one of the destination transport types.
+    """
+
+    __slots__ = ('origin_transport_types', 'destination_transport_types', 'route_filter', 'run_filter', 'max_changes', 'trip_wait_time')
+
+    def __init__(
+        self,
+        origin_transport_types: list[int],
+        destination_transport_types: list[int],
+        route_filter: str = '',
+        run_filter: str = '',
+        max_changes: int = 9,
+        trip_wait_time: int = 0
+    ) -> None:
+        self.origin_transport_types = frozenset(origin_transport_types)
+        self.destination_transport_types = frozenset(destination_transport_types)
+        self.route_filter = route_filter.lower()
+        self.run_filter = run_filter.lower()
+        self.max_changes = max_changes
+        self.trip_wait_time = trip_wait_time
+
+    @classmethod
+    def from_subentry(cls, subentry_data) -> JourneyFilter:
+        return cls(
+            [int(transport_type) for transport_type in subentry_data[CONF_ORIGIN_TRANSPORT_TYPE]],
+            [int(transport_type) for transport_type in subentry_data[CONF_DESTINATION_TRANSPORT_TYPE]],
+            subentry_data[CONF_ROUTE_FILTER],
+            subentry_data[CONF_RUN_FILTER],
+            subentry_data[CONF_MAX_CHANGES],
+            subentry_data[CONF_TRIP_WAIT_TIME]
+        )
+
+    @staticmethod
+    def _mode_matches(transport_detail: dict, transport_types: frozenset[int]) -> bool:
+        # As per the library, a transport type of 0 means any mode
+        return 0 in transport_types or MODE_TRANSPORT_TYPES.get(transport_detail.get('type')) in transport_types
+
+    def matches(self, journey: dict, earliest_departure: datetime) -> bool:
+        """Check a single journey against the filters."""
+        origin_transport_detail = journey['origin_transport_detail']
+
+        if not self._mode_matches(origin_transport_detail, self.origin_transport_types):
+            return False
+
+        if not self._mode_matches(journey['destination_transport_detail'], self.destination_transport_types):
+            return False
+
+        if self.route_filter:
+            line_name_short = (origin_transport_detail.get('line_name_short') or '').lower()
+            line_name = (origin_transport_detail.get('line_name') or '').lower()
+
+            if self.route_filter not in line_name_short and self.route_filter not in line_name:
+                return False
+
+        if self.run_filter and self.run_filter not in (origin_transport_detail.get('run_name') or '').lower():
+            return False
+
+        if journey.get('changes', 0) > self.max_changes:
+            return False
+
+        departure_time = dt_util.parse_datetime(journey['origin_detail']['departure_time'])
+        return departure_time is not None and departure_time >= earliest_departure
+
+    def apply(self, journeys: list[dict], now: datetime | None = None) -> list[dict]:
+        """Return the journeys that pass the filters, in their original order."""
+        # The API plans from the current time plus the wait time, to the minute, so allow for that rounding
+        earliest_departure = (now or dt_util.utcnow()).replace(second = 0, microsecond = 0) + timedelta(minutes = self.trip_wait_time)
+
+        return [journey for journey in journeys if self.matches(journey, earliest_departure)]
@@ -1,14 +1,17 @@
 """Helper functions for TransportNSWv2 API"""
 from TransportNSWv2 import TransportNSWv2, InvalidAPIKey, APIRateLimitExceeded, StopError, TripError
+import copy
 import logging
 from typing import List
 import json
 from pathlib import Path
+import requests
+import threading
 #import pytz
 #import tzlocal
 #import time
 
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import (
     entity_registry as er,
@@ -17,12 +20,15 @@ from homeassistant.helpers import (
 from homeassistant.util import dt as dt_util
 
 from .const import (
+    ALERT_PRIORITIES,
     API_CALLS,
     CONF_CHANGES_SENSOR,
     CONF_DELAY_SENSOR,
     CONF_DESTINATION_DETAIL_SENSOR,
     CONF_DESTINATION_DEVICE_TRACKER,
+    CONF_DESTINATION_ID,
     CONF_DESTINATION_NAME_SENSOR,
+    CONF_DESTINATION_TRANSPORT_TYPE,
     CONF_DURATION_SENSOR,
     CONF_FIRST_LEG_DEPARTURE_TIME_SENSOR,
     CONF_FIRST_LEG_DEVICE_TRACKER,
@@ -44,17 +50,66 @@ from .const import (
     CONF_LAST_LEG_TRAIN_SET_SENSOR,
     CONF_LAST_LEG_TRANSPORT_NAME_SENSOR,
     CONF_LAST_LEG_TRANSPORT_TYPE_SENSOR,
+    CONF_MAX_CHANGES,
     CONF_ORIGIN_DETAIL_SENSOR,
     CONF_ORIGIN_DEVICE_TRACKER,
     CONF_ORIGIN_NAME_SENSOR,
+    CONF_ORIGIN_TRANSPORT_TYPE,
+    CONF_ORIGIN_TYPE,
+    CONF_ROUTE_FILTER,
+    CONF_RUN_FILTER,
+    CONF_TRIP_WAIT_TIME,
+    CONF_TRIPS_TO_CREATE,
     DEFAULT_DESTINATION_DEVICE_TRACKER,
     DEFAULT_FIRST_LEG_DEVICE_TRACKER,
     DEFAULT_LAST_LEG_DEVICE_TRACKER,
     DEFAULT_ORIGIN_DEVICE_TRACKER,
-    DOMAIN
+    DEPARTURE_MON_TIMEOUT,
+    DEPARTURE_MON_URL,
+    DOMAIN,
+    LOCAL_FILTER_CANDIDATE_FACTOR,
+    LOCAL_FILTER_TRANSPORT_TYPES,
+    PINNED_TRIP_DEPARTURES,
+    REALTIME_DATA_SENSORS,
+    TRANSPORT_TYPE
 )
+from .realtime import CachedTransportNSWv2, VehicleCache
+
 _LOGGER = logging.getLogger(__name__)
 
+# Per-thread count of the keyed API requests made by the helpers, so each executor job can tell how many calls it actually used
+# Also holds the thread's pacer, if it has one, which takes a rate limit token for each request after the job's first
+_api_call_counter = threading.local()
+
+
+def count_api_calls(api_calls: int = 1) -> None:
+    # Called just before the requests are made, so the pacer can hold them back until the rate limit allows
+    pacer = getattr(_api_call_counter, 'pacer', None)
+
+    for _ in range(api_calls):
+        # The first request's token was taken before the job was started
+        if pacer is not None and getattr(_api_call_counter, 'calls', 0) > 0:
+            pacer()
+
+        _api_call_counter.calls = getattr(_api_call_counter, 'calls', 0) + 1
+
+
+def call_counted(func, *args, pacer = None):
+    """Run a blocking API helper, returning its result, the number of API requests it made and any exception it raised."""
+    # Failed calls still count towards the daily quota, so the exception is returned rather than raised
+    _api_call_counter.calls = 0
+    _api_call_counter.pacer = pacer
+
+    try:
+        return func(*args), _api_call_counter.calls, None
+
+    except Exception as ex:
+        return None, _api_call_counter.calls, ex
+
+    finally:
+        _api_call_counter.pacer = None
+
+
 
 def get_journey_data(coordinator_data, subentry_id: str, journey_index: int):
     """Check to make sure that there is in fact journey data for this specific journey, otherwise return None safely."""
@@ -109,9 +164,191 @@ def get_device_trackers(hass: HomeAssistant, entity_filter: str):
     return device_trackers
 
 
+def is_tracker_enabled(tracker: str, data, origin_type: str) -> bool:
+    # Determine if the device tracker sensor has been enabled in the options
+    # There are a few combinations so doing it here is neater for overall code flow
+    try:
+        if origin_type == 'stop':
+            possible_values = ['always', 'if_not_duplicated']
+        else:
+            possible_values = ['always', 'if_not_duplicated', 'if_device_tracker_journey']
+
+        if data[tracker] in possible_values:
+            return True
+        else:
+            return False
+
+    except:
+        return False
+
+
+def is_realtime_data_needed(subentry_data) -> bool:
+    # Work out if any of the journey's entities need the realtime vehicle feed - it's an extra API call per leg,
+    # and only the vehicle device trackers and the occupancy and train set sensors use what it returns
+    origin_type = subentry_data.get(CONF_ORIGIN_TYPE, 'stop')
+
+    for tracker in [CONF_FIRST_LEG_DEVICE_TRACKER, CONF_LAST_LEG_DEVICE_TRACKER]:
+        if is_tracker_enabled(tracker, subentry_data.get('device_trackers', {}), origin_type):
+            return True
+
+    for option_group, sensors in REALTIME_DATA_SENSORS.items():
+        for sensor in sensors:
+            if subentry_data.get(option_group, {}).get(sensor, False):
+                return True
+
+    return False
+
+
+def filter_alerts(alerts, alert_severity: str, alert_types: List[str], journey: dict | None = None, stop_ids: List[str] = []) -> list:
+    # Return the alerts that are at least as severe as alert_severity and of one of the alert_types, as the library would have
+    # Alerts of an unknown priority are treated as high, again to match the library
+    # If the journey is given, only keep the alerts that affect a line or stop it uses - stop_ids adds any other stops to count as used, such as the configured ones
+    if alert_severity.lower() == 'none':
+        return []
+
+    minimum_priority = 0 if alert_severity.lower() == 'all' else ALERT_PRIORITIES.get(alert_severity.lower(), 4)
+    alert_types = [alert_type.lower() for alert_type in alert_types]
+
+    return [
+        alert for alert in alerts
+        if ALERT_PRIORITIES.get(str(alert.get('priority', '')).lower(), 4) >= minimum_priority
+        and ('all' in alert_types or str(alert.get('type', '')).lower() in alert_types)
+        and (journey is None or is_alert_for_journey(alert, journey, stop_ids))
+    ]
+
+
+def is_alert_for_journey(alert, journey: dict, stop_ids: List[str] = []) -> bool:
+    # An alert comes back on every leg of the line it's about, so check it affects a line the journey travels on or a stop it uses
+    # Only the first and last vehicles' lines are known, so a journey with vehicles in between keeps every line alert, and an alert that
+    # doesn't say what it affects is always kept
+    affected = alert.get('affected', {})
+    affected_lines = affected.get('lines', [])
+    affected_stops = affected.get('stops', [])
+
+    if not affected_lines and not affected_stops:
+        return True
+
+    journey_lines = {
+        journey.get(f'{leg}_transport_detail', {}).get(line_name)
+        for leg in ['origin', 'destination']
+        for line_name in ['line_name', 'line_name_short']
+    } - {None}
+
+    for affected_line in affected_lines:
+        if journey.get('changes', 0) > 1 or {affected_line.get('number'), affected_line.get('disassembledName')} & journey_lines:
+            return True
+
+    journey_stops = {
+        *stop_ids,
+        journey.get('origin_detail', {}).get('stop_id'),
+        journey.get('destination_detail', {}).get('stop_id'),
+        *[stop.get('id') for stop in journey.get('stop_list', [])]
+    } - {None}
+
+    for affected_stop in affected_stops:
+        # Alerts can name a station or one of its platforms, so the stop's parent counts as well
+        if {affected_stop.get('id'), affected_stop.get('parent', {}).get('id'), affected_stop.get('properties', {}).get('stopId')} & journey_stops:
+            return True
+
+    return False
+
+
+def get_destination_ids(subentry_data) -> List[str]:
+    # Device tracker journeys store their single destination as a plain string, everything else as a list
+    destination_ids = subentry_data[CONF_DESTINATION_ID]
+
+    return [destination_ids] if isinstance(destination_ids, str) else list(destination_ids)
+
+
+def get_trip_query(subentry_data, origin: str, destination_id: str, local_filtering: bool = False, journey_buffer: int = 0) -> tuple[tuple, dict]:
+    # Return the key and the get_trips arguments for one destination of a journey - journeys with the same key can share the request
+    # The key starts with the origin actually sent to the API, so a device tracker is keyed by its coordinates or the stop it snapped to
+    # Any buffer of extra journeys is asked for on top of the journey's trips
+    journeys_to_return = subentry_data[CONF_TRIPS_TO_CREATE] + journey_buffer
+    origin_transport_types = sorted(int(transport_type) for transport_type in subentry_data[CONF_ORIGIN_TRANSPORT_TYPE])
+    destination_transport_types = sorted(int(transport_type) for transport_type in subentry_data[CONF_DESTINATION_TRANSPORT_TYPE])
+
+    query = {
+        'destination_id': destination_id,
+        'trip_wait_time': subentry_data[CONF_TRIP_WAIT_TIME],
+        'origin_transport_types': origin_transport_types,
+        'destination_transport_types': destination_transport_types,
+        'route_filter': subentry_data[CONF_ROUTE_FILTER],
+        'run_filter': subentry_data[CONF_RUN_FILTER],
+        'max_changes': subentry_data[CONF_MAX_CHANGES],
+        'journeys_to_return': journeys_to_return,
+        'include_realtime_location': is_realtime_data_needed(subentry_data)
+    }
+
+    if local_filtering:
+        # A wider request that only depends on the origin and destination - the journey's own filters are applied to the result
+        # Extra candidates are only needed if those filters are going to throw some of the wider request's journeys away
+        query.update({
+            'origin_transport_types': LOCAL_FILTER_TRANSPORT_TYPES,
+            'destination_transport_types': LOCAL_FILTER_TRANSPORT_TYPES,
+            'route_filter': '',
+            'run_filter': '',
+            'discards_journeys': (
+                set(origin_transport_types) != set(LOCAL_FILTER_TRANSPORT_TYPES)
+                or set(destination_transport_types) != set(LOCAL_FILTER_TRANSPORT_TYPES)
+                or subentry_data[CONF_ROUTE_FILTER] != ''
+                or subentry_data[CONF_RUN_FILTER] != ''
+            )
+        })
+
+        return (origin, destination_id), query
+
+    query_key = (
+        origin,
+        destination_id,
+        subentry_data[CONF_TRIP_WAIT_TIME],
+        tuple(origin_transport_types),
+        tuple(destination_transport_types),
+        subentry_data[CONF_ROUTE_FILTER].lower(),
+        subentry_data[CONF_RUN_FILTER].lower(),
+        subentry_data[CONF_MAX_CHANGES]
+    )
+
+    return query_key, query
+
+
+def merge_trip_queries(query: dict | None, other_query: dict) -> dict:
+    # Widen a shared request to cover another journey using it - enough trips, starting early enough, with enough changes and realtime data if needed
+    if query is None:
+        return dict(other_query)
+
+    merged_query = {
+        **query,
+        'trip_wait_time': min(query['trip_wait_time'], other_query['trip_wait_time']),
+        'max_changes': max(query['max_changes'], other_query['max_changes']),
+        'journeys_to_return': max(query['journeys_to_return'], other_query['journeys_to_return']),
+        'include_realtime_location': query['include_realtime_location'] or other_query['include_realtime_location']
+    }
+
+    if 'discards_journeys' in query:
+        # A journey waiting longer or allowing fewer changes than the shared request also throws some of its journeys away
+        merged_query['discards_journeys'] = (
+            query['discards_journeys']
+            or other_query['discards_journeys']
+            or query['trip_wait_time'] != other_query['trip_wait_time']
+            or query['max_changes'] != other_query['max_changes']
+        )
+
+    return merged_query
+
+
+def get_journeys_to_request(query: dict) -> int:
+    # The library already asks the API for three times as many journeys as it returns, but it only returns as many as it's asked for -
+    # so extra candidates for a locally filtered request are only asked for when the journeys sharing it are going to discard some
+    if query.get('discards_journeys', False):
+        return query['journeys_to_return'] * LOCAL_FILTER_CANDIDATE_FACTOR
+
+    return query['journeys_to_return']
+
+
 def get_trips (api_key: str, name_origin: str, name_destination: str, journey_wait_time: int = 0, origin_transport_type: int = [1], destination_transport_type: int = [1],
             strict_transport_type: bool = False, route_filter: str = '', run_filter: str = '', journeys_to_return: int = 1, include_realtime_location: bool = True, 
-            include_alerts: bool = False, alert_severity: str = 'high', alert_type: str = ['all'], max_changes: int = 5):
+            include_alerts: bool = False, alert_severity: str = 'high', alert_type: str = ['all'], max_changes: int = 5, vehicle_cache: VehicleCache | None = None):
 
     # Use the Transport NSW API to request trip information
     # Exceptions will be caught by the calling function
@@ -120,8 +357,9 @@ def get_trips (api_key: str, name_origin: str, name_destination: str, journey_wa
         if not include_alerts:
             alert_severity = 'none'
 
-        sleep_time = 0.5            # This will be important later
-        tfnsw = TransportNSWv2()
+        sleep_time = 0              # Requests are paced by the shared per-key rate limiter instead, which takes a token for every request made
+        # Share realtime vehicle lookups with the other journeys in the poll, if we've been given a cache to do it with
+        tfnsw = CachedTransportNSWv2(vehicle_cache or VehicleCache(), count_api_calls)
 
         data = tfnsw.get_trip (api_key = api_key, name_origin = name_origin, name_destination = name_destination, journey_wait_time = journey_wait_time,
             origin_transport_type = origin_transport_type, destination_transport_type = destination_transport_type, strict_transport_type = strict_transport_type, raw_output = False,
@@ -145,12 +383,272 @@ def get_trips (api_key: str, name_origin: str, name_destination: str, journey_wa
     except Exception as ex:
         raise TripError
 
+def get_departures (api_key: str, stop_id: str, transport_types: List[int] = [0], route_filter: str = '', journey_wait_time: int = 0, departures_to_return: int = 10, request_time: datetime | None = None) -> list:
+    # Use the Transport NSW departure monitor to get the upcoming departures from a stop, across every line, in a single request
+    # The library only plans trips, so this makes the request itself
+    # The board starts from now, or from request_time if given, plus any wait time - departures that have already left are never returned
+    # Exceptions will be caught by the calling function
+
+    try:
+        # The API works in Sydney time, whatever HA's time zone is
+        request_time = (request_time or dt_util.utcnow()).astimezone(dt_util.get_time_zone('Australia/Sydney')) + timedelta(minutes = journey_wait_time)
+
+        params = {
+            'outputFormat': 'rapidJSON',
+            'coordOutputFormat': 'EPSG:4326',
+            'mode': 'direct',
+            'type_dm': 'stop',
+            'name_dm': stop_id,
+            'depArrMacro': 'dep',
+            'itdDate': request_time.strftime('%Y%m%d'),
+            'itdTime': request_time.strftime('%H%M'),
+            'TfNSWDM': 'true',
+            'version': '10.2.1.42'
+        }
+
+        headers = {
+            'Authorization': f'apikey {api_key}',
+            'Accept': 'application/json'
+        }
+
+        count_api_calls()
+        response = requests.get(DEPARTURE_MON_URL, params = params, headers = headers, timeout = DEPARTURE_MON_TIMEOUT)
+
+        # As per the library, 403 is a rate limit rather than a bad key
+        if response.status_code == 401:
+            raise InvalidAPIKey
+
+        if response.status_code in [403, 429]:
+            raise APIRateLimitExceeded
+
+        response.raise_for_status()
+        data = response.json()
+
+        if 'stopEvents' not in data:
+            if any(message.get('type') == 'error' for message in data.get('systemMessages', [])):
+                raise StopError(f"{stop_id} isn't a valid stop", "stoperror")
+
+            return []
+
+        now = dt_util.utcnow()
+        earliest_departure = now + timedelta(minutes = journey_wait_time)
+        route_filter = route_filter.lower()
+        departures = []
+
+        for event in data['stopEvents']:
+            transportation = event.get('transportation', {})
+            product_class = transportation.get('product', {}).get('class')
+
+            # As per the library, a transport type of 0 means any mode
+            if 0 not in transport_types and product_class not in transport_types:
+                continue
+
+            line = transportation.get('disassembledName') or ''
+            line_name = transportation.get('number') or ''
+
+            if route_filter and route_filter not in line.lower() and route_filter not in line_name.lower():
+                continue
+
+            planned_time = event.get('departureTimePlanned')
+            departure_time = event.get('departureTimeEstimated') or planned_time
+
+            planned_dt = dt_util.parse_datetime(planned_time or '')
+            departure_dt = dt_util.parse_datetime(departure_time or '')
+
+            if departure_dt is None or departure_dt < earliest_departure:
+                continue
+
+            location = event.get('location', {})
+
+            departures.append({
+                'line': line,
+                'line_name': line_name,
+                'destination': transportation.get('destination', {}).get('name'),
+                'mode': TRANSPORT_TYPE.get(product_class, 'n/a'),
+                'stop_id': location.get('id'),
+                'platform': location.get('disassembledName'),
+                'planned_departure_time': planned_time,
+                'departure_time': departure_time,
+                'delay': round((departure_dt - planned_dt).total_seconds() / 60) if planned_dt is not None else 0,
+                'due': max(round((departure_dt - now).total_seconds() / 60), 0),
+                'real_time': event.get('isRealtimeControlled', False),
+                'cancelled': event.get('isCancelled', False),
+                'realtime_trip_id': event.get('properties', {}).get('RealtimeTripId') or transportation.get('properties', {}).get('RealtimeTripId')
+            })
+
+        # Delays can change the order, so sort by the expected departure time before truncating
+        departures.sort(key = lambda departure: dt_util.parse_datetime(departure['departure_time']))
+
+        return departures[:departures_to_return]
+
+    except InvalidAPIKey:
+        raise InvalidAPIKey
+
+    except APIRateLimitExceeded:
+        raise APIRateLimitExceeded
+
+    except StopError:
+        raise
+
+    except Exception as ex:
+        raise TripError
+
+def update_due (journeys: list, now: datetime | None = None) -> list:
+    # Recalculate the minutes until each journey departs, as the library does, for journeys that weren't just planned
+    now = now or dt_util.utcnow()
+
+    for journey in journeys:
+        departure_time = dt_util.parse_datetime(journey['origin_detail']['departure_time'])
+        if departure_time is not None:
+            journey['due'] = max(round((departure_time - now).total_seconds() / 60), 0)
+
+    return journeys
+
+def update_departures_due (departures: list, now: datetime | None = None) -> list:
+    # Recalculate the minutes until each departure on a board, dropping any that have already gone
+    now = now or dt_util.utcnow()
+    remaining_departures = []
+
+    for departure in departures:
+        departure_time = dt_util.parse_datetime(departure['departure_time'])
+
+        if departure_time is None:
+            remaining_departures.append(departure)
+
+        elif departure_time >= now:
+            departure['due'] = max(round((departure_time - now).total_seconds() / 60), 0)
+            remaining_departures.append(departure)
+
+    return remaining_departures
+
+def get_boarded_legs (journey: dict) -> list:
+    # Return the stop ID and realtime trip ID of each vehicle leg of a planned journey that the departure monitor can look up, as (leg, stop ID, realtime trip ID)
+    # The last vehicle is boarded at the last change, the second-last stop in the stop list - it's only a separate leg if it's a different vehicle
+    legs = []
+    origin_tripid = journey.get('origin_real_time_trip_id')
+    destination_tripid = journey.get('destination_real_time_trip_id')
+    stop_list = journey.get('stop_list', [])
+
+    if origin_tripid is not None:
+        legs.append(('origin', journey['origin_detail']['stop_id'], origin_tripid))
+
+    if destination_tripid is not None and destination_tripid != origin_tripid and len(stop_list) >= 4:
+        legs.append(('destination', stop_list[-2]['id'], destination_tripid))
+
+    return legs
+
+def refresh_departure_times (api_key: str, journeys: list) -> bool:
+    # Bring the realtime departure and arrival times, delay and duration of trips that have already been planned up to date from the departure monitor
+    # One request per stop covers every vehicle boarded there, asked for from the earliest planned departure of the trips leaving from it so they're all on the board
+    # The departure monitor doesn't give arrival times, so the last vehicle's delay is carried through to the planned arrival time
+    # Trips without a realtime trip ID keep what they were planned with
+    # Returns False if a trip has been cancelled or is missing from its stop's board, as it needs planning again
+    legs_by_stop = {}
+    leg_departures = {}
+
+    for journey_index, journey in enumerate(journeys):
+        for leg, stop_id, realtimetripid in get_boarded_legs(journey):
+            legs_by_stop.setdefault(stop_id, []).append((journey_index, leg, realtimetripid))
+
+    for stop_id, stop_legs in legs_by_stop.items():
+        # The last vehicle leaves after the journey's first, so the first's planned departure is early enough for both
+        planned_times = [dt_util.parse_datetime(journeys[journey_index]['origin_detail'].get('departure_time_planned') or '') for journey_index, _, _ in stop_legs]
+        planned_times = [planned_time for planned_time in planned_times if planned_time is not None]
+
+        departures = get_departures(api_key, stop_id, departures_to_return = PINNED_TRIP_DEPARTURES, request_time = min(planned_times, default = None))
+        departures_by_trip = {departure['realtime_trip_id']: departure for departure in departures if departure['realtime_trip_id'] is not None}
+
+        for journey_index, leg, realtimetripid in stop_legs:
+            departure = departures_by_trip.get(realtimetripid)
+
+            if departure is None or departure['cancelled']:
+                return False
+
+            leg_departures[(journey_index, leg)] = departure
+
+    for journey_index, journey in enumerate(journeys):
+        origin_departure = leg_departures.get((journey_index, 'origin'))
+
+        if origin_departure is None:
+            continue
+
+        origin_detail = journey['origin_detail']
+        origin_detail['departure_time'] = origin_departure['departure_time']
+        departure_time = dt_util.parse_datetime(origin_departure['departure_time'])
+        planned_time = dt_util.parse_datetime(origin_detail.get('departure_time_planned') or origin_departure['planned_departure_time'] or '')
+
+        # Truncated to whole minutes, as per the library
+        if planned_time is not None:
+            journey['delay'] = int((departure_time - planned_time).total_seconds() / 60)
+
+        # The arrival time moves with the last vehicle - the same one, unless there's a change onto a vehicle we've looked up
+        if journey.get('destination_real_time_trip_id') == journey['origin_real_time_trip_id']:
+            destination_departure = origin_departure
+        else:
+            destination_departure = leg_departures.get((journey_index, 'destination'))
+
+        destination_detail = journey.get('destination_detail', {})
+        arrival_time_planned = dt_util.parse_datetime(destination_detail.get('arrival_time_planned') or '')
+
+        if destination_departure is not None and destination_departure['planned_departure_time'] is not None and arrival_time_planned is not None:
+            arrival_delay = dt_util.parse_datetime(destination_departure['departure_time']) - dt_util.parse_datetime(destination_departure['planned_departure_time'])
+            arrival_time = arrival_time_planned + arrival_delay
+
+            destination_detail['arrival_time'] = arrival_time.astimezone(dt_util.UTC).strftime('%Y-%m-%dT%H:%M:%SZ')
+            journey['duration'] = int((arrival_time - departure_time).total_seconds() / 60)
+
+    return True
+
+def refresh_pinned_trips (api_key: str, journeys: list, vehicle_cache: VehicleCache, include_realtime_location: bool = True):
+    # Refresh the departure and arrival times, delay, vehicle position and occupancy of trips that have already been planned, without planning them again
+    # Returns None if a trip has been cancelled, or a vehicle we were tracking has disappeared from the realtime feed as the trip may have been cancelled
+    tfnsw = CachedTransportNSWv2(vehicle_cache, count_api_calls)
+
+    if not refresh_departure_times(api_key, journeys):
+        return None
+
+    update_due(journeys)
+
+    for journey in journeys:
+        if not include_realtime_location:
+            continue
+
+        for leg in ['origin', 'destination']:
+            transport_detail = journey[f'{leg}_transport_detail']
+
+            if leg == 'destination' and transport_detail.get('same_as_origin', False):
+                # Same vehicle, so no need to look it up twice
+                transport_detail.update(copy.deepcopy({key: value for key, value in journey['origin_transport_detail'].items() if key != 'same_as_origin'}))
+                continue
+
+            vehicle_info = tfnsw.find_vehicle(api_key, journey.get(f'{leg}_real_time_trip_id'))
+
+            if vehicle_info is None:
+                continue
+
+            vehicle_detail, occupancy, api_rate_warning = vehicle_info
+
+            if api_rate_warning:
+                # Keep what we had rather than wiping it
+                continue
+
+            if transport_detail['coords']['latitude'] is not None and vehicle_detail['coords']['latitude'] is None:
+                return None
+
+            transport_detail.update(vehicle_detail)
+            transport_detail['occupancy'] = occupancy
+
+    return journeys
+
 def check_stops (api_key: str, stops: List[str]):
     # Check all provided stops using the Transport NSW API, and return all the associated stop metadata
     # Exceptions will be captured by the calling function
 
     try:
         tfnsw = TransportNSWv2()
+
+        # One stop finder request per stop, as coordinates aren't checked
+        count_api_calls(len([stop for stop in ([stops] if isinstance(stops, str) else stops) if not tfnsw._origin_is_coords(stop)]))
         data = tfnsw.check_stops (api_key = api_key, stops = stops)
 
         return json.loads(data)
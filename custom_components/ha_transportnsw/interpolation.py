@@ -0,0 +1,81 @@
+"""Dead reckoning of vehicle positions between polls for the Transport NSW Mk II integration."""
+
+from __future__ import annotations
+
+from itertools import pairwise
+
+from homeassistant.util import dt as dt_util
+from homeassistant.util import location as location_util
+
+# Which end of the journey each leg's stops are at in the stop list
+LEG_STOPS = {
+    'origin': slice(0, 2),
+    'destination': slice(-2, None)
+}
+
+
+def get_stop_times(journey: dict) -> list[tuple[float, float, float]]:
+    """Return the (timestamp, latitude, longitude) of each stop in the journey's stop list.
+
+    Only the first departure and the final arrival times are known, so the times of the changes in between are shared out by distance.
+    """
+    stops = []
+
+    for stop in journey.get('stop_list', []):
+        coords = stop.get('coords') or {}
+        if coords.get('latitude') is None or coords.get('longitude') is None:
+            return []
+
+        stops.append((float(coords['latitude']), float(coords['longitude'])))
+
+    departure_time = dt_util.parse_datetime(journey.get('origin_detail', {}).get('departure_time') or '')
+    arrival_time = dt_util.parse_datetime(journey.get('destination_detail', {}).get('arrival_time') or '')
+
+    if len(stops) < 2 or departure_time is None or arrival_time is None:
+        return []
+
+    distances = [0.0]
+    for (latitude_1, longitude_1), (latitude_2, longitude_2) in pairwise(stops):
+        distances.append(distances[-1] + (location_util.distance(latitude_1, longitude_1, latitude_2, longitude_2) or 0.0))
+
+    departure = departure_time.timestamp()
+    duration = arrival_time.timestamp() - departure
+
+    stop_times = []
+    for index, (latitude, longitude) in enumerate(stops):
+        share = distances[index] / distances[-1] if distances[-1] > 0 else index / (len(stops) - 1)
+        stop_times.append((departure + duration * share, latitude, longitude))
+
+    return stop_times
+
+
+class VehicleTrack:
+    """Where a vehicle was at the last poll, and when it's due at the stops at either end of its leg."""
+
+    __slots__ = ('points',)
+
+    def __init__(self, polled: float, latitude: float, longitude: float, stop_times: list[tuple[float, float, float]]) -> None:
+        # Any stop the vehicle should already have reached is behind it
+        self.points = [(polled, latitude, longitude)] + [stop_time for stop_time in stop_times if stop_time[0] > polled]
+
+    @classmethod
+    def from_journey(cls, journey: dict, leg: str, polled: float, latitude: float, longitude: float) -> VehicleTrack | None:
+        stop_times = get_stop_times(journey)
+
+        if not stop_times:
+            return None
+
+        return cls(polled, latitude, longitude, stop_times[LEG_STOPS[leg]])
+
+    def position_at(self, when: float) -> tuple[float, float]:
+        """Return where the vehicle should be, moving in a straight line between the points at a steady speed."""
+        if when <= self.points[0][0]:
+            return self.points[0][1:]
+
+        for (time_1, latitude_1, longitude_1), (time_2, latitude_2, longitude_2) in pairwise(self.points):
+            if when < time_2 and time_2 > time_1:
+                progress = (when - time_1) / (time_2 - time_1)
+                return latitude_1 + (latitude_2 - latitude_1) * progress, longitude_1 + (longitude_2 - longitude_1) * progress
+
+        # It should be at the end of the leg by now, so wait there for the next poll
+        return self.points[-1][1:]
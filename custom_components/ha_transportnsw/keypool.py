@@ -0,0 +1,98 @@
+"""Pooling of several API keys within one config entry."""
+
+from __future__ import annotations
+
+import logging
+
+from homeassistant.core import HomeAssistant
+
+from .const import DAILY_API_QUOTA, DOMAIN
+from .helpers import get_api_calls, set_api_calls
+from .ratelimit import get_rate_limiter
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class APIKeyPool:
+    """The API keys available to a config entry, with their daily usage and health."""
+
+    def __init__(self, hass: HomeAssistant, api_keys: list[str]) -> None:
+        self.hass = hass
+        self.api_keys = list(dict.fromkeys(api_keys))       # Drop duplicates but keep the order, primary key first
+        self.calls_today = {api_key: 0 for api_key in self.api_keys}
+        self.invalid = set()
+        self.loaded = False
+
+    def _get_file_path(self, api_key: str) -> str:
+        # The same per-key file the integration has always used, so usage is shared with any other entry using the key
+        return f'{self.hass.config.config_dir}/custom_components/{DOMAIN}/.{DOMAIN}_{api_key}.json'
+
+    @property
+    def total_calls_today(self) -> int:
+        return sum(self.calls_today.values())
+
+    @property
+    def daily_quota(self) -> int:
+        # The combined daily quota of all the keys that still work
+        return DAILY_API_QUOTA * len([api_key for api_key in self.api_keys if api_key not in self.invalid])
+
+    def get_status(self, api_key: str) -> str:
+        if api_key in self.invalid:
+            return 'invalid'
+
+        if self.calls_today[api_key] >= DAILY_API_QUOTA:
+            return 'exhausted'
+
+        if get_rate_limiter(self.hass, api_key).cooldown_remaining > 0:
+            return 'cooling_down'
+
+        return 'ok'
+
+    def get_ordered_keys(self) -> list[str]:
+        """Return the usable keys, best first - not cooling down, then the most daily budget left, then the most tokens in hand."""
+        usable_keys = [api_key for api_key in self.api_keys if api_key not in self.invalid and self.calls_today[api_key] < DAILY_API_QUOTA]
+
+        def sort_key(api_key: str):
+            limiter = get_rate_limiter(self.hass, api_key)
+            return (limiter.cooldown_remaining > 0, self.calls_today[api_key], -limiter.tokens)
+
+        return sorted(usable_keys, key = sort_key)
+
+    def record(self, api_key: str, api_calls: int) -> None:
+        self.calls_today[api_key] += api_calls
+
+    def mark_invalid(self, api_key: str) -> None:
+        if api_key not in self.invalid:
+            _LOGGER.warning("API key ending %s was rejected as invalid, it won't be used again until the integration is reloaded", api_key[-4:])
+            self.invalid.add(api_key)
+
+    async def async_load(self) -> None:
+        """Load today's usage for each key."""
+        self.loaded = True
+
+        for api_key in self.api_keys:
+            try:
+                self.calls_today[api_key] = await self.hass.async_add_executor_job(get_api_calls, self._get_file_path(api_key))
+
+            except Exception:
+                self.calls_today[api_key] = 0
+
+    async def async_save(self) -> None:
+        """Save each key's usage, which also resets the count at the start of a new day."""
+        for api_key in self.api_keys:
+            self.calls_today[api_key] = await self.hass.async_add_executor_job(
+                set_api_calls,
+                self._get_file_path(api_key),
+                self.calls_today[api_key]
+            )
+
+    def get_usage(self) -> dict[str, dict]:
+        """Return the usage and status of each key, identified by its last four characters."""
+        return {
+            api_key[-4:]: {
+                'calls_today': self.calls_today[api_key],
+                'remaining': max(DAILY_API_QUOTA - self.calls_today[api_key], 0),
+                'status': self.get_status(api_key)
+            }
+            for api_key in self.api_keys
+        }
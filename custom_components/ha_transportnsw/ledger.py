@@ -0,0 +1,139 @@
+"""Per-journey API call ledger for the Transport NSW Mk II integration."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    LEDGER_FORECAST_WINDOW,
+    LEDGER_MINUTES,
+    LEDGER_SAVE_DELAY,
+    LEDGER_STORAGE_VERSION
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def get_minute(when: datetime) -> int:
+    # Minutes since the epoch, used to stamp each bucket
+    return int(when.timestamp() // 60)
+
+
+class APICallLedger:
+    """API calls per journey, in a fixed-size ring buffer of per-minute buckets, persisted via HA storage."""
+
+    def __init__(self, hass: HomeAssistant, config_entry_id: str) -> None:
+        self._store = Store(hass, LEDGER_STORAGE_VERSION, f"{DOMAIN}.{config_entry_id}.api_calls")
+        self._minutes = [None] * LEDGER_MINUTES      # Which minute each bucket currently holds
+        self._counts = {}                            # Keyed by journey (subentry ID), each a list of LEDGER_MINUTES buckets
+        self.loaded = False
+
+    def _get_bucket(self, minute: int) -> int:
+        # Return the bucket index for this minute, clearing it out first if it's still holding an older minute
+        index = minute % LEDGER_MINUTES
+
+        if self._minutes[index] != minute:
+            self._minutes[index] = minute
+            for counts in self._counts.values():
+                counts[index] = 0
+
+        return index
+
+    def record(self, journey_id: str, api_calls: int, now: datetime | None = None) -> None:
+        """Add some API calls to the current minute for this journey."""
+        if api_calls <= 0:
+            return
+
+        index = self._get_bucket(get_minute(now or dt_util.utcnow()))
+        counts = self._counts.setdefault(journey_id, [0] * LEDGER_MINUTES)
+        counts[index] += api_calls
+
+    def calls_since(self, since: datetime) -> dict[str, int]:
+        """Return the API calls per journey since the given time, which must be within the last LEDGER_MINUTES minutes."""
+        since_minute = get_minute(since)
+        indexes = [index for index, minute in enumerate(self._minutes) if minute is not None and minute >= since_minute]
+
+        return {journey_id: sum(counts[index] for index in indexes) for journey_id, counts in self._counts.items()}
+
+    def forget(self, journey_ids: set[str]) -> None:
+        """Drop journeys that no longer exist."""
+        for journey_id in set(self._counts) - journey_ids:
+            del self._counts[journey_id]
+
+    def forecast_exhaustion(self, daily_quota: int, now: datetime | None = None) -> tuple[datetime | None, int]:
+        """Forecast when today's quota will run out at the recent rate, and how many calls will have been made by midnight."""
+        now = now or dt_util.now()
+        start_of_day = dt_util.start_of_local_day(now)
+        end_of_day = start_of_day + timedelta(days = 1)
+
+        calls_today = sum(self.calls_since(start_of_day).values())
+
+        # Use the rate over the forecast window, or since midnight if that's shorter
+        window_start = max(now - timedelta(minutes = LEDGER_FORECAST_WINDOW), start_of_day)
+        window_minutes = max((now - window_start).total_seconds() / 60, 1)
+        calls_per_minute = sum(self.calls_since(window_start).values()) / window_minutes
+
+        projected_calls = round(calls_today + calls_per_minute * (end_of_day - now).total_seconds() / 60)
+
+        if calls_today >= daily_quota:
+            return now, projected_calls
+
+        if calls_per_minute == 0:
+            return None, projected_calls
+
+        exhaustion = now + timedelta(minutes = (daily_quota - calls_today) / calls_per_minute)
+
+        # Nothing to worry about if the quota resets first
+        return (exhaustion if exhaustion < end_of_day else None), projected_calls
+
+    async def async_load(self) -> None:
+        """Load the ledger from storage, discarding anything that's too old to be in the ring buffer."""
+        self.loaded = True
+
+        try:
+            stored = await self._store.async_load()
+
+        except Exception as ex:
+            _LOGGER.warning("Error %s loading the API call ledger, starting afresh", ex)
+            return
+
+        if not stored:
+            return
+
+        oldest_minute = get_minute(dt_util.utcnow()) - LEDGER_MINUTES
+
+        for minute, journeys in stored.get('minutes', {}).items():
+            minute = int(minute)
+            if minute <= oldest_minute:
+                continue
+
+            index = self._get_bucket(minute)
+            for journey_id, api_calls in journeys.items():
+                counts = self._counts.setdefault(journey_id, [0] * LEDGER_MINUTES)
+                counts[index] += api_calls
+
+    @callback
+    def async_schedule_save(self) -> None:
+        """Save the ledger a little later, batching up several polls into one write."""
+        self._store.async_delay_save(self._data_to_save, LEDGER_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict:
+        # Only the buckets that actually have calls in them are stored
+        minutes = {}
+
+        for index, minute in enumerate(self._minutes):
+            if minute is None:
+                continue
+
+            journeys = {journey_id: counts[index] for journey_id, counts in self._counts.items() if counts[index] > 0}
+            if journeys:
+                minutes[str(minute)] = journeys
+
+        return {'minutes': minutes}
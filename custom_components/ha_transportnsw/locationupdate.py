@@ -0,0 +1,132 @@
+"""Device tracker location update requests for the Transport NSW Mk II integration."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+import logging
+
+from homeassistant.core import Event, EventStateChangedData, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, LOCATION_UPDATE_MIN_INTERVAL
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LocationUpdateRequester:
+    """Sends location update requests to the mobile app behind each device tracker, without holding up the polls.
+
+    Journeys sharing a tracker share its requests, and each device is only asked so often however many journeys use it.
+    """
+
+    def __init__(self, hass: HomeAssistant, min_interval: float = LOCATION_UPDATE_MIN_INTERVAL) -> None:
+        self.hass = hass
+        self.min_interval = timedelta(seconds = min_interval)
+        self._requested = {}        # Notify entity to when we last asked it for a location update
+        self._in_flight = set()
+        self.sent = 0
+        self.skipped = 0
+        self.failed = 0
+
+    @staticmethod
+    def get_notify_entity(tracker_entity_id: str) -> str:
+        # The mobile app names the notify entity after the device, as it does the device tracker
+        return f'notify.{tracker_entity_id.split(".")[1]}'
+
+    @callback
+    def async_request(self, tracker_entity_id: str) -> None:
+        """Ask the device for a location update in the background, unless it's already been asked recently."""
+        notify_entity = self.get_notify_entity(tracker_entity_id)
+        now = dt_util.utcnow()
+        last_requested = self._requested.get(notify_entity)
+
+        if notify_entity in self._in_flight or (last_requested is not None and now - last_requested < self.min_interval):
+            self.skipped += 1
+            return
+
+        _LOGGER.debug("Requesting location update from %s", tracker_entity_id)
+
+        self._requested[notify_entity] = now
+        self._in_flight.add(notify_entity)
+        self.hass.async_create_task(self._async_send(notify_entity))
+
+    async def _async_send(self, notify_entity: str) -> None:
+        try:
+            await self.hass.services.async_call(
+                domain = "notify",
+                service = "send_message",
+                service_data = {"message": "request_location_update"},
+                target = {"entity_id": notify_entity},
+                blocking = True
+            )
+            self.sent += 1
+
+        except Exception as ex:
+            # Not worth failing a poll over - the plan just uses the last known location
+            self.failed += 1
+            _LOGGER.debug("Error %s requesting a location update from %s", ex, notify_entity)
+
+        finally:
+            self._in_flight.discard(notify_entity)
+
+    async def async_wait_for_fix(self, tracker_entity_id: str, timeout: float) -> bool:
+        """Wait for the tracker to update after the last location request, for no more than timeout seconds after the request.
+
+        Returns True if there's a location at least as new as the request.
+        """
+        requested = self._requested.get(self.get_notify_entity(tracker_entity_id))
+
+        if requested is None:
+            return False
+
+        if self._is_fix_after(self.hass.states.get(tracker_entity_id), requested):
+            return True
+
+        remaining = timeout - (dt_util.utcnow() - requested).total_seconds()
+
+        if remaining <= 0:
+            return False
+
+        fix = self.hass.loop.create_future()
+
+        @callback
+        def _async_tracker_changed(event: Event[EventStateChangedData]) -> None:
+            if not fix.done() and self._is_fix_after(event.data['new_state'], requested):
+                fix.set_result(True)
+
+        unsubscribe = async_track_state_change_event(self.hass, [tracker_entity_id], _async_tracker_changed)
+
+        try:
+            async with asyncio.timeout(remaining):
+                return await fix
+
+        except TimeoutError:
+            _LOGGER.debug("No new location from %s within %s seconds, using the last one", tracker_entity_id, timeout)
+            return False
+
+        finally:
+            unsubscribe()
+
+    @staticmethod
+    def _is_fix_after(state, requested: datetime) -> bool:
+        return state is not None and state.last_updated >= requested
+
+    def get_stats(self) -> dict:
+        return {
+            'sent': self.sent,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'in_flight': len(self._in_flight)
+        }
+
+
+def get_location_requester(hass: HomeAssistant) -> LocationUpdateRequester:
+    # A device can be the origin of journeys in several config entries, so share the one requester
+    domain_data = hass.data.setdefault(DOMAIN, {})
+
+    if "location_requester" not in domain_data:
+        domain_data["location_requester"] = LocationUpdateRequester(hass)
+
+    return domain_data["location_requester"]
@@ -0,0 +1,159 @@
+"""Prometheus-format metrics for the Transport NSW Mk II integration."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import defaultdict
+from http import HTTPStatus
+import logging
+
+from aiohttp import web
+
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity import Entity
+
+from .const import (
+    CONF_METRICS_ENDPOINT,
+    DOMAIN,
+    METRICS_LATENCY_BUCKETS,
+    URL_BASE
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+METRIC_PREFIX = DOMAIN
+
+
+class Histogram:
+    """A minimal cumulative histogram - just enough to produce the Prometheus text format."""
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)     # The extra bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class TransportNSWMetrics:
+    """Cheap counters updated by the coordinator and its entities, rendered only when the endpoint is scraped."""
+
+    def __init__(self) -> None:
+        self.api_calls = defaultdict(int)                   # Keyed by journey (subentry) title
+        self.errors = defaultdict(int)                      # Keyed by exception name
+        self.request_latency = Histogram(METRICS_LATENCY_BUCKETS)
+        self.poll_duration = Histogram(METRICS_LATENCY_BUCKETS)
+        self.entity_writes_performed = 0
+        self.entity_writes_skipped = 0
+
+    @callback
+    def async_write_entity_state(self, entity: Entity) -> None:
+        """Write an entity's state, counting whether it was performed or skipped by HA because nothing changed."""
+        # HA keeps the same state object when neither the state nor the attributes have changed, so there's nothing to compare here
+        previous_state = entity.hass.states.get(entity.entity_id)
+        entity.async_write_ha_state()
+
+        if entity.hass.states.get(entity.entity_id) is previous_state:
+            self.entity_writes_skipped += 1
+        else:
+            self.entity_writes_performed += 1
+
+
+def escape_label(value: str) -> str:
+    # Escape a label value as per the Prometheus text exposition format
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_histogram(lines: list[str], name: str, labels: str, histogram: Histogram) -> None:
+    # Append the bucket, sum and count lines for a single histogram
+    cumulative = 0
+
+    for index, upper_bound in enumerate((*histogram.buckets, '+Inf')):
+        cumulative += histogram.bucket_counts[index]
+        lines.append(f'{name}_bucket{{{labels},le="{upper_bound}"}} {cumulative}')
+
+    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+
+def render_metrics(metrics_by_entry: dict[str, TransportNSWMetrics], calls_today_by_key: dict[str, int]) -> str:
+    # Render the metrics for all the config entries in the Prometheus text format
+    lines = []
+
+    lines.append(f'# HELP {METRIC_PREFIX}_api_calls_total API calls made, per config entry')
+    lines.append(f'# TYPE {METRIC_PREFIX}_api_calls_total counter')
+    for entry_id, metrics in metrics_by_entry.items():
+        lines.append(f'{METRIC_PREFIX}_api_calls_total{{config_entry="{escape_label(entry_id)}"}} {sum(metrics.api_calls.values())}')
+
+    lines.append(f'# HELP {METRIC_PREFIX}_journey_api_calls_total API calls made, per journey')
+    lines.append(f'# TYPE {METRIC_PREFIX}_journey_api_calls_total counter')
+    for entry_id, metrics in metrics_by_entry.items():
+        for journey, api_calls in metrics.api_calls.items():
+            lines.append(f'{METRIC_PREFIX}_journey_api_calls_total{{config_entry="{escape_label(entry_id)}",journey="{escape_label(journey)}"}} {api_calls}')
+
+    lines.append(f'# HELP {METRIC_PREFIX}_api_key_calls_today API calls made today, per pooled API key')
+    lines.append(f'# TYPE {METRIC_PREFIX}_api_key_calls_today gauge')
+    for api_key, calls_today in calls_today_by_key.items():
+        lines.append(f'{METRIC_PREFIX}_api_key_calls_today{{api_key="{escape_label(api_key)}"}} {calls_today}')
+
+    lines.append(f'# HELP {METRIC_PREFIX}_errors_total Errors raised while polling, per exception type')
+    lines.append(f'# TYPE {METRIC_PREFIX}_errors_total counter')
+    for entry_id, metrics in metrics_by_entry.items():
+        for exception, count in metrics.errors.items():
+            lines.append(f'{METRIC_PREFIX}_errors_total{{config_entry="{escape_label(entry_id)}",exception="{escape_label(exception)}"}} {count}')
+
+    lines.append(f'# HELP {METRIC_PREFIX}_request_latency_seconds Time taken to retrieve the trips for a journey')
+    lines.append(f'# TYPE {METRIC_PREFIX}_request_latency_seconds histogram')
+    for entry_id, metrics in metrics_by_entry.items():
+        render_histogram(lines, f'{METRIC_PREFIX}_request_latency_seconds', f'config_entry="{escape_label(entry_id)}"', metrics.request_latency)
+
+    lines.append(f'# HELP {METRIC_PREFIX}_poll_duration_seconds Time taken to poll all the journeys')
+    lines.append(f'# TYPE {METRIC_PREFIX}_poll_duration_seconds histogram')
+    for entry_id, metrics in metrics_by_entry.items():
+        render_histogram(lines, f'{METRIC_PREFIX}_poll_duration_seconds', f'config_entry="{escape_label(entry_id)}"', metrics.poll_duration)
+
+    lines.append(f'# HELP {METRIC_PREFIX}_entity_writes_total Entity state writes, performed or skipped because nothing changed')
+    lines.append(f'# TYPE {METRIC_PREFIX}_entity_writes_total counter')
+    for entry_id, metrics in metrics_by_entry.items():
+        lines.append(f'{METRIC_PREFIX}_entity_writes_total{{config_entry="{escape_label(entry_id)}",result="performed"}} {metrics.entity_writes_performed}')
+        lines.append(f'{METRIC_PREFIX}_entity_writes_total{{config_entry="{escape_label(entry_id)}",result="skipped"}} {metrics.entity_writes_skipped}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class TransportNSWMetricsView(HomeAssistantView):
+    """Serve the integration metrics to an authenticated Prometheus scraper."""
+
+    url = f"{URL_BASE}/metrics"
+    name = f"api:{DOMAIN}:metrics"
+    requires_auth = True
+
+    async def get(self, request: web.Request) -> web.Response:
+        """Return the metrics for every config entry that has the endpoint enabled."""
+        hass: HomeAssistant = request.app["hass"]
+
+        metrics_by_entry = {}
+        calls_today_by_key = {}
+        for config_entry in hass.config_entries.async_loaded_entries(DOMAIN):
+            if config_entry.options.get(CONF_METRICS_ENDPOINT, False):
+                coordinator = config_entry.runtime_data.coordinator
+                metrics_by_entry[config_entry.entry_id] = coordinator.metrics
+
+                # Keys can be pooled by more than one entry, and they share the same usage file, so take the highest count
+                for api_key, calls_today in coordinator.key_pool.calls_today.items():
+                    calls_today_by_key[api_key[-4:]] = max(calls_today, calls_today_by_key.get(api_key[-4:], 0))
+
+        if not metrics_by_entry:
+            # The endpoint is optional, so pretend it doesn't exist unless at least one entry has enabled it
+            return web.Response(status = HTTPStatus.NOT_FOUND)
+
+        return web.Response(
+            text = render_metrics(metrics_by_entry, calls_today_by_key),
+            content_type = 'text/plain',
+            charset = 'utf-8'
+        )
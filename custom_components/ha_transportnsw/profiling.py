@@ -0,0 +1,126 @@
+"""On-demand profiling of a single poll cycle."""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import logging
+from pathlib import Path
+import pstats
+import time
+import tracemalloc
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    PROFILE_SUMMARY_LINES,
+    PROFILE_TRACEMALLOC_FRAMES,
+    PROFILE_TOP_LINES
+)
+from .coordinator import TransportNSWCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def write_profile_report(file_path: str, profiler: cProfile.Profile, snapshot: tracemalloc.Snapshot, header: str) -> dict:
+    # Write the profiler stats and the top allocation sites to a file, and return a short summary of both
+    # This is all blocking, so needs to be run in the executor
+
+    stats_output = io.StringIO()
+    stats = pstats.Stats(profiler, stream = stats_output)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP_LINES)
+
+    allocation_stats = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    )).statistics('lineno')
+
+    allocation_lines = [str(allocation) for allocation in allocation_stats[:PROFILE_TOP_LINES]]
+
+    report = (
+        f"{header}\n\n"
+        f"=== Profile (sorted by cumulative time) ===\n{stats_output.getvalue()}\n"
+        f"=== Top {PROFILE_TOP_LINES} allocation sites ===\n" + "\n".join(allocation_lines) + "\n"
+    )
+
+    Path(file_path).write_text(report, encoding="utf8")
+
+    # The summary is just the first few functions (by cumulative time) and allocation sites
+    top_functions = []
+    for (filename, line_number, function_name), (_, call_count, _, cumulative_time, _) in sorted(stats.stats.items(), key = lambda item: item[1][3], reverse = True)[:PROFILE_SUMMARY_LINES]:
+        top_functions.append({
+            'function': f"{filename}:{line_number}({function_name})",
+            'calls': call_count,
+            'cumulative_time': round(cumulative_time, 4)
+        })
+
+    return {
+        'top_functions': top_functions,
+        'top_allocations': allocation_lines[:PROFILE_SUMMARY_LINES]
+    }
+
+
+async def async_profile_poll(hass: HomeAssistant, coordinators: list[TransportNSWCoordinator]) -> dict:
+    """Run one full poll cycle, including the entity writes, under cProfile and tracemalloc.
+
+    The API requests and their parsing run in the executor rather than on the event loop, but since Python 3.12 the profiler covers
+    every thread, so they're included - as is anything else Home Assistant happens to be running at the same time.
+    """
+
+    profiler = cProfile.Profile()
+
+    # Don't interfere with tracemalloc if somebody else already has it running
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+
+    errors = {}
+    api_calls = 0
+    poll_start = time.monotonic()
+
+    try:
+        profiler.enable()
+
+        for coordinator in coordinators:
+            try:
+                data = await coordinator.async_update_data(full = True)
+
+                # This is what writes the entity states, so include it in the profile
+                coordinator.async_set_updated_data(data)
+
+            except Exception as ex:
+                errors[coordinator.config_entry.title] = f"{type(ex).__name__}: {ex}"
+
+            if coordinator.poll_history:
+                api_calls += coordinator.poll_history[-1]['api_calls']
+
+    finally:
+        profiler.disable()
+        duration = time.monotonic() - poll_start
+        snapshot = tracemalloc.take_snapshot()
+
+        if not already_tracing:
+            tracemalloc.stop()
+
+    file_path = hass.config.path(f"{DOMAIN}_profile_{dt_util.now().strftime('%Y%m%d_%H%M%S')}.txt")
+    header = f"Transport NSW Mk II poll profile - {dt_util.now().isoformat()}, {len(coordinators)} config entries, {duration:.3f}s, {api_calls} API calls"
+
+    summary = await hass.async_add_executor_job(
+        write_profile_report,
+        file_path,
+        profiler,
+        snapshot,
+        header
+    )
+
+    _LOGGER.info("Poll profile written to %s", file_path)
+
+    return {
+        'path': file_path,
+        'duration': round(duration, 3),
+        'api_calls': api_calls,
+        'errors': errors,
+        **summary
+    }
@@ -0,0 +1,130 @@
+"""Per-API-key rate limiting for the Transport NSW Mk II integration."""
+
+from __future__ import annotations
+
+import asyncio
+from functools import partial
+import logging
+import threading
+import time
+
+from TransportNSWv2 import APIRateLimitExceeded
+
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    API_RATE_LIMIT,
+    API_RATE_LIMIT_BURST,
+    DOMAIN,
+    RATE_LIMIT_COOLDOWN,
+    RATE_LIMIT_MAX_COOLDOWN
+)
+from .helpers import call_counted
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """A token bucket shared by everything using the same API key.
+
+    Tokens are taken on the event loop for the first request of each helper, and in the executor thread for any requests after that.
+    """
+
+    def __init__(self, rate: float = API_RATE_LIMIT, capacity: int = API_RATE_LIMIT_BURST) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.cooldown = RATE_LIMIT_COOLDOWN
+        self.cooldown_until = 0.0
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+        return now
+
+    @property
+    def cooldown_remaining(self) -> float:
+        return max(self.cooldown_until - time.monotonic(), 0.0)
+
+    def _take(self, tokens: int) -> float | None:
+        # Take the tokens if they're available and there's no cool-down, otherwise return how long to wait before trying again
+        with self._lock:
+            now = self._refill()
+
+            if now < self.cooldown_until:
+                return self.cooldown_until - now
+
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return None
+
+            return (tokens - self.tokens) / self.rate
+
+    async def async_acquire(self, tokens: int = 1) -> None:
+        """Wait until the tokens are available, and any cool-down has passed, then take them."""
+        while True:
+            wait = self._take(tokens)
+
+            if wait is None:
+                return
+
+            await asyncio.sleep(wait)
+
+    def acquire(self, tokens: int = 1) -> None:
+        """As per async_acquire, but blocking - for pacing the requests an executor job makes after its first."""
+        while True:
+            wait = self._take(tokens)
+
+            if wait is None:
+                return
+
+            time.sleep(wait)
+
+    def rate_limited(self) -> None:
+        """The API has told us to back off - drain the bucket and cool down, for longer each consecutive time."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+            self.cooldown_until = time.monotonic() + self.cooldown
+
+        _LOGGER.warning("API rate limit exceeded, pausing requests for %s seconds", self.cooldown)
+        self.cooldown = min(self.cooldown * 2, RATE_LIMIT_MAX_COOLDOWN)
+
+    def succeeded(self) -> None:
+        """A request got through, so reset the cool-down."""
+        self.cooldown = RATE_LIMIT_COOLDOWN
+
+
+def get_rate_limiter(hass: HomeAssistant, api_key: str) -> TokenBucket:
+    # Every config entry, flow and service using the same API key shares the one limiter
+    rate_limiters = hass.data.setdefault(DOMAIN, {}).setdefault("rate_limiters", {})
+
+    if api_key not in rate_limiters:
+        rate_limiters[api_key] = TokenBucket()
+
+    return rate_limiters[api_key]
+
+
+async def async_call_limited(hass: HomeAssistant, api_key: str, func, *args) -> tuple:
+    """Run a blocking API helper in the executor, paced through the API key's limiter.
+
+    The token for the helper's first request is taken on the event loop before it's handed to the executor, so most helpers never tie
+    up an executor thread waiting for the bucket.  Any further requests the helper makes, e.g. for realtime vehicle feeds, each take
+    their own token in the executor thread just before they're made, so a poll can't burst past the rate limit.
+    Returns the result, the number of API requests made and any exception raised, as per call_counted.
+    """
+    limiter = get_rate_limiter(hass, api_key)
+    await limiter.async_acquire()
+
+    result, api_calls, error = await hass.async_add_executor_job(partial(call_counted, func, *args, pacer = limiter.acquire))
+
+    if isinstance(error, APIRateLimitExceeded):
+        limiter.rate_limited()
+    elif error is None:
+        limiter.succeeded()
+
+    return result, api_calls, error
@@ -0,0 +1,165 @@
+"""Realtime vehicle data shared between journeys for the Transport NSW Mk II integration."""
+
+from __future__ import annotations
+
+import copy
+import threading
+import time
+
+from TransportNSWv2 import TransportNSWv2
+
+from .const import PINNED_TRIP_MAX_AGE, VEHICLE_CACHE_TTL
+
+
+class FeedCache:
+    """Stands in for the library's per-call GTFS feed cache, but shared between calls and expiring after a while."""
+
+    def __init__(self, vehicle_cache: VehicleCache) -> None:
+        self._vehicle_cache = vehicle_cache
+        self._feeds = {}
+
+    def __contains__(self, url: str) -> bool:
+        hit = url in self._feeds and time.monotonic() - self._feeds[url][0] < self._vehicle_cache.ttl
+        self._vehicle_cache.record('realtime_feeds', hit)
+
+        return hit
+
+    def is_fresh(self, url: str) -> bool:
+        # As per 'in', but without counting towards the cache statistics
+        return url in self._feeds and time.monotonic() - self._feeds[url][0] < self._vehicle_cache.ttl
+
+    def __getitem__(self, url: str) -> bytes:
+        return self._feeds[url][1]
+
+    def __setitem__(self, url: str, gtfs_data: bytes) -> None:
+        self._feeds[url] = (time.monotonic(), gtfs_data)
+
+
+class VehicleCache:
+    """Realtime vehicle lookups, keyed by realtime trip ID, shared by all the journeys in a poll."""
+
+    def __init__(self, ttl: float = VEHICLE_CACHE_TTL, record_access = None) -> None:
+        self.ttl = ttl
+        self.feeds = FeedCache(self)
+        self.realtime_urls = {}         # Agency ID to vehicle position feed URL - these don't change while we're running
+        self._vehicles = {}
+        self._trips = {}                # Realtime trip ID to what's needed to look its vehicle up again without re-planning
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._record_access = record_access
+
+    def record(self, cache_name: str, hit: bool) -> None:
+        if self._record_access is not None:
+            self._record_access(cache_name, hit)
+
+    def lock_for(self, agencyid: str) -> threading.Lock:
+        # One lock per agency feed, so two journeys needing the same feed at the same time only download it once
+        with self._locks_lock:
+            return self._locks.setdefault(agencyid, threading.Lock())
+
+    def get(self, key: tuple):
+        entry = self._vehicles.get(key)
+        hit = entry is not None and time.monotonic() - entry[0] < self.ttl
+        self.record('vehicle_positions', hit)
+
+        # The library adds to the returned detail, so always hand out a copy
+        return copy.deepcopy(entry[1]) if hit else None
+
+    def set(self, key: tuple, vehicle_info: tuple) -> None:
+        self._vehicles[key] = (time.monotonic(), copy.deepcopy(vehicle_info))
+
+    def remember_trip(self, realtimetripid: str, trip_details: tuple) -> None:
+        # The agency, mode, default carriage count and planned occupancy of a trip - none of which are in the journey data the library returns
+        now = time.monotonic()
+        self._trips[realtimetripid] = (now, trip_details)
+
+        for old_tripid in [tripid for tripid, (remembered, _) in self._trips.items() if now - remembered > PINNED_TRIP_MAX_AGE]:
+            del self._trips[old_tripid]
+
+    def get_trip_details(self, realtimetripid: str | None) -> tuple | None:
+        entry = self._trips.get(realtimetripid)
+        return entry[1] if entry is not None else None
+
+
+class CachedTransportNSWv2(TransportNSWv2):
+    """The TransportNSWv2 client, but with its realtime lookups going through a shared VehicleCache.
+
+    Also counts the keyed requests it makes through count_api_calls, if given, just before each one is made - the library only keeps a
+    single module-wide count, and counting them as they happen lets the caller pace them too.
+    """
+
+    def __init__(self, vehicle_cache: VehicleCache, count_api_calls = None) -> None:
+        self._vehicle_cache = vehicle_cache
+        self._count_api_calls = count_api_calls
+        super().__init__()
+
+    def _count(self, api_calls: int) -> None:
+        if self._count_api_calls is not None and api_calls > 0:
+            self._count_api_calls(api_calls)
+
+    def get_trip(self, name_origin, name_destination, api_key, *args, **kwargs):
+        # One trip request per destination - counted up front, as failed requests still count towards the quota
+        self._count(1 if isinstance(name_destination, str) else len(name_destination))
+
+        return super().get_trip(name_origin, name_destination, api_key, *args, **kwargs)
+
+    @property
+    def _gtfs_cache(self) -> FeedCache:
+        return self._vehicle_cache.feeds
+
+    @_gtfs_cache.setter
+    def _gtfs_cache(self, value) -> None:
+        # get_trip() resets the cache at the start of every call, which is exactly what we don't want
+        pass
+
+    def _get_realtime_url(self, agencyid):
+        if agencyid in self._vehicle_cache.realtime_urls:
+            self._vehicle_cache.record('realtime_urls', True)
+            return self._vehicle_cache.realtime_urls[agencyid]
+
+        self._vehicle_cache.record('realtime_urls', False)
+        realtime_url = super()._get_realtime_url(agencyid)
+
+        # Don't remember failed lookups, they're worth retrying
+        if realtime_url is not None:
+            self._vehicle_cache.realtime_urls[agencyid] = realtime_url
+
+        return realtime_url
+
+    def _find_gtfs_info(self, include_realtime_location, api_key, mode, mode_default_carriages, realtimetripid, agencyid, general_occupancy, sleep_time):
+        key = (include_realtime_location, mode, mode_default_carriages, realtimetripid, agencyid, general_occupancy)
+
+        if realtimetripid is not None:
+            self._vehicle_cache.remember_trip(realtimetripid, (agencyid, mode, mode_default_carriages, general_occupancy))
+
+        with self._vehicle_cache.lock_for(agencyid):
+            vehicle_info = self._vehicle_cache.get(key)
+
+            if vehicle_info is None:
+                # The library only downloads the feed if it isn't already cached - the agency lock means nobody else can fetch it in the meantime
+                realtime_url = self._get_realtime_url(agencyid)
+                if include_realtime_location and realtime_url is not None and not self._vehicle_cache.feeds.is_fresh(realtime_url):
+                    self._count(1)
+
+                vehicle_info = super()._find_gtfs_info(include_realtime_location, api_key, mode, mode_default_carriages, realtimetripid, agencyid, general_occupancy, sleep_time)
+
+                # Don't hang on to anything that was cut short by the rate limit
+                if not vehicle_info[2]:
+                    self._vehicle_cache.set(key, vehicle_info)
+
+        return vehicle_info
+
+    def find_vehicle(self, api_key: str, realtimetripid: str | None) -> tuple | None:
+        """Look up the vehicle running a trip that's already been planned, without planning it again.
+
+        Returns the vehicle detail, occupancy and rate limit warning as the trip planner would have found them, or None if the trip
+        wasn't planned recently enough for its agency and mode to be remembered.
+        """
+        trip_details = self._vehicle_cache.get_trip_details(realtimetripid)
+
+        if trip_details is None:
+            return None
+
+        agencyid, mode, mode_default_carriages, general_occupancy = trip_details
+
+        return self._find_gtfs_info(True, api_key, mode, mode_default_carriages, realtimetripid, agencyid, general_occupancy, 0)
@@ -1,7 +1,7 @@
 """Interfaces with the Transport NSW Mk II API sensors."""
 
 import logging
-from datetime import datetime #, timezone, timedelta
+from datetime import datetime, timedelta #, timezone
 
 from homeassistant.components.sensor import (
     SensorDeviceClass,
@@ -46,6 +46,11 @@ def get_daily_api_calls(coordinator: TransportNSWCoordinator) -> int:
 
     return coordinator.daily_api_calls
 
+def get_api_key_usage(coordinator: TransportNSWCoordinator) -> dict:
+    """ Return the usage of each pooled API key, identified by its last four characters. """
+
+    return {'api_keys': coordinator.key_pool.get_usage()}
+
 def get_average_api_calls(coordinator: TransportNSWCoordinator) -> int | None:
     """ Return the average from rolling_average_api_calls. """
     if len(coordinator.rolling_average_api_calls) < AVERAGE_API_CALLS_WINDOW:
@@ -56,6 +61,27 @@ def get_average_api_calls(coordinator: TransportNSWCoordinator) -> int | None:
     # Round the result, but don't use Banker's Rounding
     return round(average + 0.1)
 
+def get_quota_exhaustion(coordinator: TransportNSWCoordinator) -> datetime | None:
+    """ Return when today's API quota will run out at the current rate, or None if it won't. """
+    exhaustion, _ = coordinator.ledger.forecast_exhaustion(coordinator.key_pool.daily_quota)
+
+    return exhaustion
+
+def get_quota_exhaustion_attributes(coordinator: TransportNSWCoordinator) -> dict:
+    """ Return the projected usage for the day, plus today's usage per journey. """
+    _, projected_calls = coordinator.ledger.forecast_exhaustion(coordinator.key_pool.daily_quota)
+    calls_today = coordinator.ledger.calls_since(dt_util.start_of_local_day())
+
+    return {
+        'daily_quota': coordinator.key_pool.daily_quota,
+        'projected_daily_calls': projected_calls,
+        'journey_calls_today': {
+            subentry.title: calls_today.get(subentry.subentry_id, 0)
+            for subentry in coordinator.config_entry.subentries.values()
+            if subentry.subentry_type in [SUBENTRY_TYPE_JOURNEY, SUBENTRY_TYPE_BOARD]
+        }
+    }
+
 def get_highest_alert(alerts) -> str:
     # Search the alerts and return the highest
     highest_alert = -1
@@ -104,6 +130,20 @@ def convert_date(utc_string) -> datetime:
 
     return local_dt
 
+def get_board_departure(departure) -> dict:
+    # The parts of a departure that are worth showing on a board, with the departure time in local time
+    return {
+        'line': departure['line'],
+        'destination': departure['destination'],
+        'platform': departure['platform'],
+        'mode': departure['mode'],
+        'due': departure['due'],
+        'departure_time': convert_date(departure['departure_time']).isoformat(),
+        'delay': departure['delay'],
+        'real_time': departure['real_time'],
+        'cancelled': departure['cancelled']
+    }
+
 
 # Extend the default SensorEntityDescription class
 @dataclass(frozen = True, kw_only = True)
@@ -113,6 +153,7 @@ class TransportNSWSensorEntityDescription(SensorEntityDescription):
 
     state_path: str | None = None
     state_fn: Callable[[Any], Any] | None = None
+    attrs_fn: Callable[[Any], dict] | None = None
     attrs_path: str | None = None
     attrs_friendly: str | None = None
 
@@ -125,6 +166,7 @@ DEFAULT_ENTRY_SENSORS: tuple[TransportNSWSensorEntityDescription, ...] = (
         icon='mdi:counter',
         entity_category=EntityCategory.DIAGNOSTIC,
         state_fn = get_daily_api_calls,
+        attrs_fn = get_api_key_usage,
     ),
     TransportNSWSensorEntityDescription(
         key=AVERAGE_API_CALLS,
@@ -134,6 +176,24 @@ DEFAULT_ENTRY_SENSORS: tuple[TransportNSWSensorEntityDescription, ...] = (
         entity_category=EntityCategory.DIAGNOSTIC,
         state_fn = get_average_api_calls,
     ),
+    TransportNSWSensorEntityDescription(
+        key=QUOTA_EXHAUSTION,
+        name=QUOTA_EXHAUSTION_NAME,
+        icon='mdi:gauge-full',
+        device_class = SensorDeviceClass.TIMESTAMP,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        state_fn = get_quota_exhaustion,
+        attrs_fn = get_quota_exhaustion_attributes,
+    ),
+)
+
+# Per-journey API usage, attached to the first trip's device
+JOURNEY_API_CALLS_SENSOR = TransportNSWSensorEntityDescription(
+    key=JOURNEY_API_CALLS,
+    name=JOURNEY_API_CALLS_NAME,
+    native_unit_of_measurement='calls',
+    icon='mdi:counter',
+    entity_category=EntityCategory.DIAGNOSTIC,
 )
 
 # Sub_entry-level sensor definitions
@@ -401,10 +461,27 @@ async def async_setup_entry(
                             # Try and remove it - don't worry if it never existed
                             remove_entity (entity_reg, config_entry.entry_id, subentry.subentry_id, trip_index, sensor.key)
 
+                    if trip_index == 0:
+                        sensors.append(TransportNSWJourneyAPICallsSensor(coordinator, JOURNEY_API_CALLS_SENSOR, subentry, device_suffix, device_identifier))
+
                     # Create the subentry sensors, assuming there are any
                     if len(sensors) > 0:
                         async_add_entities(sensors, config_subentry_id = subentry.subentry_id, update_before_add = True)
 
+        elif subentry.subentry_type == SUBENTRY_TYPE_BOARD:
+            # One sensor for the whole board, plus one for each line the user wants to keep an eye on
+            board_lines = subentry.data.get(CONF_BOARD_LINES, [])
+            sensors = [TransportNSWBoardSensor(coordinator, subentry, None)]
+            sensors.extend(TransportNSWBoardSensor(coordinator, subentry, line) for line in board_lines)
+
+            # Remove the sensors for any lines that have been taken off the board since
+            line_unique_ids = {sensor.unique_id for sensor in sensors}
+            for entity in entity_reg.entities.get_entries_for_config_entry_id(config_entry.entry_id):
+                if entity.unique_id.startswith(f"{subentry.subentry_id}_board_line_") and entity.unique_id not in line_unique_ids:
+                    entity_reg.async_remove(entity.entity_id)
+
+            async_add_entities(sensors, config_subentry_id = subentry.subentry_id, update_before_add = True)
+
                 
     # Create the config_entry sensors
     configentry_sensors = [
@@ -437,7 +514,7 @@ class TransportNSWSensor(CoordinatorEntity, SensorEntity):
     def _handle_coordinator_update(self) -> None:
         """Update sensor with latest data from coordinator."""
         # This method is called by the DataUpdateCoordinator when a successful update runs.
-        self.async_write_ha_state()
+        self.coordinator.metrics.async_write_entity_state(self)
 
     @property
     def native_value(self) -> StateType:
@@ -449,6 +526,147 @@ class TransportNSWSensor(CoordinatorEntity, SensorEntity):
         except Exception as ex:
             return None
 
+    @property
+    def extra_state_attributes(self):
+        """Return the extra state attributes, if the sensor has any."""
+        if self.entity_description.attrs_fn is None:
+            return None
+
+        try:
+            return self.entity_description.attrs_fn(self.coordinator)
+
+        except Exception as ex:
+            return None
+
+
+class TransportNSWJourneyAPICallsSensor(CoordinatorEntity, SensorEntity):
+    """API calls made today for a single journey, from the coordinator's ledger."""
+
+    entity_description: TransportNSWSensorEntityDescription
+
+    def __init__(self, coordinator: TransportNSWCoordinator, description: TransportNSWSensorEntityDescription, subentry: ConfigSubentry, device_suffix: str, device_identifier: str) -> None:
+        """Initialise sensor."""
+        super().__init__(coordinator)
+
+        self.entity_description = description
+        self.subentry = subentry
+        self.device_suffix = device_suffix
+        self.device_identifier = device_identifier
+
+        self._attr_name = f"{subentry.data[CONF_ORIGIN_NAME]} to {subentry.data[CONF_DESTINATION_NAME]} {description.name}"
+        self._attr_unique_id = f"{subentry.subentry_id}_{description.key}_0"
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Update sensor with latest data from coordinator."""
+        self.coordinator.metrics.async_write_entity_state(self)
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return device info for this sensor - the same device as the first trip's sensors."""
+        return {
+            "identifiers": {(DOMAIN, f"{self.subentry.subentry_id}_{self.subentry.data[CONF_ORIGIN_ID]}_{self.subentry.data[CONF_DESTINATION_ID]}_{self.device_identifier}")},
+            "name": f"{self.subentry.data[CONF_ORIGIN_NAME]} to {self.subentry.data[CONF_DESTINATION_NAME]}{self.device_suffix}",
+            "manufacturer": "Transport for NSW"
+        }
+
+    @property
+    def native_value(self) -> int:
+        """Return the API calls made by this journey since midnight."""
+        return self.coordinator.ledger.calls_since(dt_util.start_of_local_day()).get(self.subentry.subentry_id, 0)
+
+    @property
+    def extra_state_attributes(self):
+        """Return the last hour's usage, and this journey's share of today's total."""
+        calls_today = self.coordinator.ledger.calls_since(dt_util.start_of_local_day())
+        calls_last_hour = self.coordinator.ledger.calls_since(dt_util.now() - timedelta(hours = 1))
+        total_today = sum(calls_today.values())
+
+        return {
+            'calls_last_hour': calls_last_hour.get(self.subentry.subentry_id, 0),
+            'share_of_daily_calls': round(calls_today.get(self.subentry.subentry_id, 0) / total_today, 3) if total_today > 0 else None
+        }
+
+
+class TransportNSWBoardSensor(CoordinatorEntity, SensorEntity):
+    """The next departures from a departure board's stop - either all of them, or just those on one line."""
+
+    _attr_native_unit_of_measurement = UnitOfTime.MINUTES
+
+    def __init__(self, coordinator: TransportNSWCoordinator, subentry: ConfigSubentry, line: str | None) -> None:
+        """Initialise sensor."""
+        super().__init__(coordinator)
+
+        self.subentry = subentry
+        self.line = line
+
+        if line is None:
+            self._attr_name = f"{subentry.data[CONF_ORIGIN_NAME]} departures"
+            self._attr_unique_id = f"{subentry.subentry_id}_board"
+        else:
+            self._attr_name = f"{subentry.data[CONF_ORIGIN_NAME]} {line} departures"
+            self._attr_unique_id = f"{subentry.subentry_id}_board_line_{line.lower()}"
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Update sensor with latest data from coordinator."""
+        self.coordinator.metrics.async_write_entity_state(self)
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return device info for this sensor - all of a board's sensors share the one device."""
+        return {
+            "identifiers": {(DOMAIN, f"{self.subentry.subentry_id}_{self.subentry.data[CONF_ORIGIN_ID]}_board")},
+            "name": f"{self.subentry.data[CONF_ORIGIN_NAME]} departures",
+            "manufacturer": "Transport for NSW"
+        }
+
+    def _get_departures(self) -> list:
+        departures = (self.coordinator.data or {}).get(self.subentry.subentry_id) or []
+
+        if self.line is None:
+            return departures
+
+        return [departure for departure in departures if departure['line'].lower() == self.line.lower()]
+
+    @property
+    def available(self) -> bool:
+        """Return if entity is available - a board with no departures left is still there, it's just quiet."""
+        return self.coordinator.data is not None and self.subentry.subentry_id in self.coordinator.data
+
+    @property
+    def native_value(self) -> int | None:
+        """Return the minutes until the next departure."""
+        departures = self._get_departures()
+        return departures[0]['due'] if departures else None
+
+    @property
+    def icon(self) -> str:
+        departures = self._get_departures()
+        return JOURNEY_ICONS.get(departures[0]['mode'] if departures else None, 'mdi:train')
+
+    @property
+    def extra_state_attributes(self):
+        """Return the upcoming departures."""
+        attrs = {'stop_id': self.subentry.data[CONF_ORIGIN_ID]}
+
+        try:
+            departures = self._get_departures()
+
+            if self.line is not None:
+                attrs['line'] = self.line
+                departures = departures[:BOARD_LINE_DEPARTURES]
+
+            attrs['departures'] = [get_board_departure(departure) for departure in departures]
+
+        except Exception as ex:
+            _LOGGER.error(f"Error {ex} retrieving the departures for {self.name}")
+
+        finally:
+            attrs['attribution'] = TFNSW_ATTRIBUTION
+
+        return attrs
+
 
 class TransportNSWSubentrySensor(CoordinatorEntity, SensorEntity):
     """Implementation of subentry sensor."""
@@ -487,7 +705,7 @@ class TransportNSWSubentrySensor(CoordinatorEntity, SensorEntity):
     def _handle_coordinator_update(self) -> None:
         """Update sensor with latest data from coordinator."""
         # This method is called by the DataUpdateCoordinator when a successful update runs.
-        self.async_write_ha_state()
+        self.coordinator.metrics.async_write_entity_state(self)
 
     @property
     def device_info(self) -> DeviceInfo:
@@ -0,0 +1,116 @@
+"""Services for the Transport NSW Mk II integration."""
+
+from __future__ import annotations
+
+import logging
+
+import voluptuous as vol
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse
+)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ATTR_CONFIG_ENTRY_ID,
+    DOMAIN,
+    SERVICE_EXPORT_TRACES,
+    SERVICE_PROFILE_POLL
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+PROFILE_POLL_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    }
+)
+
+EXPORT_TRACES_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    }
+)
+
+
+def get_coordinators(hass: HomeAssistant, call: ServiceCall) -> list:
+    # Return the coordinators for the requested config entry, or for all of them if one wasn't specified
+    if ATTR_CONFIG_ENTRY_ID in call.data:
+        config_entry = hass.config_entries.async_get_entry(call.data[ATTR_CONFIG_ENTRY_ID])
+
+        if config_entry is None or config_entry.domain != DOMAIN or config_entry.state != ConfigEntryState.LOADED:
+            raise ServiceValidationError(f"Config entry {call.data[ATTR_CONFIG_ENTRY_ID]} is not a loaded Transport NSW Mk II entry")
+
+        config_entries = [config_entry]
+    else:
+        config_entries = hass.config_entries.async_loaded_entries(DOMAIN)
+
+    if not config_entries:
+        raise ServiceValidationError("There are no loaded Transport NSW Mk II entries")
+
+    return [config_entry.runtime_data.coordinator for config_entry in config_entries]
+
+
+async def async_handle_profile_poll(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Profile a single poll cycle and return where the report was written."""
+    # Only pull in the profiling code when it's actually needed
+    from .profiling import async_profile_poll
+
+    return await async_profile_poll(hass, get_coordinators(hass, call))
+
+
+async def async_handle_export_traces(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Write the recorded traces to a JSON Lines file and return where it was written."""
+    from .tracing import write_traces_jsonl
+
+    coordinators = get_coordinators(hass, call)
+
+    if not any(coordinator.tracer.enabled for coordinator in coordinators):
+        raise ServiceValidationError("Tracing isn't enabled - turn it on in the integration options first")
+
+    spans = []
+    for coordinator in coordinators:
+        for span in coordinator.tracer.export():
+            spans.append({'config_entry': coordinator.config_entry.title, **span})
+
+    file_path = hass.config.path(f"{DOMAIN}_traces_{dt_util.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+    span_count = await hass.async_add_executor_job(write_traces_jsonl, file_path, spans)
+
+    _LOGGER.info("%s trace spans written to %s", span_count, file_path)
+
+    return {
+        'path': file_path,
+        'spans': span_count
+    }
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration services."""
+
+    async def _async_profile_poll(call: ServiceCall) -> ServiceResponse:
+        return await async_handle_profile_poll(hass, call)
+
+    async def _async_export_traces(call: ServiceCall) -> ServiceResponse:
+        return await async_handle_export_traces(hass, call)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE_POLL,
+        _async_profile_poll,
+        schema = PROFILE_POLL_SCHEMA,
+        supports_response = SupportsResponse.ONLY
+    )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT_TRACES,
+        _async_export_traces,
+        schema = EXPORT_TRACES_SCHEMA,
+        supports_response = SupportsResponse.ONLY
+    )
@@ -0,0 +1,185 @@
+"""Nearest stop lookups for the Transport NSW Mk II integration."""
+
+from __future__ import annotations
+
+import csv
+import logging
+import math
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import location as location_util
+
+from .const import (
+    DOMAIN,
+    STOP_INDEX_CELL_SIZE,
+    STOP_INDEX_SAVE_DELAY,
+    STOP_INDEX_STORAGE_VERSION,
+    STOP_SNAP_DISTANCE
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Roughly how many metres there are in a degree of latitude
+METRES_PER_DEGREE = 111320
+
+
+def is_stop_id(stop_id) -> bool:
+    # As per the library, a stop ID we can plan from is numeric, bar an optional letter at the front
+    return isinstance(stop_id, str) and len(stop_id) > 1 and stop_id[1:].isnumeric()
+
+
+class StopIndex:
+    """Stop coordinates in a grid of cells a few hundred metres across, so the stops near a position can be found without
+    checking every stop.
+
+    Stops come from the stop finder and journey results as they're seen, which are kept in HA storage, and optionally from a
+    local GTFS stops.txt, which isn't.
+    """
+
+    def __init__(self, hass: HomeAssistant, cell_size: float = STOP_INDEX_CELL_SIZE) -> None:
+        self.hass = hass
+        self._store = Store(hass, STOP_INDEX_STORAGE_VERSION, f"{DOMAIN}.stops")
+        self.cell_size = cell_size
+        self._cells = {}            # (row, column) to {stop ID: (latitude, longitude)}
+        self._seen = {}             # Stop ID to [name, latitude, longitude], for the stops that get saved
+        self.gtfs_files = set()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return sum(len(stops) for stops in self._cells.values())
+
+    def _get_cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return int(math.floor(latitude / self.cell_size)), int(math.floor(longitude / self.cell_size))
+
+    def _add(self, stop_id: str, latitude: float, longitude: float) -> None:
+        self._cells.setdefault(self._get_cell(latitude, longitude), {})[stop_id] = (latitude, longitude)
+
+    @callback
+    def async_add_stop(self, stop_id, name, coords) -> None:
+        """Add a stop that's been seen, if it has an ID we can plan from and some coordinates."""
+        if not is_stop_id(stop_id) or not coords:
+            return
+
+        try:
+            latitude, longitude = float(coords[0]), float(coords[1])
+
+        except (TypeError, ValueError, IndexError):
+            return
+
+        if stop_id in self._seen and self._seen[stop_id][1:] == [latitude, longitude]:
+            return
+
+        self._seen[stop_id] = [name, latitude, longitude]
+        self._add(stop_id, latitude, longitude)
+        self._store.async_delay_save(self._data_to_save, STOP_INDEX_SAVE_DELAY)
+
+    @callback
+    def async_add_stop_finder_results(self, stop_data: dict) -> None:
+        """Add the stops returned by check_stops."""
+        for stop in stop_data.get('stop_list', []):
+            if stop['valid'] and stop['stop_detail']:
+                self.async_add_stop(stop['stop_id'], stop['stop_detail'].get('disassembledName'), stop['stop_detail'].get('coord'))
+
+    @callback
+    def async_add_journey_stops(self, journeys: list[dict]) -> None:
+        """Add the stops that the planned journeys start, change and finish at."""
+        for journey in journeys:
+            for detail in [journey.get('origin_detail', {}), journey.get('destination_detail', {})]:
+                coords = detail.get('coords') or {}
+                self.async_add_stop(detail.get('stop_id'), detail.get('name'), [coords.get('latitude'), coords.get('longitude')])
+
+            for stop in journey.get('stop_list', []):
+                coords = stop.get('coords') or {}
+                self.async_add_stop(stop.get('id'), stop.get('disassembled_name'), [coords.get('latitude'), coords.get('longitude')])
+
+    def nearest(self, latitude: float, longitude: float, max_distance: float = STOP_SNAP_DISTANCE) -> list[tuple[float, str]]:
+        """Return the (distance, stop ID) of each stop within max_distance metres, nearest first."""
+        # A degree of longitude is the shorter one away from the equator, so search enough cells for that in both directions
+        metres_per_cell = self.cell_size * METRES_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)
+        reach = int(math.ceil(max_distance / metres_per_cell))
+        row, column = self._get_cell(latitude, longitude)
+
+        candidates = []
+
+        for cell_row in range(row - reach, row + reach + 1):
+            for cell_column in range(column - reach, column + reach + 1):
+                for stop_id, (stop_latitude, stop_longitude) in self._cells.get((cell_row, cell_column), {}).items():
+                    distance = location_util.distance(latitude, longitude, stop_latitude, stop_longitude)
+
+                    if distance is not None and distance <= max_distance:
+                        candidates.append((distance, stop_id))
+
+        return sorted(candidates)
+
+    def nearest_stop(self, latitude: float, longitude: float, max_distance: float = STOP_SNAP_DISTANCE) -> str | None:
+        candidates = self.nearest(latitude, longitude, max_distance)
+        return candidates[0][1] if candidates else None
+
+    async def async_load(self) -> None:
+        """Load the stops seen before the last restart."""
+        self.loaded = True
+
+        try:
+            stored = await self._store.async_load()
+
+        except Exception as ex:
+            _LOGGER.warning("Error %s loading the stops seen so far, starting afresh", ex)
+            return
+
+        if not stored:
+            return
+
+        for stop_id, (name, latitude, longitude) in stored.get('stops', {}).items():
+            if stop_id not in self._seen:
+                self._seen[stop_id] = [name, latitude, longitude]
+                self._add(stop_id, latitude, longitude)
+
+    async def async_load_gtfs(self, file_path: str) -> None:
+        """Add every stop in a GTFS stops.txt, once per file."""
+        if file_path in self.gtfs_files:
+            return
+
+        self.gtfs_files.add(file_path)
+
+        try:
+            stops = await self.hass.async_add_executor_job(read_gtfs_stops, file_path)
+
+        except Exception as ex:
+            _LOGGER.warning("Error %s reading GTFS stops from %s", ex, file_path)
+            return
+
+        for stop_id, latitude, longitude in stops:
+            self._add(stop_id, latitude, longitude)
+
+        _LOGGER.debug("Loaded %s GTFS stops from %s", len(stops), file_path)
+
+    @callback
+    def _data_to_save(self) -> dict:
+        return {'stops': self._seen}
+
+
+def read_gtfs_stops(file_path: str) -> list[tuple[str, float, float]]:
+    # Only the stops we can plan from, with coordinates - entrances, nodes and the like are skipped
+    stops = []
+
+    with open(file_path, encoding = 'utf-8-sig', newline = '') as stops_file:
+        for row in csv.DictReader(stops_file):
+            # Location types 0 and 1 are stops or platforms and stations, blank is the same as 0
+            if row.get('location_type', '') not in ['', '0', '1']:
+                continue
+
+            if is_stop_id(row.get('stop_id')) and row.get('stop_lat') and row.get('stop_lon'):
+                stops.append((row['stop_id'], float(row['stop_lat']), float(row['stop_lon'])))
+
+    return stops
+
+
+def get_stop_index(hass: HomeAssistant) -> StopIndex:
+    # Stops are the same for everyone, so there's one index for all the config entries and flows
+    domain_data = hass.data.setdefault(DOMAIN, {})
+
+    if "stop_index" not in domain_data:
+        domain_data["stop_index"] = StopIndex(hass)
+
+    return domain_data["stop_index"]
@@ -9,6 +9,8 @@ from typing import Any
 import voluptuous as vol
 from homeassistant.helpers.selector import selector #, BooleanSelector, BooleanSelectorConfig  #TODO standardise on selector use
 from homeassistant.helpers.selector import (
+    EntitySelector,
+    EntitySelectorConfig,
     SelectSelector,
     SelectSelectorConfig,
     SelectSelectorMode,
@@ -44,6 +46,8 @@ from .helpers import (
     set_optional_sensors,
     get_device_trackers
 )
+from .ratelimit import async_call_limited
+from .spatial import get_stop_index
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -157,12 +161,21 @@ class JourneySubEntryFlowHandler(ConfigSubentryFlow):
             stop_list.insert (0, data[CONF_ORIGIN_ID])
 
         try:
-            stop_data = await hass.async_add_executor_job (
+            stop_data, _, api_error = await async_call_limited (
+                hass,
+                config_entry.data[CONF_API_KEY],
                 check_stops,
                 config_entry.data[CONF_API_KEY],
                 stop_list
             )
 
+            if api_error is not None:
+                raise api_error
+
+            # Remember where the stops are, for planning device tracker journeys from the nearest stop
+            if config_entry.options.get(CONF_SNAP_TO_STOP, DEFAULT_SNAP_TO_STOP):
+                get_stop_index(hass).async_add_stop_finder_results(stop_data)
+
             if 'all_stops_valid' in stop_data and stop_data['all_stops_valid'] == True:
                 # Get the origin and destination stop names, we'll need them to name the subentry
 
@@ -378,6 +391,8 @@ class JourneySubEntryFlowHandler(ConfigSubentryFlow):
                 user_input[CONF_RUN_FILTER] = ''
             if CONF_ROUTE_FILTER not in user_input:
                 user_input[CONF_ROUTE_FILTER] = ''
+            if CONF_PRESENCE_PERSON not in user_input:
+                user_input[CONF_PRESENCE_PERSON] = ''
 
             # Convert the selected transport types to their numerical equivalents for the API
             #user_input[CONF_ORIGIN_TRANSPORT_TYPE] = [int(transport_type) for transport_type in user_input[CONF_ORIGIN_TRANSPORT_TYPE]]
@@ -416,6 +431,8 @@ class JourneySubEntryFlowHandler(ConfigSubentryFlow):
                     CONF_DESTINATION_TRANSPORT_TYPE: DEFAULT_TRANSPORT_TYPE,
                     CONF_MAX_CHANGES: DEFAULT_MAX_CHANGES,
                     CONF_TRIP_WAIT_TIME: DEFAULT_TRIP_WAIT_TIME,
+                    CONF_PRESENCE_ZONE: DEFAULT_PRESENCE_ZONE,
+                    CONF_PRESENCE_CONDITION: DEFAULT_PRESENCE_CONDITION,
                 }
 
             if CONF_ORIGIN_TYPE in self._input_data and self._input_data[CONF_ORIGIN_TYPE] == 'device_tracker':
@@ -455,6 +472,14 @@ class JourneySubEntryFlowHandler(ConfigSubentryFlow):
                 )
             )
 
+            presence_condition_selector = SelectSelector(
+                SelectSelectorConfig(
+                    options=PRESENCE_CONDITION_LIST,
+                    mode=SelectSelectorMode.DROPDOWN,
+                    translation_key="presence_condition_selector",
+                )
+            )
+
             STEP_SETTINGS_DATA_SCHEMA = vol.Schema(
                 {
                     vol.Required(CONF_ORIGIN_TRANSPORT_TYPE): origin_transport_selector,
@@ -463,6 +488,9 @@ class JourneySubEntryFlowHandler(ConfigSubentryFlow):
                     vol.Optional(CONF_RUN_FILTER): optional_text_selector,
                     vol.Required(CONF_MAX_CHANGES): vol.All(vol.Coerce(int), vol.Range(min=0, max=MAX_MAX_CHANGES)),
                     vol.Required(CONF_TRIP_WAIT_TIME): vol.All(vol.Coerce(int), vol.Range(min=0, max=MAX_TRIP_WAIT_TIME)),
+                    vol.Optional(CONF_PRESENCE_PERSON): EntitySelector(EntitySelectorConfig(domain="person")),
+                    vol.Optional(CONF_PRESENCE_ZONE, default = DEFAULT_PRESENCE_ZONE): EntitySelector(EntitySelectorConfig(domain="zone")),
+                    vol.Optional(CONF_PRESENCE_CONDITION, default = DEFAULT_PRESENCE_CONDITION): presence_condition_selector,
                 }
             )
 
@@ -818,6 +846,170 @@ class JourneySubEntryFlowHandler(ConfigSubentryFlow):
         return await self.async_step_settings()     #TODO - support going to async_step_users (with all that that implies re total changes)
 
 
+class BoardSubEntryFlowHandler(ConfigSubentryFlow):
+    """Handle a departure board subentry flow for Transport NSW MK II"""
+
+    async def _validate_input(self, hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
+        """ Check that the board's stop is valid, and get its name.  This tests the API key as well.  Exceptions will be caught upstream """
+
+        config_entry = self._get_entry()
+
+        stop_data, _, api_error = await async_call_limited (
+            hass,
+            config_entry.data[CONF_API_KEY],
+            check_stops,
+            config_entry.data[CONF_API_KEY],
+            [data[CONF_ORIGIN_ID]]
+        )
+
+        if api_error is not None:
+            raise api_error
+
+        # Remember where the stop is, for planning device tracker journeys from the nearest stop
+        if config_entry.options.get(CONF_SNAP_TO_STOP, DEFAULT_SNAP_TO_STOP):
+            get_stop_index(hass).async_add_stop_finder_results(stop_data)
+
+        if not stop_data.get('all_stops_valid', False):
+            raise StopError("The stop ID is invalid", "stoperror")
+
+        # It's possible that the stop check returned a better stop ID, so use it
+        data[CONF_ORIGIN_NAME] = stop_data['stop_list'][0]['stop_detail']['disassembledName']
+        data[CONF_ORIGIN_ID] = stop_data['stop_list'][0]['stop_id']
+
+        return {
+            "title": f"Departures from {data[CONF_ORIGIN_NAME]}"
+        }
+
+    async def async_step_user(
+        self, user_input: dict[str, Any] | None = None
+    ) -> SubentryFlowResult:
+        """Handle the only step - a board just needs a stop and a few filters."""
+
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            # Fix up an issue with how Voluptuous treats empty fields
+            if CONF_ROUTE_FILTER not in user_input:
+                user_input[CONF_ROUTE_FILTER] = ''
+            if CONF_BOARD_LINES not in user_input:
+                user_input[CONF_BOARD_LINES] = []
+
+            try:
+                info = await self._validate_input(self.hass, user_input)
+
+            except InvalidAPIKey as ex:
+                errors["base"] = "invalidapikey"
+
+            except APIRateLimitExceeded as ex:
+                errors["base"] = "apiratelimitexceeded"
+
+            except StopError as ex:
+                errors["base"] = "stoperror"
+
+            except Exception as ex:
+                errors["base"] = "unknown"
+
+            if "base" not in errors:
+                unique_id = f"{user_input[CONF_ORIGIN_ID]}_board"
+                reconfigure_subentry = self._get_reconfigure_subentry() if self.source == SOURCE_RECONFIGURE else None
+
+                for existing_subentry in self._get_entry().subentries.values():
+                    if existing_subentry.unique_id == unique_id and existing_subentry is not reconfigure_subentry:
+                        errors["base"] = "board_already_configured"
+
+            if "base" not in errors:
+                if reconfigure_subentry is not None:
+                    # Keep the existing title, in case the user has renamed it, unless the board's moved to another stop
+                    if reconfigure_subentry.data[CONF_ORIGIN_ID] == user_input[CONF_ORIGIN_ID]:
+                        title = reconfigure_subentry.title
+                    else:
+                        title = info['title']
+
+                    return self.async_update_reload_and_abort(
+                        self._get_entry(),
+                        reconfigure_subentry,
+                        unique_id = unique_id,
+                        data = user_input,
+                        title = title
+                    )
+
+                self.hass.config_entries.async_add_subentry(
+                    self._get_entry(),
+                    ConfigSubentry(
+                        data = user_input,
+                        subentry_type = SUBENTRY_TYPE_BOARD,
+                        title = info['title'],
+                        unique_id = unique_id
+                    ),
+                )
+
+                await self.hass.config_entries.async_reload(self._get_entry().entry_id)
+
+                return self.async_abort(
+                    reason = "board_created",
+                    description_placeholders = {"board_name": info['title']}
+                )
+
+        # Are we reconfiguring or are we creating a new board?
+        if user_input is None:
+            if self.source == SOURCE_RECONFIGURE:
+                user_input = dict(self._get_reconfigure_subentry().data)
+            else:
+                user_input = {
+                    CONF_ORIGIN_TRANSPORT_TYPE: DEFAULT_TRANSPORT_TYPE,
+                    CONF_TRIP_WAIT_TIME: DEFAULT_BOARD_WAIT_TIME,
+                    CONF_DEPARTURES_TO_SHOW: DEFAULT_DEPARTURES_TO_SHOW,
+                }
+
+        # Walking isn't something that departs from a stop
+        transport_selector = SelectSelector(
+            SelectSelectorConfig(
+                options=[str(transport_type) for transport_type in LOCAL_FILTER_TRANSPORT_TYPES],
+                multiple=True,
+                mode=SelectSelectorMode.DROPDOWN,
+                translation_key="transport_type_selector",
+            )
+        )
+
+        board_lines_selector = SelectSelector(
+            SelectSelectorConfig(
+                options=[],
+                multiple=True,
+                custom_value=True,
+                mode=SelectSelectorMode.DROPDOWN,
+            )
+        )
+
+        BOARD_DATA_SCHEMA = vol.Schema(
+            {
+                vol.Required(CONF_ORIGIN_ID): TextSelector(TextSelectorConfig(type=TextSelectorType.TEXT)),
+                vol.Required(CONF_ORIGIN_TRANSPORT_TYPE): transport_selector,
+                vol.Optional(CONF_ROUTE_FILTER): TextSelector(TextSelectorConfig(type=TextSelectorType.TEXT)),
+                vol.Required(CONF_TRIP_WAIT_TIME): vol.All(vol.Coerce(int), vol.Range(min=0, max=MAX_TRIP_WAIT_TIME)),
+                vol.Required(CONF_DEPARTURES_TO_SHOW): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_DEPARTURES_TO_SHOW)),
+                vol.Optional(CONF_BOARD_LINES): board_lines_selector,
+            }
+        )
+
+        return self.async_show_form(
+            step_id="user",
+            data_schema=self.add_suggested_values_to_schema(
+                BOARD_DATA_SCHEMA,
+                user_input
+            ),
+            description_placeholders={"tfnsw_stopfinder": TFNSW_STOPFINDER},
+            errors=errors,
+            last_step=True
+        )
+
+    async def async_step_reconfigure(
+        self, user_input: dict[str, Any] | None = None
+    ) -> SubentryFlowResult:
+        """User flow to modify an existing board."""
+
+        return await self.async_step_user()
+
+
 class CannotConnect(HomeAssistantError):
     """Error to indicate we cannot connect."""
 
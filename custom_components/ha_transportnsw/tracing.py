@@ -0,0 +1,123 @@
+"""Lightweight structured tracing of polls, journeys and API calls."""
+
+from __future__ import annotations
+
+from collections import deque
+from contextvars import ContextVar
+import itertools
+import json
+from pathlib import Path
+import time
+from typing import Any
+
+from .const import DOMAIN, TRACE_HISTORY_LENGTH
+
+# The currently active span - a ContextVar so that concurrent tasks each see their own parent
+_current_span: ContextVar[Span | None] = ContextVar(f"{DOMAIN}_current_span", default = None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """A single timed operation, with optional attributes."""
+
+    __slots__ = ('name', 'trace', 'trace_id', 'span_id', 'parent_id', 'start', 'duration', 'attributes', '_perf_start', '_token')
+
+    recording = True
+
+    def __init__(self, name: str, trace: list[Span], parent: Span | None, attributes: dict[str, Any]) -> None:
+        self.name = name
+        self.trace = trace
+        self.span_id = next(_span_ids)
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = time.time()
+        self.duration = None
+        self.attributes = attributes
+        self._perf_start = time.perf_counter()
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.duration = time.perf_counter() - self._perf_start
+
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+
+        _current_span.reset(self._token)
+        self.trace.append(self)
+
+        # Don't swallow the exception
+        return False
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration': round(self.duration, 6) if self.duration is not None else None,
+            'attributes': self.attributes
+        }
+
+
+class NoopSpan:
+    """Returned when tracing is disabled - does nothing, as cheaply as possible."""
+
+    __slots__ = ()
+
+    recording = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> NoopSpan:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        return False
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class Tracer:
+    """Collects completed traces into a bounded buffer, but only while enabled."""
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.traces = deque(maxlen = TRACE_HISTORY_LENGTH)
+
+    def span(self, name: str, **attributes) -> Span | NoopSpan:
+        """Start a span, as a child of the current span if there is one, otherwise as the root of a new trace."""
+        if not self.enabled:
+            return NOOP_SPAN
+
+        parent = _current_span.get()
+
+        if parent is None or not parent.recording:
+            # A new root span, so a new trace
+            trace = []
+            self.traces.append(trace)
+            return Span(name, trace, None, attributes)
+
+        return Span(name, parent.trace, parent, attributes)
+
+    def export(self) -> list[dict[str, Any]]:
+        """Return all the completed spans, oldest trace first."""
+        return [span.as_dict() for trace in list(self.traces) for span in sorted(trace, key = lambda span: span.start)]
+
+
+def write_traces_jsonl(file_path: str, spans: list[dict[str, Any]]) -> int:
+    # Write one span per line, for offline analysis
+    with Path(file_path).open('w', encoding = 'utf8') as trace_file:
+        for span in spans:
+            trace_file.write(json.dumps(span, default = str) + '\n')
+
+    return len(spans)
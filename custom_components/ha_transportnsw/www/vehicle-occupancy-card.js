@@ -1,5 +1,9 @@
 const CARD_VERSION = '3.1.0b3'
 
+// How often the card tells the integration it's still showing its journeys.
+// The integration forgets about the card if it hasn't heard from it for 5 minutes.
+const INTEREST_RENEWAL_INTERVAL = 120;
+
 class VehicleOccupancyCard extends HTMLElement {
   constructor() {
     super();
@@ -14,6 +18,12 @@ class VehicleOccupancyCard extends HTMLElement {
     this.entity2Index = 0;
     this.entity2Timer = null;
     this.entity2Key = "";
+
+    // Lets the integration know which journeys are on screen, so it can
+    // update them more often than the ones nobody is looking at.
+    this.interestLeaseId = `${Date.now().toString(36)}${Math.random().toString(36).slice(2)}`;
+    this.interestTimer = null;
+    this.interestRegistered = false;
   }
 
   static getStubConfig() {
@@ -167,6 +177,11 @@ class VehicleOccupancyCard extends HTMLElement {
     // Reset the rotation when the configuration changes.
     this.entity2Index = 0;
     this.entity2Key = entity2List.join("|");
+
+    // The card may now be showing different journeys
+    if (this._hass) {
+      this.renewInterest();
+    }
   }
 
   connectedCallback() {
@@ -176,6 +191,16 @@ class VehicleOccupancyCard extends HTMLElement {
     this.style.height = "100%";
     this.style.minHeight = "0";
 
+    if (!this.interestTimer) {
+      document.addEventListener("visibilitychange", this.handleVisibilityChange);
+
+      this.interestTimer = window.setInterval(() => {
+        this.renewInterest();
+      }, INTEREST_RENEWAL_INTERVAL * 1000);
+
+      this.renewInterest();
+    }
+
     if (this.entity2Timer) return;
 
     this.entity2Timer = window.setInterval(() => {
@@ -196,6 +221,59 @@ class VehicleOccupancyCard extends HTMLElement {
       window.clearInterval(this.entity2Timer);
       this.entity2Timer = null;
     }
+
+    if (this.interestTimer) {
+      window.clearInterval(this.interestTimer);
+      this.interestTimer = null;
+      document.removeEventListener("visibilitychange", this.handleVisibilityChange);
+      this.releaseInterest();
+    }
+  }
+
+  getInterestEntities() {
+    return [this.config?.entity, ...this.getEntity2List()].filter(Boolean);
+  }
+
+  async renewInterest() {
+    // A hidden tab isn't being looked at, so let the lease lapse
+    if (!this._hass || document.hidden) return;
+
+    try {
+      await this._hass.connection.sendMessagePromise({
+        type: 'ha_transportnsw/interest',
+        lease_id: this.interestLeaseId,
+        entity_ids: this.getInterestEntities(),
+      });
+
+      this.interestRegistered = true;
+    } catch (err) {
+      console.debug('Failed to register interest:', err)
+    }
+  }
+
+  async releaseInterest() {
+    if (!this._hass || !this.interestRegistered) return;
+
+    this.interestRegistered = false;
+
+    try {
+      await this._hass.connection.sendMessagePromise({
+        type: 'ha_transportnsw/interest',
+        lease_id: this.interestLeaseId,
+        release: true,
+      });
+    } catch (err) {
+      console.debug('Failed to release interest:', err)
+    }
+  }
+
+  // Arrow function to preserve 'this' context when used as an event listener
+  handleVisibilityChange = () => {
+    if (document.hidden) {
+      this.releaseInterest();
+    } else {
+      this.renewInterest();
+    }
   }
 
   getEntity2List() {
@@ -270,8 +348,14 @@ class VehicleOccupancyCard extends HTMLElement {
 
 
   set hass(hass) {
+    const firstHass = !this._hass;
+
     this._hass = hass;
     this.checkVersion(hass);
+
+    if (firstHass && this.interestTimer) {
+      this.renewInterest();
+    }
     this.render(hass);
   }
 
@@ -0,0 +1 @@
+"""Tests for the Transport NSW Mk II integration."""
@@ -0,0 +1,9 @@
+"""Fixtures for the Transport NSW Mk II tests."""
+
+import pytest
+
+
+@pytest.fixture(autouse = True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """Let Home Assistant load the integration from custom_components."""
+    yield
@@ -0,0 +1,104 @@
+"""Tests for the trip plan cache."""
+
+from datetime import datetime, timezone
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.ha_transportnsw.cache import TripPlanCache, get_plan_cache
+from custom_components.ha_transportnsw.const import PLAN_CACHE_BUCKET
+
+QUERY_ARGS = {
+    'destination_id': '200060',
+    'trip_wait_time': 0,
+    'origin_transport_types': [1],
+    'destination_transport_types': [1],
+    'route_filter': 'T1',
+    'run_filter': '',
+    'max_changes': 2,
+    'journeys_to_return': 1,
+    'include_realtime_location': False
+}
+
+
+def make_plan(departs_at: float) -> dict:
+    departure_time = datetime.fromtimestamp(departs_at, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    return {'journeys': [{'due': 99, 'origin_detail': {'departure_time': departure_time}}]}
+
+
+def test_key_is_bucketed_by_time() -> None:
+    """Requests in the same time bucket share a key, whatever the case of their filters."""
+    bucket_start = 1000 * PLAN_CACHE_BUCKET
+
+    key, bucket_end = TripPlanCache.get_key('origin', QUERY_ARGS, bucket_start)
+    same_key, _ = TripPlanCache.get_key('origin', {**QUERY_ARGS, 'route_filter': 't1'}, bucket_start + PLAN_CACHE_BUCKET - 1)
+    next_key, _ = TripPlanCache.get_key('origin', QUERY_ARGS, bucket_start + PLAN_CACHE_BUCKET)
+    other_key, _ = TripPlanCache.get_key('other origin', QUERY_ARGS, bucket_start)
+
+    assert key == same_key
+    assert key != next_key
+    assert key != other_key
+    assert bucket_end == bucket_start + PLAN_CACHE_BUCKET
+
+
+async def test_get_and_set(hass: HomeAssistant) -> None:
+    """A cached plan is handed out as a copy with its due times brought up to date."""
+    cache = TripPlanCache(hass)
+    now = datetime.now(timezone.utc).timestamp()
+    key, bucket_end = cache.get_key('origin', QUERY_ARGS, now)
+
+    assert cache.get(key, now) is None
+
+    cache.set(key, make_plan(now + 3600), bucket_end, 0)
+    journey_data = cache.get(key, now)
+    journey_data['journeys'].clear()
+
+    assert cache.get(key, now)['journeys'][0]['due'] in (59, 60)
+    assert cache.get_stats()['hits'] == 2
+    assert cache.get_stats()['misses'] == 1
+
+
+async def test_expires_before_the_first_trip_leaves(hass: HomeAssistant) -> None:
+    """A plan expires at the end of its bucket, or when its first trip would no longer be returned if that's sooner."""
+    cache = TripPlanCache(hass)
+    now = 1000 * PLAN_CACHE_BUCKET
+    key, bucket_end = cache.get_key('origin', QUERY_ARGS, now)
+
+    cache.set(key, make_plan(now + 120), bucket_end, 1)
+
+    assert cache.get(key, now + 59) is not None
+    assert cache.get(key, now + 60) is None
+
+
+async def test_least_recently_used_plans_are_dropped(hass: HomeAssistant) -> None:
+    """Once the cache is full, the plan that was used longest ago makes way."""
+    cache = TripPlanCache(hass, max_size = 2)
+    now = datetime.now(timezone.utc).timestamp()
+    bucket_end = now + PLAN_CACHE_BUCKET
+
+    for key in ['a', 'b']:
+        cache.set(key, make_plan(now + 3600), bucket_end, 0)
+
+    cache.get('a', now)
+    cache.set('c', make_plan(now + 3600), bucket_end, 0)
+
+    assert cache.get('a', now) is not None
+    assert cache.get('b', now) is None
+    assert cache.get('c', now) is not None
+
+
+async def test_persistence_per_entry(hass: HomeAssistant) -> None:
+    """The cache is saved to disk while any loaded entry wants it to be."""
+    cache = get_plan_cache(hass)
+
+    assert get_plan_cache(hass) is cache
+    assert not cache.persistent
+
+    cache.set_persistent('entry_1', True)
+    cache.set_persistent('entry_2', True)
+    cache.set_persistent('entry_1', False)
+
+    assert cache.persistent
+
+    cache.set_persistent('entry_2', False)
+
+    assert not cache.persistent
@@ -0,0 +1,407 @@
+"""Tests for the Transport NSW Mk II coordinator."""
+
+from datetime import timedelta
+
+from freezegun.api import FrozenDateTimeFactory
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry, async_fire_time_changed
+
+from homeassistant import config_entries
+from homeassistant.config_entries import ConfigSubentryData
+from homeassistant.const import CONF_API_KEY
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.ha_transportnsw import coordinator as coordinator_module
+from custom_components.ha_transportnsw.const import DOMAIN, INTEREST_LEASE_TTL, SUBENTRY_TYPE_JOURNEY, TRACKER_REFRESH_DEBOUNCE
+from custom_components.ha_transportnsw.coordinator import TransportNSWCoordinator
+
+JOURNEY_DATA = {
+    'origin_type': 'stop',
+    'origin_id': '200060',
+    'destination_id': ['10101100'],
+    'trip_wait_time': 0,
+    'trips_to_create': 1,
+    'origin_transport_type': ['1'],
+    'destination_transport_type': ['1'],
+    'route_filter': '',
+    'run_filter': '',
+    'max_changes': 2,
+    'alerts': False,
+    'alert_severity': 'high',
+    'alert_types': ['all'],
+    'time_and_change_sensors': {},
+    'origin_sensors': {},
+    'destination_sensors': {},
+    'device_trackers': {}
+}
+
+
+def make_journey_subentry(title: str, **data) -> ConfigSubentryData:
+    return ConfigSubentryData(data = {**JOURNEY_DATA, **data}, subentry_type = SUBENTRY_TYPE_JOURNEY, title = title, unique_id = title)
+
+
+def make_tracker_journey_subentry(title: str, **data) -> ConfigSubentryData:
+    return make_journey_subentry(title, origin_type = 'device_tracker', origin_id = 'device_tracker.phone', destination_id = '10101100', **data)
+
+
+def make_journey(destination_id: str, departs_in: int, duration: int = 20) -> dict:
+    departure_time = dt_util.utcnow() + timedelta(minutes = departs_in)
+
+    return {
+        'due': departs_in,
+        'origin_detail': {'stop_id': '200060', 'departure_time': departure_time.strftime('%Y-%m-%dT%H:%M:%SZ')},
+        'destination_detail': {'stop_id': destination_id, 'arrival_time': (departure_time + timedelta(minutes = duration)).strftime('%Y-%m-%dT%H:%M:%SZ')}
+    }
+
+
+@pytest.fixture(autouse = True)
+def config_dir(hass: HomeAssistant, tmp_path) -> None:
+    """Keep the API key usage files out of the shared test configuration."""
+    (tmp_path / 'custom_components' / DOMAIN).mkdir(parents = True)
+    hass.config.config_dir = str(tmp_path)
+
+
+@pytest.fixture
+def trip_requests(monkeypatch) -> list:
+    """Stand in for the trip planner, recording the origin, destination and number of journeys asked for by each request."""
+    trip_requests = []
+
+    def get_trips(api_key, origin, destination_id, *args):
+        journeys_to_return = args[6]
+        trip_requests.append((origin, destination_id, journeys_to_return))
+
+        # Further destinations take longer to get to
+        duration = 20 + int(destination_id) % 10
+        return {'journeys': [make_journey(destination_id, 10 * (index + 1), duration) for index in range(journeys_to_return)]}
+
+    monkeypatch.setattr(coordinator_module, "get_trips", get_trips)
+
+    return trip_requests
+
+
+def make_coordinator(hass: HomeAssistant, *subentries: ConfigSubentryData, **options) -> TransportNSWCoordinator:
+    config_entry = MockConfigEntry(domain = DOMAIN, data = {CONF_API_KEY: "key"}, options = options, subentries_data = subentries)
+    config_entry.add_to_hass(hass)
+    config_entries.current_entry.set(config_entry)
+
+    return TransportNSWCoordinator(hass, config_entry)
+
+
+def get_subentry_id(coordinator: TransportNSWCoordinator, title: str) -> str:
+    return next(subentry.subentry_id for subentry in coordinator.config_entry.subentries.values() if subentry.title == title)
+
+
+async def test_journeys_share_trip_requests(hass: HomeAssistant, trip_requests: list) -> None:
+    """Journeys with the same origin and filters make one request per destination, asking for enough trips for all of them."""
+    coordinator = make_coordinator(
+        hass,
+        make_journey_subentry("Work", destination_id = ['10101101', '10101102']),
+        make_journey_subentry("Gym", destination_id = ['10101102'], trips_to_create = 3)
+    )
+
+    data = await coordinator.async_update_data()
+
+    assert sorted(trip_requests) == [('200060', '10101101', 1), ('200060', '10101102', 3)]
+
+    # Each journey gets its own trips back, soonest arrival first
+    work_journeys = data[get_subentry_id(coordinator, "Work")]
+    gym_journeys = data[get_subentry_id(coordinator, "Gym")]
+
+    assert [journey['destination_detail']['stop_id'] for journey in work_journeys] == ['10101101']
+    assert [journey['destination_detail']['stop_id'] for journey in gym_journeys] == ['10101102'] * 3
+
+
+async def test_journeys_with_different_filters_dont_share(hass: HomeAssistant, trip_requests: list) -> None:
+    """A journey with its own filters makes its own request, even to the same destination."""
+    coordinator = make_coordinator(
+        hass,
+        make_journey_subentry("Work"),
+        make_journey_subentry("Work by T1", route_filter = 'T1')
+    )
+
+    await coordinator.async_update_data()
+
+    assert trip_requests == [('200060', '10101100', 1)] * 2
+
+
+async def test_journeys_from_different_stops_ask_for_their_own_trips(hass: HomeAssistant, trip_requests: list) -> None:
+    """Journeys from different stops only ask for as many trips as their own origin needs."""
+    coordinator = make_coordinator(
+        hass,
+        make_journey_subentry("Work"),
+        make_journey_subentry("Work from Central", origin_id = '200070', trips_to_create = 3)
+    )
+
+    await coordinator.async_update_data()
+
+    assert sorted(trip_requests) == [('200060', '10101100', 1), ('200070', '10101100', 3)]
+
+
+async def test_tracker_journeys_poll_at_the_background_interval(hass: HomeAssistant, trip_requests: list, freezer: FrozenDateTimeFactory) -> None:
+    """With a background interval, a device tracker journey is left out of the regular polls until it's due."""
+    hass.states.async_set('device_tracker.phone', 'home', {'latitude': -33.8832, 'longitude': 151.2070})
+    coordinator = make_coordinator(
+        hass,
+        make_journey_subentry("Work"),
+        make_tracker_journey_subentry("Home"),
+        tracker_background_interval = 600
+    )
+
+    coordinator.data = await coordinator.async_update_data()
+    home_journeys = coordinator.data[get_subentry_id(coordinator, "Home")]
+
+    assert len(trip_requests) == 2
+
+    freezer.tick(coordinator.update_interval)
+    trip_requests.clear()
+    coordinator.data = await coordinator.async_update_data()
+
+    assert trip_requests == [('200060', '10101100', 1)]
+    assert coordinator.data[get_subentry_id(coordinator, "Home")] == home_journeys
+
+    freezer.tick(timedelta(seconds = 600) - coordinator.update_interval)
+    trip_requests.clear()
+    await coordinator.async_update_data()
+
+    assert len(trip_requests) == 2
+
+
+async def test_tracker_movement_refreshes_its_journeys(hass: HomeAssistant, trip_requests: list) -> None:
+    """A device tracker moving far enough refreshes just the journeys using it, once it's settled."""
+    hass.states.async_set('device_tracker.phone', 'home', {'latitude': -33.8832, 'longitude': 151.2070})
+    coordinator = make_coordinator(
+        hass,
+        make_journey_subentry("Work"),
+        make_tracker_journey_subentry("Home"),
+        tracker_background_interval = 600
+    )
+    coordinator.async_setup_tracker_listeners()
+    coordinator.data = await coordinator.async_update_data()
+
+    # A few metres isn't worth a new plan
+    trip_requests.clear()
+    hass.states.async_set('device_tracker.phone', 'home', {'latitude': -33.8833, 'longitude': 151.2070})
+    await hass.async_block_till_done()
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds = TRACKER_REFRESH_DEBOUNCE + 1))
+    await hass.async_block_till_done()
+
+    assert trip_requests == []
+
+    hass.states.async_set('device_tracker.phone', 'not_home', {'latitude': -33.8732, 'longitude': 151.2070})
+    await hass.async_block_till_done()
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds = TRACKER_REFRESH_DEBOUNCE + 1))
+    await hass.async_block_till_done()
+
+    assert trip_requests == [('151.207:-33.8732:EPSG:4326', '10101100', 1)]
+
+    # Let the debouncer's cooldown run out
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds = 2 * TRACKER_REFRESH_DEBOUNCE + 2))
+    await hass.async_block_till_done()
+
+
+async def test_presence_gated_journeys_only_poll_while_the_condition_holds(hass: HomeAssistant, trip_requests: list) -> None:
+    """A journey limited to someone being home is skipped while they're out, and refreshed as soon as they're back."""
+    hass.states.async_set('person.alex', 'not_home')
+    hass.states.async_set('zone.home', '0', {'persons': []})
+    coordinator = make_coordinator(
+        hass,
+        make_journey_subentry("Work"),
+        make_journey_subentry("Home", destination_id = ['10101101'], presence_person = 'person.alex', presence_zone = 'zone.home', presence_condition = 'in_zone')
+    )
+    coordinator.async_setup_presence_listeners()
+
+    coordinator.data = await coordinator.async_update_data()
+
+    assert trip_requests == [('200060', '10101100', 1)]
+    assert get_subentry_id(coordinator, "Home") not in coordinator.data
+
+    trip_requests.clear()
+    hass.states.async_set('person.alex', 'home')
+    hass.states.async_set('zone.home', '1', {'persons': ['person.alex']})
+    await hass.async_block_till_done()
+
+    assert trip_requests == [('200060', '10101101', 1)]
+    assert get_subentry_id(coordinator, "Home") in coordinator.data
+
+
+@pytest.mark.parametrize(
+    ("person_state", "persons", "condition", "expected"),
+    [
+        ('home', ['person.alex'], 'in_zone', True),
+        ('not_home', [], 'in_zone', False),
+        ('home', ['person.alex'], 'not_in_zone', False),
+        ('not_home', [], 'not_in_zone', True),
+        ('unavailable', [], 'in_zone', True),
+        ('unknown', [], 'in_zone', True),
+    ]
+)
+async def test_presence_condition(hass: HomeAssistant, person_state: str, persons: list, condition: str, expected: bool) -> None:
+    """The presence condition uses the zone's list of people, and doesn't hold a journey back if the person's state isn't known."""
+    hass.states.async_set('person.alex', person_state)
+    hass.states.async_set('zone.home', str(len(persons)), {'persons': persons})
+    coordinator = make_coordinator(hass, make_journey_subentry("Home", presence_person = 'person.alex', presence_condition = condition))
+    coordinator.async_setup_presence_listeners()
+
+    assert coordinator.presence_active[get_subentry_id(coordinator, "Home")] is expected
+
+
+async def test_watched_journeys_poll_at_the_normal_rate(hass: HomeAssistant, trip_requests: list, freezer: FrozenDateTimeFactory) -> None:
+    """With a background interval, only the journeys a card is showing are polled at the normal rate."""
+    coordinator = make_coordinator(
+        hass,
+        make_journey_subentry("Work"),
+        make_journey_subentry("Home", destination_id = ['10101101']),
+        interest_background_interval = 600
+    )
+
+    assert coordinator.async_register_interest('card', {get_subentry_id(coordinator, "Work"), 'not_ours'}) == 1
+
+    coordinator.data = await coordinator.async_update_data()
+    assert len(trip_requests) == 2
+
+    freezer.tick(coordinator.update_interval)
+    trip_requests.clear()
+    coordinator.data = await coordinator.async_update_data()
+
+    assert trip_requests == [('200060', '10101100', 1)]
+
+
+async def test_interest_leases_lapse_and_release(hass: HomeAssistant, freezer: FrozenDateTimeFactory) -> None:
+    """A lease lapses if it isn't renewed, and releasing one card's lease leaves another card's alone."""
+    coordinator = make_coordinator(hass, make_journey_subentry("Work"), interest_background_interval = 600)
+    subentry_id = get_subentry_id(coordinator, "Work")
+
+    coordinator.async_register_interest('first card', {subentry_id})
+    coordinator.async_register_interest('second card', {subentry_id})
+    coordinator.async_release_interest('first card')
+
+    assert coordinator._has_interest(subentry_id)
+
+    freezer.tick(timedelta(seconds = INTEREST_LEASE_TTL + 1))
+
+    assert not coordinator._has_interest(subentry_id)
+
+
+async def test_watching_a_stale_journey_refreshes_it(hass: HomeAssistant, trip_requests: list, freezer: FrozenDateTimeFactory) -> None:
+    """A journey left at the background rate is refreshed as soon as a card starts showing it."""
+    coordinator = make_coordinator(hass, make_journey_subentry("Work"), interest_background_interval = 600)
+    coordinator.data = await coordinator.async_update_data()
+
+    freezer.tick(coordinator.update_interval)
+    trip_requests.clear()
+    coordinator.async_register_interest('card', {get_subentry_id(coordinator, "Work")})
+    await hass.async_block_till_done()
+
+    assert trip_requests == [('200060', '10101100', 1)]
+
+
+async def test_buffered_trips_move_up_as_they_depart(hass: HomeAssistant, trip_requests: list, freezer: FrozenDateTimeFactory) -> None:
+    """With a buffer of extra journeys, departed trips are dropped locally, and the journey's only re-planned once it runs out."""
+    coordinator = make_coordinator(hass, make_journey_subentry("Work"), journey_buffer = 2)
+    subentry_id = get_subentry_id(coordinator, "Work")
+    coordinator.data = await coordinator.async_update_data()
+
+    assert trip_requests == [('200060', '10101100', 3)]
+    assert [journey['due'] for journey in coordinator.data[subentry_id]] == [10, 20, 30]
+
+    # The first trip leaves, and the next one takes its place
+    trip_requests.clear()
+    freezer.tick(timedelta(minutes = 11))
+    coordinator._async_count_down(dt_util.utcnow())
+    await hass.async_block_till_done()
+
+    assert trip_requests == []
+    assert [journey['due'] for journey in coordinator.data[subentry_id]] == [9, 19]
+
+    # Once they've all left, there's nothing to move up so the journey's re-planned
+    freezer.tick(timedelta(minutes = 20))
+    coordinator._async_count_down(dt_util.utcnow())
+    await hass.async_block_till_done()
+
+    assert trip_requests == [('200060', '10101100', 3)]
+    assert len(coordinator.data[subentry_id]) == 3
+
+
+async def test_trips_left_with_and_without_a_buffer(hass: HomeAssistant) -> None:
+    """Without a buffer any trip leaving means a re-plan, but with one it's only when there aren't enough left for the trip slots."""
+    coordinator = make_coordinator(hass, make_journey_subentry("Work", trips_to_create = 2))
+    subentry = coordinator.config_entry.subentries[get_subentry_id(coordinator, "Work")]
+    journeys = [make_journey('10101100', departs_in) for departs_in in [-1, 5, 10]]
+
+    assert coordinator._get_remaining_journeys(subentry, journeys) == journeys[1:]
+    assert not coordinator._has_trip_left(subentry, journeys)
+    assert coordinator._has_trip_left(subentry, journeys[:2])
+
+
+async def test_every_journey_polls_without_a_background_interval(hass: HomeAssistant, trip_requests: list) -> None:
+    """Without a background interval there's nothing to schedule, so every poll polls every journey."""
+    hass.states.async_set('device_tracker.phone', 'home', {'latitude': -33.8832, 'longitude': 151.2070})
+    coordinator = make_coordinator(hass, make_journey_subentry("Work"), make_tracker_journey_subentry("Home"))
+
+    coordinator.data = await coordinator.async_update_data()
+    trip_requests.clear()
+    coordinator.data = await coordinator.async_update_data()
+
+    assert len(trip_requests) == 2
+
+
+async def test_requested_refreshes_poll_every_journey(hass: HomeAssistant, trip_requests: list) -> None:
+    """A requested refresh, e.g. from homeassistant.update_entity, polls the journeys that aren't due as well."""
+    hass.states.async_set('device_tracker.phone', 'home', {'latitude': -33.8832, 'longitude': 151.2070})
+    coordinator = make_coordinator(
+        hass,
+        make_journey_subentry("Work"),
+        make_tracker_journey_subentry("Home"),
+        tracker_background_interval = 600
+    )
+    coordinator.data = await coordinator.async_update_data()
+
+    trip_requests.clear()
+    await coordinator.async_request_refresh()
+
+    assert len(trip_requests) == 2
+
+    # Let the request debouncer's cooldown run out
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds = 11))
+    await hass.async_block_till_done()
+
+
+async def test_plan_cache_only_serves_the_first_poll(hass: HomeAssistant, trip_requests: list) -> None:
+    """A reloaded entry's first poll reuses the plans that are still current, but later polls get fresh realtime data."""
+    coordinator = make_coordinator(hass, make_journey_subentry("Work"))
+    await coordinator.async_update_data()
+
+    trip_requests.clear()
+    reloaded_coordinator = TransportNSWCoordinator(hass, coordinator.config_entry)
+    reloaded_coordinator.data = await reloaded_coordinator.async_update_data()
+
+    assert trip_requests == []
+
+    reloaded_coordinator.data = await reloaded_coordinator.async_update_data()
+
+    assert trip_requests == [('200060', '10101100', 1)]
+
+
+async def test_movement_gate_replans_at_the_replan_interval(hass: HomeAssistant, trip_requests: list, freezer: FrozenDateTimeFactory) -> None:
+    """A device tracker journey's plan is reused while the tracker stays put, but only until the re-plan interval is up."""
+    hass.states.async_set('device_tracker.phone', 'home', {'latitude': -33.8832, 'longitude': 151.2070})
+    coordinator = make_coordinator(
+        hass,
+        make_tracker_journey_subentry("Home", trips_to_create = 1),
+        movement_radius = 200,
+        trip_pinning = True,
+        replan_interval = 5
+    )
+    coordinator.data = await coordinator.async_update_data()
+
+    trip_requests.clear()
+    freezer.tick(timedelta(minutes = 2))
+    coordinator.data = await coordinator.async_update_data()
+
+    assert trip_requests == []
+
+    freezer.tick(timedelta(minutes = 3))
+    coordinator.data = await coordinator.async_update_data()
+
+    assert len(trip_requests) == 1
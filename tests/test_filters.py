@@ -0,0 +1,101 @@
+"""Tests for filtering a wider set of journeys locally."""
+
+from datetime import datetime, timedelta, timezone
+
+from custom_components.ha_transportnsw.const import LOCAL_FILTER_CANDIDATE_FACTOR, LOCAL_FILTER_TRANSPORT_TYPES
+from custom_components.ha_transportnsw.filters import JourneyFilter, can_filter_locally
+from custom_components.ha_transportnsw.helpers import get_journeys_to_request, get_trip_query, merge_trip_queries
+
+NOW = datetime(2026, 1, 1, 8, 0, 30, tzinfo = timezone.utc)
+
+JOURNEY_DATA = {
+    'trips_to_create': 2,
+    'origin_transport_type': ['1'],
+    'destination_transport_type': ['1'],
+    'route_filter': '',
+    'run_filter': '',
+    'max_changes': 2,
+    'trip_wait_time': 0
+}
+
+
+def make_journey(departs_in: int, mode: str = 'Train', line: str = 'T1', run: str = 'Hornsby via Strathfield', changes: int = 0,
+                 last_mode: str | None = None) -> dict:
+    return {
+        'changes': changes,
+        'origin_detail': {'departure_time': (NOW + timedelta(minutes = departs_in)).strftime('%Y-%m-%dT%H:%M:%SZ')},
+        'origin_transport_detail': {'type': mode, 'line_name_short': line, 'line_name': f'{line} North Shore Line', 'run_name': run},
+        'destination_transport_detail': {'type': last_mode or mode}
+    }
+
+
+def test_can_filter_locally() -> None:
+    """Journeys that accept a walking first or last leg have to make their own request."""
+    assert can_filter_locally(JOURNEY_DATA)
+    assert not can_filter_locally({**JOURNEY_DATA, 'origin_transport_type': ['1', '99']})
+    assert not can_filter_locally({**JOURNEY_DATA, 'destination_transport_type': ['99']})
+
+
+def test_filter_transport_types() -> None:
+    """The first and last vehicle legs have to be one of the journey's transport types, and 0 means any."""
+    journeys = [make_journey(5), make_journey(6, mode = 'Bus'), make_journey(7, last_mode = 'Ferry')]
+
+    assert JourneyFilter([1], [1]).apply(journeys, NOW) == journeys[:1]
+    assert JourneyFilter([1, 5], [0]).apply(journeys, NOW) == journeys
+
+
+def test_filter_route_and_run() -> None:
+    """The route filter matches either line name and the run filter the run name, ignoring case."""
+    journeys = [make_journey(5), make_journey(6, line = 'T9', run = 'Gordon via Strathfield')]
+
+    assert JourneyFilter([1], [1], route_filter = 'north shore').apply(journeys, NOW) == journeys
+    assert JourneyFilter([1], [1], route_filter = 't9').apply(journeys, NOW) == journeys[1:]
+    assert JourneyFilter([1], [1], run_filter = 'HORNSBY').apply(journeys, NOW) == journeys[:1]
+
+
+def test_filter_changes_and_wait_time() -> None:
+    """Journeys with too many changes, or that leave before the wait time is up, are dropped."""
+    journeys = [make_journey(5), make_journey(8, changes = 3), make_journey(12)]
+
+    assert JourneyFilter([1], [1], max_changes = 2).apply(journeys, NOW) == [journeys[0], journeys[2]]
+    assert JourneyFilter([1], [1], max_changes = 5, trip_wait_time = 8).apply(journeys, NOW) == journeys[1:]
+
+
+def test_filter_from_subentry() -> None:
+    """The filters come from the journey's configuration."""
+    journey_filter = JourneyFilter.from_subentry({**JOURNEY_DATA, 'route_filter': 'T1', 'origin_transport_type': ['1', '5']})
+
+    assert journey_filter.origin_transport_types == frozenset([1, 5])
+    assert journey_filter.route_filter == 't1'
+
+
+def test_local_query_only_depends_on_origin_and_destination() -> None:
+    """Locally filtered journeys share a request whatever their filters."""
+    query_key, query = get_trip_query(JOURNEY_DATA, 'origin', 'destination', local_filtering = True)
+    other_query_key, _ = get_trip_query({**JOURNEY_DATA, 'route_filter': 'T1', 'max_changes': 0}, 'origin', 'destination', local_filtering = True)
+
+    assert query_key == other_query_key == ('origin', 'destination')
+    assert query['origin_transport_types'] == LOCAL_FILTER_TRANSPORT_TYPES
+    assert query['route_filter'] == ''
+
+
+def test_local_candidates_only_when_journeys_are_discarded() -> None:
+    """Extra journeys are only asked for when some of the wider request's journeys are going to be filtered out."""
+    unfiltered_data = {**JOURNEY_DATA, 'origin_transport_type': LOCAL_FILTER_TRANSPORT_TYPES, 'destination_transport_type': LOCAL_FILTER_TRANSPORT_TYPES}
+    _, unfiltered_query = get_trip_query(unfiltered_data, 'origin', 'destination', local_filtering = True)
+    _, filtered_query = get_trip_query(JOURNEY_DATA, 'origin', 'destination', local_filtering = True)
+    _, waiting_query = get_trip_query({**unfiltered_data, 'trip_wait_time': 10}, 'origin', 'destination', local_filtering = True)
+
+    assert get_journeys_to_request(unfiltered_query) == 2
+    assert get_journeys_to_request(filtered_query) == 2 * LOCAL_FILTER_CANDIDATE_FACTOR
+    assert get_journeys_to_request(merge_trip_queries(unfiltered_query, unfiltered_query)) == 2
+    assert get_journeys_to_request(merge_trip_queries(unfiltered_query, waiting_query)) == 2 * LOCAL_FILTER_CANDIDATE_FACTOR
+
+
+def test_unfiltered_query_is_keyed_by_filters() -> None:
+    """Without local filtering, journeys only share a request if their filters match, and ask for just their own trips."""
+    query_key, query = get_trip_query(JOURNEY_DATA, 'origin', 'destination', journey_buffer = 1)
+    other_query_key, _ = get_trip_query({**JOURNEY_DATA, 'route_filter': 'T1'}, 'origin', 'destination')
+
+    assert query_key != other_query_key
+    assert get_journeys_to_request(query) == 3
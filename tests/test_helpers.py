@@ -0,0 +1,335 @@
+"""Tests for the Transport NSW Mk II helper functions."""
+
+from datetime import timedelta
+
+import pytest
+from TransportNSWv2 import APIRateLimitExceeded, InvalidAPIKey, StopError
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.ha_transportnsw import helpers
+from custom_components.ha_transportnsw.helpers import (
+    filter_alerts,
+    get_departures,
+    get_destination_ids,
+    get_journeys_to_request,
+    get_trip_query,
+    merge_trip_queries,
+    refresh_departure_times,
+    update_departures_due
+)
+
+JOURNEY_DATA = {
+    'origin_id': '200060',
+    'destination_id': ['10101100'],
+    'trip_wait_time': 0,
+    'trips_to_create': 1,
+    'origin_transport_type': ['1', '5'],
+    'destination_transport_type': ['1'],
+    'route_filter': 'T1',
+    'run_filter': '',
+    'max_changes': 2,
+    'alerts': False
+}
+
+ALERTS = [
+    {"priority": "veryLow", "type": "lineInfo"},
+    {"priority": "normal", "type": "stopInfo"},
+    {"priority": "high", "type": "lineInfo"},
+    {"priority": "veryHigh", "type": "routeInfo"},
+    {"priority": "unknown", "type": "stopInfo"}
+]
+
+
+def test_filter_alerts_by_severity() -> None:
+    """Only alerts at least as severe as asked for are kept, and an unknown priority counts as high."""
+    assert filter_alerts(ALERTS, "high", ["all"]) == ALERTS[2:]
+    assert filter_alerts(ALERTS, "normal", ["all"]) == ALERTS[1:]
+
+
+def test_filter_alerts_all_or_none() -> None:
+    """'all' keeps every alert and 'none' keeps nothing."""
+    assert filter_alerts(ALERTS, "all", ["all"]) == ALERTS
+    assert filter_alerts(ALERTS, "none", ["all"]) == []
+
+
+def test_filter_alerts_by_type() -> None:
+    """Only alerts of the types asked for are kept, whatever their case."""
+    assert filter_alerts(ALERTS, "all", ["LineInfo"]) == [ALERTS[0], ALERTS[2]]
+    assert filter_alerts(ALERTS, "high", ["stopinfo", "routeinfo"]) == ALERTS[3:]
+
+
+ALERT_JOURNEY = {
+    'changes': 0,
+    'origin_detail': {'stop_id': '2000334'},
+    'destination_detail': {'stop_id': '2000341'},
+    'origin_transport_detail': {'line_name': 'T1 North Shore & Western Line', 'line_name_short': 'T1'},
+    'destination_transport_detail': {'line_name': 'T1 North Shore & Western Line', 'line_name_short': 'T1'},
+    'stop_list': [{'id': '2000334'}, {'id': '2000341'}]
+}
+
+
+def make_affecting_alert(lines: list = [], stops: list = []) -> dict:
+    return {
+        'priority': 'high',
+        'type': 'lineInfo',
+        'affected': {'lines': [{'disassembledName': line} for line in lines], 'stops': [{'id': stop_id} for stop_id in stops]}
+    }
+
+
+def test_filter_alerts_by_journey() -> None:
+    """Only alerts about a line the journey travels on or a stop it uses are kept, including its configured stops."""
+    line_alert = make_affecting_alert(lines = ['T1'])
+    other_line_alert = make_affecting_alert(lines = ['T9'])
+    stop_alert = make_affecting_alert(stops = ['200060'])
+    other_stop_alert = make_affecting_alert(stops = ['2155384'])
+    platform_alert = {'priority': 'high', 'type': 'stopInfo', 'affected': {'stops': [{'id': '2000999', 'parent': {'id': '10101100'}}]}}
+    unspecific_alert = {'priority': 'high', 'type': 'lineInfo'}
+    alerts = [line_alert, other_line_alert, stop_alert, other_stop_alert, platform_alert, unspecific_alert]
+
+    assert filter_alerts(alerts, "all", ["all"], ALERT_JOURNEY, ['200060', '10101100']) == [line_alert, stop_alert, platform_alert, unspecific_alert]
+    assert filter_alerts(alerts, "all", ["all"], ALERT_JOURNEY) == [line_alert, unspecific_alert]
+
+    # The lines of any vehicles between the first and last aren't known, so line alerts are kept
+    assert other_line_alert in filter_alerts(alerts, "all", ["all"], {**ALERT_JOURNEY, 'changes': 2})
+
+
+def test_get_destination_ids() -> None:
+    """Device tracker journeys have a single destination, everything else a list of them."""
+    assert get_destination_ids(JOURNEY_DATA) == ['10101100']
+    assert get_destination_ids({'destination_id': '10101100'}) == ['10101100']
+
+
+def test_trip_query_key_ignores_what_the_request_doesnt_depend_on() -> None:
+    """Journeys that only differ by trip count, alerts, or the case and order of their filters share a request."""
+    query_key, query = get_trip_query(JOURNEY_DATA, '200060', '10101100')
+    other_data = {**JOURNEY_DATA, 'trips_to_create': 3, 'alerts': True, 'origin_transport_type': ['5', '1'], 'route_filter': 't1'}
+
+    assert get_trip_query(other_data, '200060', '10101100')[0] == query_key
+    assert query['destination_id'] == '10101100'
+    assert query['origin_transport_types'] == [1, 5]
+    assert query['journeys_to_return'] == 1
+
+
+def test_trip_query_key_depends_on_the_filters() -> None:
+    """Journeys with a different origin, destination or filters need their own request."""
+    query_key, _ = get_trip_query(JOURNEY_DATA, '200060', '10101100')
+
+    assert get_trip_query(JOURNEY_DATA, '200060', '10101101')[0] != query_key
+    assert get_trip_query(JOURNEY_DATA, '200070', '10101100')[0] != query_key
+    assert get_trip_query({**JOURNEY_DATA, 'trip_wait_time': 5}, '200060', '10101100')[0] != query_key
+    assert get_trip_query({**JOURNEY_DATA, 'max_changes': 0}, '200060', '10101100')[0] != query_key
+    assert get_trip_query({**JOURNEY_DATA, 'destination_transport_type': ['1', '5']}, '200060', '10101100')[0] != query_key
+
+
+def test_merge_trip_queries() -> None:
+    """A shared request asks for enough trips, early enough, with enough changes and realtime data for every journey using it."""
+    _, query = get_trip_query({**JOURNEY_DATA, 'trip_wait_time': 5}, '200060', '10101100')
+    _, other_query = get_trip_query(
+        {**JOURNEY_DATA, 'trips_to_create': 3, 'max_changes': 0, 'origin_sensors': {'origin_occupancy': True}},
+        '200060',
+        '10101100'
+    )
+
+    assert merge_trip_queries(None, query) == query
+    assert merge_trip_queries(query, other_query) == {
+        **query,
+        'trip_wait_time': 0,
+        'max_changes': 2,
+        'journeys_to_return': 3,
+        'include_realtime_location': True
+    }
+
+
+def test_trip_query_asks_for_the_journey_buffer() -> None:
+    """Any buffer of extra journeys is asked for on top of the journey's trips, without changing what it can share."""
+    query_key, query = get_trip_query(JOURNEY_DATA, '200060', '10101100')
+    buffered_query_key, buffered_query = get_trip_query(JOURNEY_DATA, '200060', '10101100', journey_buffer = 2)
+
+    assert buffered_query_key == query_key
+    assert buffered_query['journeys_to_return'] == 3
+    assert get_journeys_to_request(get_trip_query(JOURNEY_DATA, '200060', '10101100', local_filtering = True, journey_buffer = 2)[1]) > 3
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, data: dict | None = None) -> None:
+        self.status_code = status_code
+        self._data = data or {}
+
+    def json(self) -> dict:
+        return self._data
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+def make_stop_event(line: str, product_class: int, planned_in: int, delay: int = 0, **event) -> dict:
+    planned_time = dt_util.utcnow() + timedelta(minutes = planned_in)
+
+    return {
+        'departureTimePlanned': planned_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'departureTimeEstimated': (planned_time + timedelta(minutes = delay)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'location': {'id': '2000334', 'disassembledName': 'Platform 4'},
+        'transportation': {
+            'disassembledName': line,
+            'number': f'{line} Line',
+            'product': {'class': product_class},
+            'destination': {'name': 'Hornsby'}
+        },
+        'isRealtimeControlled': True,
+        **event
+    }
+
+
+def fake_departure_monitor(monkeypatch, response: FakeResponse) -> list:
+    requests_made = []
+
+    def get(url, params = None, headers = None, timeout = None):
+        requests_made.append(params)
+        return response
+
+    monkeypatch.setattr(helpers.requests, "get", get)
+    return requests_made
+
+
+def test_get_departures(monkeypatch) -> None:
+    """Departures are filtered by mode and line, and sorted by when they're expected to leave, delays and all."""
+    requests_made = fake_departure_monitor(monkeypatch, FakeResponse(200, {'stopEvents': [
+        make_stop_event('T1', 1, 5, delay = 6),
+        make_stop_event('T9', 1, 8),
+        make_stop_event('333', 5, 2),
+        make_stop_event('T1', 1, -5)
+    ]}))
+
+    departures = get_departures('key', '200060', transport_types = [1], departures_to_return = 5)
+
+    assert requests_made[0]['name_dm'] == '200060'
+    assert [(departure['line'], departure['due'], departure['delay']) for departure in departures] == [('T9', 8, 0), ('T1', 11, 6)]
+    assert departures[0]['mode'] == 'Train'
+    assert departures[0]['platform'] == 'Platform 4'
+    assert departures[0]['destination'] == 'Hornsby'
+
+    assert [departure['line'] for departure in get_departures('key', '200060', route_filter = 't1')] == ['T1']
+    assert len(get_departures('key', '200060', departures_to_return = 1)) == 1
+
+
+def test_get_departures_from_a_later_time(monkeypatch) -> None:
+    """The board can be asked for from a later time, in Sydney time whatever HA's time zone is."""
+    requests_made = fake_departure_monitor(monkeypatch, FakeResponse(200, {'stopEvents': []}))
+
+    get_departures('key', '200060', request_time = dt_util.parse_datetime('2026-01-01T08:00:00Z'))
+
+    assert (requests_made[0]['itdDate'], requests_made[0]['itdTime']) == ('20260101', '1900')
+
+
+@pytest.mark.parametrize(
+    ("response", "exception"),
+    [
+        (FakeResponse(401), InvalidAPIKey),
+        (FakeResponse(403), APIRateLimitExceeded),
+        (FakeResponse(429), APIRateLimitExceeded),
+        (FakeResponse(200, {'systemMessages': [{'type': 'error'}]}), StopError)
+    ]
+)
+def test_get_departures_errors(monkeypatch, response: FakeResponse, exception: type) -> None:
+    """Errors are mapped the way the library maps them."""
+    fake_departure_monitor(monkeypatch, response)
+
+    with pytest.raises(exception):
+        get_departures('key', '200060')
+
+
+def test_get_departures_without_any(monkeypatch) -> None:
+    """A stop with nothing leaving isn't an error."""
+    fake_departure_monitor(monkeypatch, FakeResponse(200, {'systemMessages': []}))
+
+    assert get_departures('key', '200060') == []
+
+
+def test_update_departures_due() -> None:
+    """Departures are counted down between polls, and dropped once they've gone."""
+    now = dt_util.utcnow()
+    departures = [
+        {'departure_time': (now + timedelta(minutes = minutes)).strftime('%Y-%m-%dT%H:%M:%SZ'), 'due': minutes + 2}
+        for minutes in [-1, 3, 10]
+    ]
+
+    assert [departure['due'] for departure in update_departures_due(departures, now)] == [3, 10]
+
+
+def make_pinned_journey(realtime_trip_id: str | None, stop_id: str = '200060', destination_trip_id: str | None = None) -> dict:
+    # Without a destination trip ID, the whole journey is on the one vehicle
+    stop_list = [{'id': stop_id}, {'id': '200070'}, {'id': '200080'}, {'id': '10101100'}] if destination_trip_id else [{'id': stop_id}, {'id': '10101100'}]
+
+    return {
+        'delay': 0,
+        'duration': 20,
+        'origin_real_time_trip_id': realtime_trip_id,
+        'destination_real_time_trip_id': destination_trip_id or realtime_trip_id,
+        'origin_detail': {'stop_id': stop_id, 'departure_time': '2026-01-01T08:00:00Z', 'departure_time_planned': '2026-01-01T08:00:00Z'},
+        'destination_detail': {'arrival_time': '2026-01-01T08:20:00Z', 'arrival_time_planned': '2026-01-01T08:20:00Z'},
+        'stop_list': stop_list
+    }
+
+
+def make_departure(realtime_trip_id: str | None, departure_time: str, planned_departure_time: str = '2026-01-01T08:00:00Z', cancelled: bool = False) -> dict:
+    return {'realtime_trip_id': realtime_trip_id, 'departure_time': departure_time, 'planned_departure_time': planned_departure_time, 'cancelled': cancelled}
+
+
+def test_refresh_departure_times(monkeypatch) -> None:
+    """Pinned trips pick up their latest departure and arrival times and delay, with one departure monitor request per stop from the earliest planned departure."""
+    board_requests = []
+
+    def get_departures(api_key, stop_id, **kwargs):
+        board_requests.append((stop_id, kwargs['request_time']))
+        return [
+            make_departure('trip_1', '2026-01-01T08:04:50Z'),
+            make_departure('trip_2', '2026-01-01T08:00:00Z'),
+            make_departure(None, '2026-01-01T08:05:00Z')
+        ]
+
+    monkeypatch.setattr(helpers, "get_departures", get_departures)
+    journeys = [make_pinned_journey('trip_1'), make_pinned_journey('trip_2'), make_pinned_journey(None, '200070')]
+
+    assert refresh_departure_times("key", journeys)
+    assert board_requests == [('200060', dt_util.parse_datetime('2026-01-01T08:00:00Z'))]
+    assert journeys[0]['origin_detail']['departure_time'] == '2026-01-01T08:04:50Z'
+    assert journeys[0]['destination_detail']['arrival_time'] == '2026-01-01T08:24:50Z'
+
+    # Truncated to whole minutes, as the library does
+    assert journeys[0]['delay'] == 4
+    assert journeys[1] == make_pinned_journey('trip_2')
+    assert journeys[2] == make_pinned_journey(None, '200070')
+
+
+def test_refresh_departure_times_destination_leg(monkeypatch) -> None:
+    """With a change of vehicle, the arrival time follows the last vehicle, looked up at the stop it's boarded at."""
+    boards = {
+        '200060': [make_departure('trip_1', '2026-01-01T08:02:00Z')],
+        '200080': [make_departure('trip_2', '2026-01-01T08:15:00Z', '2026-01-01T08:10:00Z')]
+    }
+    monkeypatch.setattr(helpers, "get_departures", lambda api_key, stop_id, **kwargs: boards[stop_id])
+    journeys = [make_pinned_journey('trip_1', destination_trip_id = 'trip_2')]
+
+    assert refresh_departure_times("key", journeys)
+    assert journeys[0]['delay'] == 2
+    assert journeys[0]['destination_detail']['arrival_time'] == '2026-01-01T08:25:00Z'
+    assert journeys[0]['duration'] == 23
+
+
+def test_refresh_departure_times_cancelled(monkeypatch) -> None:
+    """A cancelled trip means the journey needs planning again."""
+    monkeypatch.setattr(
+        helpers,
+        "get_departures",
+        lambda api_key, stop_id, **kwargs: [make_departure('trip_1', '2026-01-01T08:00:00Z', cancelled = True)]
+    )
+
+    assert not refresh_departure_times("key", [make_pinned_journey('trip_1')])
+
+
+def test_refresh_departure_times_missing(monkeypatch) -> None:
+    """A trip that's dropped off its stop's departures can't be trusted, so the journey needs planning again."""
+    monkeypatch.setattr(helpers, "get_departures", lambda api_key, stop_id, **kwargs: [make_departure('trip_2', '2026-01-01T08:00:00Z')])
+
+    assert not refresh_departure_times("key", [make_pinned_journey('trip_1')])
@@ -0,0 +1,66 @@
+"""Tests for dead reckoning vehicle positions between polls."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from custom_components.ha_transportnsw.interpolation import VehicleTrack, get_stop_times
+
+DEPARTURE = datetime(2026, 1, 1, 8, 0, tzinfo = timezone.utc).timestamp()
+
+
+def make_journey(stop_coords: list[tuple[float, float] | None], duration: int = 600) -> dict:
+    return {
+        'origin_detail': {'departure_time': datetime.fromtimestamp(DEPARTURE, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')},
+        'destination_detail': {'arrival_time': datetime.fromtimestamp(DEPARTURE + duration, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')},
+        'stop_list': [
+            {'coords': {'latitude': coords[0], 'longitude': coords[1]} if coords is not None else {}}
+            for coords in stop_coords
+        ]
+    }
+
+
+JOURNEY = make_journey([(-33.90, 151.20), (-33.89, 151.20), (-33.87, 151.20)])
+
+
+def test_stop_times_shared_out_by_distance() -> None:
+    """The time between departure and arrival is shared out between the stops by how far apart they are."""
+    stop_times = get_stop_times(JOURNEY)
+
+    assert [latitude for _, latitude, _ in stop_times] == [-33.90, -33.89, -33.87]
+    assert stop_times[0][0] == DEPARTURE
+    assert stop_times[1][0] == pytest.approx(DEPARTURE + 200, abs = 1)
+    assert stop_times[2][0] == DEPARTURE + 600
+
+
+def test_stop_times_need_every_stop() -> None:
+    """Nothing can be worked out if a stop is missing its coordinates, or there's only one stop."""
+    assert get_stop_times(make_journey([(-33.90, 151.20), None, (-33.87, 151.20)])) == []
+    assert get_stop_times(make_journey([(-33.90, 151.20)])) == []
+
+
+def test_position_between_poll_and_next_stop() -> None:
+    """The vehicle moves in a straight line from where it was polled towards its next stop."""
+    track = VehicleTrack.from_journey(JOURNEY, 'origin', DEPARTURE + 100, -33.895, 151.20)
+    next_stop_time = track.points[-1][0]
+
+    assert len(track.points) == 2
+    assert track.position_at(DEPARTURE + 50) == (-33.895, 151.20)
+
+    latitude, longitude = track.position_at((DEPARTURE + 100 + next_stop_time) / 2)
+
+    assert latitude == pytest.approx(-33.8925)
+    assert longitude == pytest.approx(151.20)
+
+
+def test_position_waits_at_the_end_of_the_leg() -> None:
+    """Once the vehicle should have reached the end of its leg it stays there until the next poll."""
+    track = VehicleTrack.from_journey(JOURNEY, 'destination', DEPARTURE + 100, -33.895, 151.20)
+
+    assert [point[1] for point in track.points] == [-33.895, -33.89, -33.87]
+    assert track.position_at(DEPARTURE + 3600) == (-33.87, 151.20)
+
+
+def test_no_track_without_stop_times() -> None:
+    """There's nothing to follow if the journey's stops can't be timed."""
+    assert VehicleTrack.from_journey(make_journey([(-33.90, 151.20)]), 'origin', DEPARTURE, -33.90, 151.20) is None
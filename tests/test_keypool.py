@@ -0,0 +1,56 @@
+"""Tests for pooling several API keys within one config entry."""
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.ha_transportnsw.const import DAILY_API_QUOTA
+from custom_components.ha_transportnsw.keypool import APIKeyPool
+from custom_components.ha_transportnsw.ratelimit import get_rate_limiter
+
+
+async def test_duplicate_keys_are_dropped(hass: HomeAssistant) -> None:
+    """Each key is only pooled once, with the primary key first."""
+    pool = APIKeyPool(hass, ["key_1", "key_2", "key_1"])
+
+    assert pool.api_keys == ["key_1", "key_2"]
+
+
+async def test_ordered_by_remaining_quota(hass: HomeAssistant) -> None:
+    """The key with the most of today's quota left is used first."""
+    pool = APIKeyPool(hass, ["key_1", "key_2", "key_3"])
+    pool.record("key_1", 300)
+    pool.record("key_2", 100)
+    pool.record("key_3", 200)
+
+    assert pool.get_ordered_keys() == ["key_2", "key_3", "key_1"]
+    assert pool.total_calls_today == 600
+
+
+async def test_ordered_by_tokens_in_hand(hass: HomeAssistant) -> None:
+    """Keys with the same usage are ordered by how many requests they can make straight away."""
+    pool = APIKeyPool(hass, ["key_1", "key_2"])
+    get_rate_limiter(hass, "key_1").tokens = 1
+
+    assert pool.get_ordered_keys() == ["key_2", "key_1"]
+
+
+async def test_cooling_down_keys_go_last(hass: HomeAssistant) -> None:
+    """A key that's been rate limited is only used if there's nothing else."""
+    pool = APIKeyPool(hass, ["key_1", "key_2"])
+    pool.record("key_2", 100)
+    get_rate_limiter(hass, "key_1").rate_limited()
+
+    assert pool.get_ordered_keys() == ["key_2", "key_1"]
+    assert pool.get_status("key_1") == "cooling_down"
+
+
+async def test_unusable_keys_are_left_out(hass: HomeAssistant) -> None:
+    """Invalid keys and keys that have used up today's quota aren't offered at all, or counted towards the quota."""
+    pool = APIKeyPool(hass, ["key_1", "key_2", "key_3"])
+    pool.mark_invalid("key_1")
+    pool.record("key_2", DAILY_API_QUOTA)
+
+    assert pool.get_ordered_keys() == ["key_3"]
+    assert pool.get_status("key_1") == "invalid"
+    assert pool.get_status("key_2") == "exhausted"
+    assert pool.get_status("key_3") == "ok"
+    assert pool.daily_quota == DAILY_API_QUOTA * 2
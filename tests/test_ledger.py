@@ -0,0 +1,87 @@
+"""Tests for the per-journey API call ledger."""
+
+from datetime import timedelta
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.ha_transportnsw.const import LEDGER_MINUTES
+from custom_components.ha_transportnsw.ledger import APICallLedger
+
+
+def get_midday():
+    return dt_util.start_of_local_day() + timedelta(hours = 12)
+
+
+async def test_calls_since(hass: HomeAssistant) -> None:
+    """Calls are counted per journey, and only from the minutes asked for."""
+    ledger = APICallLedger(hass, "entry")
+    now = get_midday()
+
+    ledger.record("journey_1", 2, now - timedelta(minutes = 10))
+    ledger.record("journey_1", 3, now)
+    ledger.record("journey_2", 4, now)
+    ledger.record("journey_2", 0, now)
+
+    assert ledger.calls_since(now - timedelta(minutes = 30)) == {"journey_1": 5, "journey_2": 4}
+    assert ledger.calls_since(now - timedelta(minutes = 5)) == {"journey_1": 3, "journey_2": 4}
+
+
+async def test_ring_buffer_reuses_old_buckets(hass: HomeAssistant) -> None:
+    """A bucket is cleared out once it comes round again for a newer minute."""
+    ledger = APICallLedger(hass, "entry")
+    now = get_midday()
+    later = now + timedelta(minutes = LEDGER_MINUTES)
+
+    ledger.record("journey_1", 5, now)
+    ledger.record("journey_2", 1, later)
+
+    assert ledger.calls_since(now - timedelta(minutes = 1)) == {"journey_1": 0, "journey_2": 1}
+
+
+async def test_forget(hass: HomeAssistant) -> None:
+    """Journeys that no longer exist are dropped."""
+    ledger = APICallLedger(hass, "entry")
+    now = get_midday()
+
+    ledger.record("journey_1", 1, now)
+    ledger.record("journey_2", 1, now)
+    ledger.forget({"journey_2"})
+
+    assert ledger.calls_since(now) == {"journey_2": 1}
+
+
+async def test_forecast_exhaustion(hass: HomeAssistant) -> None:
+    """The quota is forecast to run out at the rate over the last hour."""
+    ledger = APICallLedger(hass, "entry")
+    now = get_midday()
+
+    for minute in range(60):
+        ledger.record("journey_1", 10, now - timedelta(minutes = minute))
+
+    exhaustion, projected_calls = ledger.forecast_exhaustion(1000, now)
+
+    assert exhaustion == now + timedelta(minutes = 40)
+    assert projected_calls == 600 + 10 * 12 * 60
+
+
+async def test_forecast_exhaustion_after_midnight(hass: HomeAssistant) -> None:
+    """There's nothing to forecast if the quota resets before it runs out, or if no calls are being made."""
+    ledger = APICallLedger(hass, "entry")
+    now = get_midday()
+
+    assert ledger.forecast_exhaustion(1000, now) == (None, 0)
+
+    ledger.record("journey_1", 1, now)
+
+    assert ledger.forecast_exhaustion(1000, now)[0] is None
+
+
+async def test_forecast_exhaustion_already_exhausted(hass: HomeAssistant) -> None:
+    """A quota that's already used up is exhausted now."""
+    ledger = APICallLedger(hass, "entry")
+    now = get_midday()
+
+    ledger.record("journey_1", 1000, now)
+
+    assert ledger.forecast_exhaustion(1000, now)[0] == now
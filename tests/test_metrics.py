@@ -0,0 +1,30 @@
+"""Tests for the Prometheus metrics."""
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import Entity
+
+from custom_components.ha_transportnsw.metrics import TransportNSWMetrics, render_metrics
+
+
+class FakeEntity(Entity):
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self.entity_id = 'sensor.central_to_town_hall_due'
+        self._attr_state = 5
+
+
+async def test_entity_writes_performed_and_skipped(hass: HomeAssistant) -> None:
+    """A write that doesn't change the state or its attributes counts as skipped."""
+    metrics = TransportNSWMetrics()
+    entity = FakeEntity(hass)
+
+    metrics.async_write_entity_state(entity)
+    metrics.async_write_entity_state(entity)
+    entity._attr_state = 4
+    metrics.async_write_entity_state(entity)
+
+    assert (metrics.entity_writes_performed, metrics.entity_writes_skipped) == (2, 1)
+
+    rendered = render_metrics({'entry_1': metrics}, {})
+    assert 'ha_transportnsw_entity_writes_total{config_entry="entry_1",result="performed"} 2' in rendered
+    assert 'ha_transportnsw_entity_writes_total{config_entry="entry_1",result="skipped"} 1' in rendered
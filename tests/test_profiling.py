@@ -0,0 +1,27 @@
+"""Tests for the poll profiler."""
+
+import pstats
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.ha_transportnsw import profiling
+
+from .test_coordinator import config_dir, make_coordinator, make_journey_subentry, trip_requests  # noqa: F401
+
+
+async def test_profile_includes_executor_work(hass: HomeAssistant, trip_requests: list, monkeypatch) -> None:
+    """The trip requests made in the executor show up in the profile, not just the event loop's share of the poll."""
+    profiled_functions = []
+
+    def write_profile_report(file_path, profiler, snapshot, header) -> dict:
+        profiled_functions.extend(function_name for _, _, function_name in pstats.Stats(profiler).stats)
+        return {'top_functions': [], 'top_allocations': []}
+
+    monkeypatch.setattr(profiling, "write_profile_report", write_profile_report)
+    coordinator = make_coordinator(hass, make_journey_subentry("Work"))
+
+    result = await profiling.async_profile_poll(hass, [coordinator])
+
+    assert result['errors'] == {}
+    assert trip_requests
+    assert 'get_trips' in profiled_functions
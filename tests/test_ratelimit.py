@@ -0,0 +1,143 @@
+"""Tests for the per-API-key rate limiter."""
+
+import pytest
+from TransportNSWv2 import APIRateLimitExceeded
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.ha_transportnsw import ratelimit
+from custom_components.ha_transportnsw.const import RATE_LIMIT_COOLDOWN, RATE_LIMIT_MAX_COOLDOWN
+from custom_components.ha_transportnsw.helpers import count_api_calls
+from custom_components.ha_transportnsw.ratelimit import TokenBucket, async_call_limited, get_rate_limiter
+
+
+class FakeClock:
+    """A monotonic clock that only moves when something sleeps."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds: float) -> None:
+        self.sleep(seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(ratelimit.time, "sleep", clock.sleep)
+    monkeypatch.setattr(ratelimit.asyncio, "sleep", clock.async_sleep)
+
+    return clock
+
+
+async def test_acquire_within_burst(clock: FakeClock) -> None:
+    """A full bucket hands out its tokens straight away."""
+    bucket = TokenBucket(rate = 5, capacity = 5)
+
+    for _ in range(5):
+        await bucket.async_acquire()
+
+    assert clock.slept == []
+    assert bucket.tokens == 0
+
+
+async def test_acquire_waits_for_refill(clock: FakeClock) -> None:
+    """An empty bucket waits just long enough for the next token."""
+    bucket = TokenBucket(rate = 5, capacity = 5)
+    bucket.tokens = 0
+
+    await bucket.async_acquire()
+
+    assert clock.slept == [pytest.approx(0.2)]
+
+
+async def test_refill_is_capped(clock: FakeClock) -> None:
+    """Tokens don't build up beyond the bucket's capacity."""
+    bucket = TokenBucket(rate = 5, capacity = 5)
+    clock.now += 60
+
+    await bucket.async_acquire()
+
+    assert bucket.tokens == 4
+
+
+def test_blocking_acquire_waits_for_refill(clock: FakeClock) -> None:
+    """Executor threads wait for their tokens just as the event loop does."""
+    bucket = TokenBucket(rate = 4, capacity = 4)
+    bucket.tokens = 0
+
+    bucket.acquire()
+    bucket.acquire()
+
+    assert clock.slept == [0.25, 0.25]
+
+
+async def test_rate_limited_cools_down(clock: FakeClock) -> None:
+    """Being rate limited drains the bucket and waits out a cool-down that doubles each time, until a request succeeds."""
+    bucket = TokenBucket(rate = 5, capacity = 5)
+    bucket.rate_limited()
+
+    assert bucket.tokens == 0
+    assert bucket.cooldown_remaining == RATE_LIMIT_COOLDOWN
+    assert bucket.cooldown == min(RATE_LIMIT_COOLDOWN * 2, RATE_LIMIT_MAX_COOLDOWN)
+
+    await bucket.async_acquire()
+
+    assert clock.slept[0] == RATE_LIMIT_COOLDOWN
+    assert bucket.cooldown_remaining == 0
+
+    for _ in range(10):
+        bucket.rate_limited()
+
+    assert bucket.cooldown == RATE_LIMIT_MAX_COOLDOWN
+
+    bucket.succeeded()
+
+    assert bucket.cooldown == RATE_LIMIT_COOLDOWN
+
+
+async def test_get_rate_limiter_is_shared_per_key(hass: HomeAssistant) -> None:
+    """Everything using the same API key shares the one bucket."""
+    assert get_rate_limiter(hass, "key_1") is get_rate_limiter(hass, "key_1")
+    assert get_rate_limiter(hass, "key_1") is not get_rate_limiter(hass, "key_2")
+
+
+async def test_call_limited_paces_every_request(hass: HomeAssistant, monkeypatch) -> None:
+    """The first request is paid for up front, and each of the rest takes a token just before it's made."""
+    paced = []
+    limiter = get_rate_limiter(hass, "key_1")
+    monkeypatch.setattr(limiter, "acquire", lambda: paced.append(limiter.tokens))
+    limiter.tokens = limiter.capacity = 10
+
+    def make_requests(api_calls: int) -> str:
+        for _ in range(api_calls):
+            count_api_calls()
+
+        return "done"
+
+    assert await async_call_limited(hass, "key_1", make_requests, 3) == ("done", 3, None)
+    assert len(paced) == 2
+    assert limiter.tokens == pytest.approx(9, abs = 0.1)
+
+
+async def test_call_limited_returns_errors(hass: HomeAssistant) -> None:
+    """Errors are returned rather than raised, and a rate limit starts the key's cool-down."""
+    def rate_limited() -> None:
+        count_api_calls()
+        raise APIRateLimitExceeded
+
+    result, api_calls, error = await async_call_limited(hass, "key_1", rate_limited)
+
+    assert result is None
+    assert api_calls == 1
+    assert isinstance(error, APIRateLimitExceeded)
+    assert get_rate_limiter(hass, "key_1").cooldown_remaining > 0
@@ -0,0 +1,84 @@
+"""Tests for snapping a position to the nearest stop."""
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.ha_transportnsw.spatial import StopIndex, get_stop_index, is_stop_id, read_gtfs_stops
+
+CENTRAL = (-33.8832, 151.2070)
+
+
+def test_is_stop_id() -> None:
+    """Stop IDs are numeric, bar an optional letter at the front."""
+    assert is_stop_id('200060')
+    assert is_stop_id('G2000')
+    assert not is_stop_id('Central Station')
+    assert not is_stop_id('2')
+    assert not is_stop_id(None)
+
+
+async def test_nearest_stops(hass: HomeAssistant) -> None:
+    """Stops within range are returned nearest first, and nothing outside it."""
+    stop_index = StopIndex(hass)
+    stop_index.async_add_stop('200060', 'Central', CENTRAL)
+    stop_index.async_add_stop('200070', 'Central north', (CENTRAL[0] + 0.0018, CENTRAL[1]))
+    stop_index.async_add_stop('2000300', 'Central east', (CENTRAL[0], CENTRAL[1] + 0.01))
+
+    position = (CENTRAL[0] - 0.0008, CENTRAL[1])
+
+    assert [stop_id for _, stop_id in stop_index.nearest(*position, 400)] == ['200060', '200070']
+    assert stop_index.nearest_stop(*position, 400) == '200060'
+    assert stop_index.nearest_stop(*position, 50) is None
+    assert len(stop_index) == 3
+
+
+async def test_nearest_stop_in_the_next_cell(hass: HomeAssistant) -> None:
+    """A stop just across a cell boundary is still found."""
+    stop_index = StopIndex(hass, cell_size = 0.005)
+    stop_index.async_add_stop('200060', 'Central', (-33.88499, 151.20499))
+
+    assert stop_index.nearest_stop(-33.88501, 151.20501, 50) == '200060'
+
+
+async def test_unusable_stops_are_ignored(hass: HomeAssistant) -> None:
+    """Stops without a usable ID or coordinates aren't added."""
+    stop_index = StopIndex(hass)
+    stop_index.async_add_stop('Central Station', 'Central', CENTRAL)
+    stop_index.async_add_stop('200060', 'Central', None)
+    stop_index.async_add_stop('200070', 'Central', ('north', 'south'))
+
+    assert len(stop_index) == 0
+
+
+async def test_add_journey_stops(hass: HomeAssistant) -> None:
+    """The stops that planned journeys start, change and finish at are added."""
+    stop_index = StopIndex(hass)
+    stop_index.async_add_journey_stops([
+        {
+            'origin_detail': {'stop_id': '200060', 'name': 'Central', 'coords': {'latitude': CENTRAL[0], 'longitude': CENTRAL[1]}},
+            'destination_detail': {'stop_id': '2000300', 'name': 'Town Hall', 'coords': {'latitude': -33.8731, 'longitude': 151.2065}},
+            'stop_list': [{'id': '200070', 'disassembled_name': 'Museum', 'coords': {'latitude': -33.8766, 'longitude': 151.2098}}]
+        }
+    ])
+
+    assert len(stop_index) == 3
+    assert stop_index.nearest_stop(-33.8767, 151.2098) == '200070'
+
+
+async def test_get_stop_index_is_shared(hass: HomeAssistant) -> None:
+    """Every config entry and flow shares the one index."""
+    assert get_stop_index(hass) is get_stop_index(hass)
+
+
+def test_read_gtfs_stops(tmp_path) -> None:
+    """Only the stops and stations we can plan from are read from a GTFS stops.txt."""
+    stops_file = tmp_path / 'stops.txt'
+    stops_file.write_text(
+        'stop_id,stop_name,stop_lat,stop_lon,location_type\n'
+        '200060,Central Station,-33.8832,151.2070,1\n'
+        '2000331,Central Platform 1,-33.8831,151.2069,\n'
+        '2000332,Central Entrance,-33.8833,151.2071,2\n'
+        'Node1,Some Node,-33.8834,151.2072,0\n',
+        encoding = 'utf-8'
+    )
+
+    assert read_gtfs_stops(str(stops_file)) == [('200060', -33.8832, 151.2070), ('2000331', -33.8831, 151.2069)]